@@ -1,4 +1,6 @@
-from django.contrib.auth.forms import UserCreationForm, UserChangeForm
+import unicodedata
+
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm, UserChangeForm
 from django import forms
 
 from .models import CustomUser, UserPreferences
@@ -32,6 +34,29 @@ class CustomUserChangeForm(UserChangeForm):
         fields = ("first_name", "last_name")
 
 
+class InvitePasswordResetForm(PasswordResetForm):
+    """
+    A password reset form that also sends a link to users who haven't chosen a password yet, so
+    that anyone whose invite link (see accounts.provisioning) has expired can ask for a new one.
+    """
+
+    def get_users(self, email):
+        # The same as PasswordResetForm.get_users, without skipping unusable passwords
+        email_field_name = CustomUser.get_email_field_name()
+        users = CustomUser._default_manager.filter(
+            **{f"{email_field_name}__iexact": email, "is_active": True}
+        )
+        return (
+            user
+            for user in users
+            if _casefold(email) == _casefold(getattr(user, email_field_name))
+        )
+
+
+def _casefold(value):
+    return unicodedata.normalize("NFKC", value).casefold()
+
+
 class ChangeUserPreferences(forms.ModelForm):
     class Meta:
         model = UserPreferences
@@ -41,3 +66,23 @@ class ChangeUserPreferences(forms.ModelForm):
         super(ChangeUserPreferences, self).__init__(*args, **kwargs)
 
         self.fields['email'].disabled = True
+
+
+class UserProvisionRowForm(forms.Form):
+    """
+    One row of a user provisioning CSV. Only checks the row on its own: duplicates and group names
+    are checked across the whole file at once by accounts.provisioning.provision_users.
+    """
+
+    email = forms.EmailField()
+    first_name = forms.CharField(max_length=150, required=False)
+    last_name = forms.CharField(max_length=150, required=False)
+    # Group names, separated by semicolons
+    groups = forms.CharField(required=False)
+
+    def clean_email(self):
+        # The same as create_user does, so duplicates are found however they are written
+        return CustomUser.objects.normalize_email(self.cleaned_data["email"])
+
+    def clean_groups(self):
+        return [name.strip() for name in self.cleaned_data["groups"].split(";") if name.strip()]
@@ -0,0 +1,88 @@
+"""Create user accounts in bulk from a CSV file, e.g. every troop cookie coordinator at the start of
+a season, and write out the link each of them follows to choose their password:
+
+    python manage.py provision_users users.csv --group "Troop Cookie Coordinator" \
+        --invites invites.csv --base-url https://cookies.example.org
+
+Invite links expire after PASSWORD_RESET_TIMEOUT. To write new ones for everyone in the file who
+still hasn't chosen a password, run it again with --reinvite.
+"""
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisioning import provision_users, reinvite_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a CSV file with email, first_name, last_name and groups columns. "
+        "Nothing is created if any row has an error."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", help="CSV file with a header row")
+        parser.add_argument(
+            "--group",
+            action="append",
+            default=[],
+            dest="groups",
+            help="Group to add every user to. Can be given more than once.",
+        )
+        parser.add_argument(
+            "--invites", help="CSV file to write each user's invite link to, instead of stdout"
+        )
+        parser.add_argument("--base-url", default="", help="Site address to put before the links")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only check the file, without creating anyone"
+        )
+        parser.add_argument(
+            "--reinvite",
+            action="store_true",
+            help="Write new invite links for existing users who haven't chosen a password yet",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["csv_path"], newline="", encoding="utf-8-sig") as csv_file:
+                if options["reinvite"]:
+                    result = reinvite_users(csv_file)
+                else:
+                    result = provision_users(
+                        csv_file, groups=options["groups"], dry_run=options["dry_run"]
+                    )
+        except OSError as error:
+            raise CommandError(f"Could not read {options['csv_path']}: {error}")
+
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+
+        summary = result.summary
+        if result.errors:
+            outcome = "re-invited" if options["reinvite"] else "created"
+            raise CommandError(f"{len(result.errors)} error(s), no users {outcome}. {summary}")
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"No errors found. {summary}"))
+            return
+
+        base_url = options["base_url"].rstrip("/")
+        invites = [(email, base_url + path) for email, path in result.invites]
+        if options["invites"]:
+            with open(options["invites"], "w", newline="", encoding="utf-8") as invites_file:
+                writer = csv.writer(invites_file)
+                writer.writerow(["email", "invite_link"])
+                writer.writerows(invites)
+        else:
+            for email, link in invites:
+                self.stdout.write(f"{email},{link}")
+
+        if options["reinvite"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Re-invited {len(result.invites)} users, skipped {result.skipped} who have "
+                    f"chosen a password. {summary}"
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Created {result.created} users. {summary}"))
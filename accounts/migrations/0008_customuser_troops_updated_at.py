@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_auto_20221213_0252'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='troops_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -45,6 +45,9 @@ class CustomUserManager(BaseUserManager):
 class CustomUser(AbstractUser):
     username = None
     email = models.EmailField(_("email address"), unique=True)
+    # When the troops this user coordinates last changed, so the copy of them kept in their session
+    # (see troops.coordinators) can tell it is out of date without looking the troops up
+    troops_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -0,0 +1,197 @@
+"""Bulk creation of user accounts, e.g. every troop cookie coordinator at the start of a season.
+
+Every row is validated in memory, and existing accounts and group names are each checked with a
+single query. The users, their preferences and their group memberships are then written with one
+bulk_create each, in one transaction. Nobody is given a password: each account gets an unusable
+one, which costs nothing to set, where create_user would run the password hasher on every row.
+Instead each user is sent an invite link, which is a password reset link, to choose their own.
+Anyone whose link has expired before they used it can be sent a new one with reinvite_users.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from cookie_website.csv_imports import CsvImportResult, read_rows
+from troops.models import Troop
+
+from .forms import UserProvisionRowForm
+from .models import UserPreferences
+
+# How many rows are inserted per INSERT statement
+PROVISION_BATCH_SIZE = 500
+
+REQUIRED_PROVISION_COLUMNS = ["email"]
+
+
+class UserProvisionResult(CsvImportResult):
+    """
+    The outcome of provisioning, as well as what any CsvImportResult has.
+
+    Attributes:
+        invites (list): (email, invite path) for every user created, or re-invited.
+        skipped (int): How many users weren't re-invited, because they have chosen a password.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.invites = []
+        self.skipped = 0
+
+
+def provision_users(csv_file, groups=(), dry_run=False):
+    """
+    Create a user for every row of a CSV file, or none at all if any row has a problem.
+
+    Args:
+        csv_file (file): The CSV, opened in text or binary mode, with a header row.
+        groups (iterable): Names of groups to add every user to, as well as their own.
+        dry_run (bool): Only validate the file, without creating anything.
+
+    Returns:
+        UserProvisionResult: Who was created, their invites, and any errors.
+    """
+    result = UserProvisionResult()
+    rows = _read_rows(csv_file, list(groups), result)
+    user_model = get_user_model()
+
+    group_ids = {}
+    if rows:
+        # One query for every email in the file that already has an account
+        lines = {row["email"]: line for line, row in rows}
+        for email in user_model.objects.filter(email__in=lines).values_list("email", flat=True):
+            result.errors.append((lines[email], f"A user with email {email} already exists."))
+
+        # And one for every group named in it
+        names = {name for _, row in rows for name in row["groups"]}
+        group_ids = dict(Group.objects.filter(name__in=names).values_list("name", "id"))
+        for line, row in rows:
+            result.errors.extend(
+                (line, f"Group {name} does not exist.")
+                for name in row["groups"]
+                if name not in group_ids
+            )
+        result.errors.sort()
+
+    if rows and not result.errors and not dry_run:
+        users = [
+            user_model(
+                email=row["email"],
+                first_name=row["first_name"],
+                last_name=row["last_name"],
+                password=make_password(None),
+            )
+            for _, row in rows
+        ]
+        with transaction.atomic():
+            user_model.objects.bulk_create(users, batch_size=PROVISION_BATCH_SIZE)
+            _create_related(users, [row["groups"] for _, row in rows], group_ids)
+        result.created = len(users)
+        result.invites = [(user.email, get_invite_path(user)) for user in users]
+
+    return result.finish()
+
+
+def reinvite_users(csv_file):
+    """
+    Make new invite links for the users in a CSV file who haven't chosen a password yet, e.g.
+    because their first link expired. Only the email column is used.
+
+    Args:
+        csv_file (file): The CSV, opened in text or binary mode, with a header row.
+
+    Returns:
+        UserProvisionResult: Who was re-invited, their invites, and any errors. Nobody is
+            re-invited if any row has an error.
+    """
+    result = UserProvisionResult()
+    rows = _read_rows(csv_file, [], result)
+
+    # One query for every account in the file
+    lines = {row["email"]: line for line, row in rows}
+    users = {user.email: user for user in get_user_model().objects.filter(email__in=lines)}
+    result.errors.extend(
+        (line, f"There is no user with email {email}.")
+        for email, line in lines.items()
+        if email not in users
+    )
+    result.errors.sort()
+
+    if not result.errors:
+        for user in users.values():
+            if user.has_usable_password():
+                result.skipped += 1
+            else:
+                result.invites.append((user.email, get_invite_path(user)))
+
+    return result.finish()
+
+
+def get_invite_path(user):
+    """
+    Get the link a new user follows to choose their password.
+
+    It is a password reset link, so it stops working once they have used it, or after
+    PASSWORD_RESET_TIMEOUT.
+
+    Args:
+        user (CustomUser): The user, saved.
+
+    Returns:
+        str: The path of the link.
+    """
+    return reverse(
+        "password_reset_confirm",
+        kwargs={
+            "uidb64": urlsafe_base64_encode(force_bytes(user.pk)),
+            "token": default_token_generator.make_token(user),
+        },
+    )
+
+
+def _create_related(users, user_groups, group_ids):
+    # bulk_create skips the post_save receivers, so what they would do for each user is done here
+    # for all of them at once: their preferences, and linking them to the troops they coordinate.
+    # New users have no sessions yet, so there are no copies of their troops to mark out of date.
+    UserPreferences.objects.bulk_create(
+        [UserPreferences(email=user) for user in users], batch_size=PROVISION_BATCH_SIZE
+    )
+
+    membership = get_user_model().groups.through
+    memberships = [
+        membership(customuser_id=user.id, group_id=group_ids[name])
+        for user, names in zip(users, user_groups)
+        for name in names
+    ]
+    if memberships:
+        membership.objects.bulk_create(memberships, batch_size=PROVISION_BATCH_SIZE)
+
+    Troop.objects.filter(
+        coordinator__isnull=True, troop_cookie_coordinator__in=[user.email for user in users]
+    ).update(
+        coordinator_id=Subquery(
+            get_user_model()
+            .objects.filter(email=OuterRef("troop_cookie_coordinator"))
+            .values("id")[:1]
+        )
+    )
+
+
+def _read_rows(csv_file, groups, result):
+    # Every user is added to the groups for the whole file as well as their own
+    rows = read_rows(
+        csv_file,
+        UserProvisionRowForm,
+        REQUIRED_PROVISION_COLUMNS,
+        result,
+        "email",
+        "{value} is also on line {line}.",
+    )
+    for _, data in rows:
+        data["groups"] = list(dict.fromkeys(groups + data["groups"]))
+    return rows
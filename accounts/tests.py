@@ -1 +1,237 @@
+# User Provisioning Tests
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest import mock
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import UserPreferences
+from accounts.provisioning import provision_users, reinvite_users
+from troops.models import Troop
+
+HEADER = "email,first_name,last_name,groups\n"
+
+
+def _csv(*rows, header=HEADER):
+    return header + "".join(f"{row}\n" for row in rows)
+
+
+class ProvisionUsersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tcc_group = Group.objects.create(name="Troop Cookie Coordinator")
+        cls.captain_group = Group.objects.create(name="Cookie Captain")
+        get_user_model().objects.create_user(email="existing@troop.org", password="secret")
+        Troop.objects.create(troop_number=112, troop_cookie_coordinator="tcc12@troop.org")
+
+    def test_provision(self):
+        rows = [
+            f"tcc{number}@troop.org,First{number},Last{number},Troop Cookie Coordinator"
+            for number in range(50)
+        ]
+
+        # Existing accounts and groups are checked in a query each, then the users, their
+        # preferences and their groups are written in one insert each and the troops linked in one
+        # update, inside a savepoint here since the test is in a transaction
+        with self.assertNumQueries(8):
+            result = provision_users(io.StringIO(_csv(*rows)))
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.rows, 50)
+        self.assertEqual(result.created, 50)
+        self.assertGreater(result.rows_per_second, 0)
+        user = get_user_model().objects.get(email="tcc12@troop.org")
+        self.assertEqual(user.first_name, "First12")
+        self.assertEqual(user.last_name, "Last12")
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(list(user.groups.all()), [self.tcc_group])
+        self.assertTrue(UserPreferences.objects.filter(email=user).exists())
+        self.assertEqual(UserPreferences.objects.count(), 51)
+        self.assertEqual(Troop.objects.get(troop_number=112).coordinator, user)
+
+    def test_groups_for_everyone(self):
+        result = provision_users(
+            io.StringIO(_csv("a@troop.org,,,Cookie Captain", "b@troop.org,,,")),
+            groups=["Cookie Captain"],
+        )
+
+        self.assertEqual(result.errors, [])
+        for email in ("a@troop.org", "b@troop.org"):
+            user = get_user_model().objects.get(email=email)
+            self.assertEqual(list(user.groups.all()), [self.captain_group])
+
+    def test_only_email_needed(self):
+        result = provision_users(io.StringIO(_csv("a@TROOP.org", header="email\n")))
+
+        self.assertEqual(result.errors, [])
+        # The domain is lower cased, the same as create_user does
+        self.assertTrue(get_user_model().objects.filter(email="a@troop.org").exists())
+
+    def test_invite_link(self):
+        result = provision_users(io.StringIO(_csv("a@troop.org,,,")))
+        (email, path), = result.invites
+        self.assertEqual(email, "a@troop.org")
+
+        # The link is a password reset link, which takes them to choose their password
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(
+            response.url, {"new_password1": "Cookies4Sale!", "new_password2": "Cookies4Sale!"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.client.login(email="a@troop.org", password="Cookies4Sale!"))
+
+        # And only works once
+        response = self.client.get(path)
+        self.assertFalse(response.context["validlink"])
+
+    def test_expired_invite(self):
+        result = provision_users(io.StringIO(_csv("a@troop.org,,,")))
+        (_, path), = result.invites
+
+        expired = datetime.now() + timedelta(seconds=settings.PASSWORD_RESET_TIMEOUT + 60)
+        with mock.patch.object(PasswordResetTokenGenerator, "_now", return_value=expired):
+            response = self.client.get(path, follow=True)
+        self.assertFalse(response.context["validlink"])
+
+        # Asking for a new link sends one, though they have never had a password
+        response = self.client.post(reverse("password_reset"), {"email": "a@troop.org"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["a@troop.org"])
+
+        # As does re-inviting them
+        (email, path), = reinvite_users(io.StringIO(_csv("a@troop.org,,,"))).invites
+        self.assertEqual(email, "a@troop.org")
+        response = self.client.get(path, follow=True)
+        self.assertTrue(response.context["validlink"])
+
+    def test_password_reset_skips_inactive_users(self):
+        provision_users(io.StringIO(_csv("a@troop.org,,,")))
+        get_user_model().objects.filter(email="a@troop.org").update(is_active=False)
+
+        self.client.post(reverse("password_reset"), {"email": "a@troop.org"})
+
+        self.assertEqual(mail.outbox, [])
+
+    def test_reinvite_skips_chosen_passwords(self):
+        provision_users(io.StringIO(_csv("a@troop.org,,,")))
+
+        result = reinvite_users(io.StringIO(_csv("a@troop.org,,,", "existing@troop.org,,,")))
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual([email for email, _ in result.invites], ["a@troop.org"])
+        self.assertEqual(result.skipped, 1)
+
+    def test_reinvite_unknown_user(self):
+        provision_users(io.StringIO(_csv("a@troop.org,,,")))
+
+        result = reinvite_users(io.StringIO(_csv("a@troop.org,,,", "b@troop.org,,,")))
+
+        self.assertEqual(result.errors, [(3, "There is no user with email b@troop.org.")])
+        self.assertEqual(result.invites, [])
+
+    def test_errors_create_nothing(self):
+        result = provision_users(
+            io.StringIO(
+                _csv(
+                    "new@troop.org,,,",
+                    "existing@troop.org,,,",
+                    "not an email,,,",
+                    "new@troop.org,,,",
+                    "other@troop.org,,,Sellers",
+                )
+            )
+        )
+
+        self.assertEqual(
+            result.errors,
+            [
+                (3, "A user with email existing@troop.org already exists."),
+                (4, "email: Enter a valid email address."),
+                (5, "new@troop.org is also on line 2."),
+                (6, "Group Sellers does not exist."),
+            ],
+        )
+        self.assertEqual(result.created, 0)
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_missing_column(self):
+        result = provision_users(io.StringIO(_csv("Ann", header="first_name\n")))
+
+        self.assertEqual(result.errors, [(1, "Missing column(s): email.")])
+
+    def test_dry_run(self):
+        result = provision_users(io.StringIO(_csv("a@troop.org,,,")), dry_run=True)
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.created, 0)
+        self.assertFalse(get_user_model().objects.filter(email="a@troop.org").exists())
+
+    def test_thousand_users(self):
+        rows = [f"tcc{number}@troop.org,,," for number in range(1000)]
+
+        result = provision_users(io.StringIO(_csv(*rows)), groups=["Troop Cookie Coordinator"])
+
+        self.assertEqual(result.created, 1000)
+        self.assertEqual(self.tcc_group.user_set.count(), 1000)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "users.csv")
+            invites_path = os.path.join(directory, "invites.csv")
+            with open(csv_path, "w") as csv_file:
+                csv_file.write(_csv("a@troop.org,Ann,,"))
+            out = io.StringIO()
+
+            call_command(
+                "provision_users",
+                csv_path,
+                "--group",
+                "Cookie Captain",
+                "--invites",
+                invites_path,
+                "--base-url",
+                "https://cookies.example.org/",
+                stdout=out,
+            )
+
+            with open(invites_path) as invites_file:
+                invites = invites_file.read().splitlines()
+
+        self.assertIn("Created 1 users.", out.getvalue())
+        self.assertEqual(invites[0], "email,invite_link")
+        self.assertTrue(invites[1].startswith("a@troop.org,https://cookies.example.org/accounts/"))
+        user = get_user_model().objects.get(email="a@troop.org")
+        self.assertEqual(list(user.groups.all()), [self.captain_group])
+
+    def test_reinvite_command(self):
+        provision_users(io.StringIO(_csv("a@troop.org,,,")))
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "users.csv")
+            with open(csv_path, "w") as csv_file:
+                csv_file.write(_csv("a@troop.org,,,", "existing@troop.org,,,"))
+            out = io.StringIO()
+
+            call_command("provision_users", csv_path, "--reinvite", stdout=out)
+
+        self.assertIn("a@troop.org,/accounts/reset/", out.getvalue())
+        self.assertIn("Re-invited 1 users, skipped 1", out.getvalue())
+
+    def test_command_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "users.csv")
+            with open(csv_path, "w") as csv_file:
+                csv_file.write(_csv("existing@troop.org,,,"))
+
+            with self.assertRaises(CommandError):
+                call_command("provision_users", csv_path, stderr=io.StringIO())
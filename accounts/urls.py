@@ -1,6 +1,7 @@
-from django.contrib.auth.views import LogoutView
+from django.contrib.auth.views import LogoutView, PasswordResetView
 from django.urls import path
 
+from .forms import InvitePasswordResetForm
 from .views import SignUpView, UserPreferenceView
 
 app_name = "accounts"
@@ -9,4 +10,10 @@ urlpatterns = [
     path("signup/", SignUpView.as_view(), name="signup"),
     path("preferences/<int:pk>/", UserPreferenceView.as_view(), name="user_preference"),
     path("logout/", LogoutView.as_view(), name="logout"),
+    # Ahead of django.contrib.auth.urls, so that users still holding an expired invite can reset
+    path(
+        "password_reset/",
+        PasswordResetView.as_view(form_class=InvitePasswordResetForm),
+        name="password_reset",
+    ),
 ]
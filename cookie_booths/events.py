@@ -0,0 +1,151 @@
+"""Live booth block availability, pushed to the booth_blocks page over Server-Sent Events.
+
+Every process runs at most one poller, which looks for blocks whose booth_block_updated_at moved
+since its last look and fans the changes out to every stream connected to that process. Polling the
+database (rather than publishing from the request that made the change) means a reservation made in
+one worker still reaches clients connected to another, without needing an external broker.
+
+The stream is an async view and is only usable when the site is served through the ASGI entry
+point (cookie_website/asgi.py), since a WSGI worker would be tied up for the life of each client.
+"""
+import asyncio
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import BoothBlock
+
+# How often each process checks the database for changed blocks
+BLOCK_EVENT_POLL_INTERVAL = 2
+# How far back past the last change seen to look, to catch transactions that committed late
+BLOCK_EVENT_OVERLAP = timedelta(seconds=5)
+# Comment line sent to idle streams, to keep proxies from closing the connection
+BLOCK_EVENT_HEARTBEAT = 15
+# Changes a slow client can fall behind by before further changes are dropped for it
+BLOCK_EVENT_QUEUE_SIZE = 500
+# Tells the browser how long to wait before reconnecting a dropped stream, in milliseconds
+BLOCK_EVENT_RETRY = 5000
+
+BLOCK_EVENT_FIELDS = (
+    "id",
+    "booth_block_enabled",
+    "booth_block_reserved",
+    "booth_block_daisy_reserved",
+    "booth_block_held_for_cookie_captains",
+    "booth_block_updated_at",
+)
+
+
+class BlockEventPoller:
+    """Polls for changed booth blocks and hands each change to every subscribed stream"""
+
+    def __init__(self, poll_interval=BLOCK_EVENT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._task = None
+        self._cursor = None
+        # Block ID -> updated at, for changes already sent within the overlap window
+        self._seen = {}
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=BLOCK_EVENT_QUEUE_SIZE)
+        self._subscribers.add(queue)
+
+        # The first subscriber starts the polling, and it stops again once everyone has left
+        if self._task is None or self._task.done():
+            self.reset()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def reset(self, cursor=None):
+        self._cursor = cursor or timezone.now()
+        self._seen = {}
+
+    def poll(self):
+        # Look back a little past the cursor so a transaction that committed late with an older
+        # timestamp is still picked up; anything already sent with that timestamp is skipped.
+        since = self._cursor - BLOCK_EVENT_OVERLAP
+        blocks_ = (
+            BoothBlock.objects.filter(booth_block_updated_at__gte=since)
+            .order_by("booth_block_updated_at")
+            .values(*BLOCK_EVENT_FIELDS)
+        )
+
+        changes = []
+        for block in blocks_:
+            updated_at = block["booth_block_updated_at"]
+            if self._seen.get(block["id"]) == updated_at:
+                continue
+
+            self._seen[block["id"]] = updated_at
+            self._cursor = max(self._cursor, updated_at)
+            changes.append(
+                {
+                    "id": block["id"],
+                    "enabled": block["booth_block_enabled"],
+                    "reserved": block["booth_block_reserved"],
+                    "daisy_reserved": block["booth_block_daisy_reserved"],
+                    "held": block["booth_block_held_for_cookie_captains"],
+                }
+            )
+
+        # Forget anything that has fallen out of the overlap window
+        oldest = self._cursor - BLOCK_EVENT_OVERLAP
+        self._seen = {
+            block_id: updated_at
+            for block_id, updated_at in self._seen.items()
+            if updated_at >= oldest
+        }
+
+        return changes
+
+    def _poll_safely(self):
+        # This runs for as long as anyone is connected, so recycle stale or broken connections
+        # the same way a request would, and just try again next time if the database hiccups
+        close_old_connections()
+        try:
+            return self.poll()
+        except DatabaseError:
+            return []
+
+    async def _run(self):
+        while self._subscribers:
+            await asyncio.sleep(self.poll_interval)
+            changes = await sync_to_async(self._poll_safely)()
+            for change in changes:
+                for queue in list(self._subscribers):
+                    try:
+                        queue.put_nowait(change)
+                    except asyncio.QueueFull:
+                        # This client has stopped reading; it will catch up when it reconnects
+                        pass
+
+
+block_event_poller = BlockEventPoller()
+
+
+def format_block_event(change):
+    return f"event: block\ndata: {json.dumps(change)}\n\n"
+
+
+async def block_event_stream(poller=block_event_poller):
+    queue = poller.subscribe()
+    try:
+        yield f"retry: {BLOCK_EVENT_RETRY}\n\n"
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), timeout=BLOCK_EVENT_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            yield format_block_event(change)
+    finally:
+        poller.unsubscribe(queue)
@@ -0,0 +1,216 @@
+"""Streaming exports of booth reservations.
+
+Rows are read from the database in chunks with QuerySet.iterator() and written out as they are
+read, so an export of every block in a season never holds more than one chunk in memory. The XLSX
+writer builds the workbook by hand with zipfile, writing the sheet one row at a time, rather than
+pulling in a spreadsheet library that would build the whole workbook up front.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.utils.timezone import localtime
+
+from accounts.models import CustomUser
+
+# How many blocks are read from the database at a time
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_HEADER = (
+    "Location",
+    "Address",
+    "Date",
+    "Day",
+    "Start Time",
+    "End Time",
+    "Troop",
+    "Cookie Captain",
+    "Daisy Troop",
+    "Held for Cookie Captains",
+)
+
+EXPORT_FIELDS = (
+    "booth_day__booth__booth_location",
+    "booth_day__booth__booth_address",
+    "booth_day__booth_day_date",
+    "booth_block_start_time",
+    "booth_block_end_time",
+    "booth_block_current_troop_owner",
+    "booth_block_current_cookie_captain_owner",
+    "booth_block_daisy_reserved",
+    "booth_block_daisy_troop_owner",
+    "booth_block_held_for_cookie_captains",
+)
+
+
+def export_rows(booth_blocks_):
+    """
+    Yield one export row per booth block, header first.
+
+    Args:
+        booth_blocks_ (QuerySet): The booth blocks to export, already filtered and ordered.
+
+    Yields:
+        tuple: The values for each column in EXPORT_HEADER.
+    """
+    # Look the cookie captains up front: there are only ever a handful, but many blocks each
+    cookie_captain_emails = dict(
+        CustomUser.objects.filter(
+            id__in=booth_blocks_.values("booth_block_current_cookie_captain_owner")
+        ).values_list("id", "email")
+    )
+
+    yield EXPORT_HEADER
+
+    for (
+        location,
+        address,
+        date,
+        start_time,
+        end_time,
+        troop_owner,
+        cookie_captain_owner,
+        daisy_reserved,
+        daisy_troop_owner,
+        held_for_cookie_captains,
+    ) in booth_blocks_.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield (
+            location,
+            address,
+            date.strftime("%m/%d/%Y"),
+            date.strftime("%a"),
+            _format_time(start_time),
+            _format_time(end_time),
+            troop_owner or "",
+            cookie_captain_emails.get(cookie_captain_owner, ""),
+            daisy_troop_owner if daisy_reserved else "",
+            "Yes" if held_for_cookie_captains else "No",
+        )
+
+
+class _Echo:
+    """A file-like object that hands back whatever is written to it, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+# Spreadsheets run a cell starting with any of these as a formula, so a location named
+# "=HYPERLINK(...)" would run when the export is opened
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _csv_cell(value):
+    # A leading quote makes spreadsheets show the cell as text, without the quote
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _ChunkBuffer:
+    """An unseekable file-like object that collects written bytes until they are taken"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    "</Types>"
+)
+
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Reservations" sheetId="1" r:id="rId1"/></sheets>'
+    "</workbook>"
+)
+
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    "</Relationships>"
+)
+
+XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+XLSX_SHEET_END = "</sheetData></worksheet>"
+
+
+def stream_xlsx(rows):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr("[Content_Types].xml", XLSX_CONTENT_TYPES)
+        workbook.writestr("_rels/.rels", XLSX_ROOT_RELS)
+        workbook.writestr("xl/workbook.xml", XLSX_WORKBOOK)
+        workbook.writestr("xl/_rels/workbook.xml.rels", XLSX_WORKBOOK_RELS)
+
+        # The size of the sheet isn't known up front, so it needs the zip64 headers to be safe
+        with workbook.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            sheet.write(XLSX_SHEET_START.encode())
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode())
+                data = buffer.take()
+                if data:
+                    yield data
+            sheet.write(XLSX_SHEET_END.encode())
+
+    # Whatever is left of the sheet, plus the zip's central directory
+    yield buffer.take()
+
+
+def _xlsx_row(row):
+    cells = []
+    for value in row:
+        if isinstance(value, int) and not isinstance(value, bool):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+    return f"<row>{''.join(cells)}</row>"
+
+
+def _format_time(value):
+    # Match the times shown on the booth pages
+    return localtime(value).strftime("%I:%M %p") if value else ""
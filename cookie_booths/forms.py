@@ -279,3 +279,82 @@ class EnableFreeForAll(forms.Form):
 
     start_date = forms.DateField(widget=DatePickerInput(options={"range_from": "booth days"}))
     end_date = forms.DateField(widget=DatePickerInput(options={"range_from": "booth days"}))
+
+
+class ReservationExportForm(forms.Form):
+    """
+    Filters for exporting booth reservations. Every filter is optional.
+
+    Attributes:
+        start_date (date): Only include blocks on or after this date.
+        end_date (date): Only include blocks on or before this date.
+        location (BoothLocation): Only include blocks at this location.
+        troop (int): Only include blocks reserved by this troop, either outright or as the daisy troop.
+        format (str): The file format to export as, csv or xlsx.
+    """
+
+    EXPORT_FORMATS = [("csv", "CSV"), ("xlsx", "Excel")]
+
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    location = forms.ModelChoiceField(queryset=BoothLocation.objects.all(), required=False)
+    troop = forms.IntegerField(required=False, min_value=1)
+    format = forms.ChoiceField(choices=EXPORT_FORMATS, required=False)
+
+    def clean_format(self):
+        """
+        Default to CSV when no format is given.
+
+        Returns:
+            str: The cleaned export format.
+        """
+        return self.cleaned_data["format"] or "csv"
+
+    def clean(self):
+        """
+        Make sure the date range is the right way round.
+
+        Raises:
+            forms.ValidationError: If the start date is after the end date.
+        """
+        super().clean()
+
+        start_date = self.cleaned_data.get("start_date")
+        end_date = self.cleaned_data.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError("The start date must be on or before the end date")
+
+
+class BulkToggleDaysForm(forms.Form):
+    """
+    Enable or disable every booth day in a date range, at a set of locations.
+
+    Attributes:
+        locations (QuerySet): The locations to change, or every location if none are picked.
+        start_date (date): The first date to change.
+        end_date (date): The last date to change, inclusive.
+        action (str): Whether to enable or disable the days.
+    """
+
+    ACTIONS = [("enable", "Enable"), ("disable", "Disable")]
+
+    locations = forms.ModelMultipleChoiceField(
+        queryset=BoothLocation.objects.all(), required=False
+    )
+    start_date = forms.DateField()
+    end_date = forms.DateField()
+    action = forms.ChoiceField(choices=ACTIONS)
+
+    def clean(self):
+        """
+        Make sure the date range is the right way round.
+
+        Raises:
+            forms.ValidationError: If the start date is after the end date.
+        """
+        super().clean()
+
+        start_date = self.cleaned_data.get("start_date")
+        end_date = self.cleaned_data.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError("The start date must be on or before the end date")
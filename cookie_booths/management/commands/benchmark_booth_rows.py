@@ -0,0 +1,154 @@
+"""Compare the memory and time it takes to build booth block tables from model instances and rows.
+
+Both paths are fed the same synthetic data in the shape the database hands it back, so nothing is
+read from or written to the database:
+
+    python manage.py benchmark_booth_rows --rows 20000
+"""
+import datetime
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from cookie_booths.models import BOOTH_BLOCK_TABLE_FIELDS, BoothBlock, BoothDay, BoothLocation
+from cookie_booths.rows import BoothBlockRow
+
+BLOCKS_PER_DAY = 4
+DAYS_PER_LOCATION = 60
+FIRST_DATE = datetime.date(2024, 1, 6)
+
+
+class Command(BaseCommand):
+    help = "Benchmark building the booth block tables from model instances against BoothBlockRow"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Number of blocks to build")
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Number of times to render each table"
+        )
+
+    def handle(self, *args, **options):
+        values = _get_values(options["rows"])
+        user_context = {
+            "user_id": 1,
+            "troop_number": 300,
+            "is_cookie_captain": False,
+            "permission_level": "tcc",
+        }
+
+        models_memory, models_seconds = _measure(_build_model_rows, values)
+        rows_memory, rows_seconds = _measure(_build_rows, values, user_context)
+
+        self.stdout.write(f"{len(values)} blocks")
+        self.stdout.write(
+            f"Model instances: {models_memory / 1024 / 1024:.1f} MiB, {models_seconds:.3f}s"
+        )
+        self.stdout.write(
+            f"BoothBlockRow:   {rows_memory / 1024 / 1024:.1f} MiB, {rows_seconds:.3f}s"
+        )
+
+        # Rendering is timed as each kind of user, best of a few runs since it is CPU bound
+        for permission_level in ("admin", "tcc", "daisy"):
+            user_context["permission_level"] = permission_level
+            rows = _build_rows(values, user_context)
+            seconds = min(_time_render(rows) for _ in range(options["repeat"]))
+            self.stdout.write(f"Rendering rows as {permission_level}: {seconds:.3f}s")
+
+
+def _time_render(rows):
+    start = time.perf_counter()
+    render_to_string("cookie_booths/booth_block_rows.html", {"booth_blocks": rows})
+    return time.perf_counter() - start
+
+
+def _measure(build, *args):
+    # Peak memory allocated while building the table, and how long it took
+    tracemalloc.start()
+    start = time.perf_counter()
+    table = build(*args)
+    seconds = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del table
+    return memory, seconds
+
+
+def _get_values(num_rows):
+    # One tuple per block, in the order of the lookups below
+    values = []
+    for index in range(num_rows):
+        day_index, slot = divmod(index, BLOCKS_PER_DAY)
+        location_index, day_offset = divmod(day_index, DAYS_PER_LOCATION)
+        date = FIRST_DATE + datetime.timedelta(days=day_offset)
+        start_time = datetime.datetime.combine(
+            date, datetime.time(8 + 2 * slot), tzinfo=datetime.timezone.utc
+        )
+        values.append(
+            (
+                index + 1,  # id
+                day_index + 1,  # booth_day_id
+                location_index + 1,  # booth_day__booth_id
+                f"Location {location_index}",
+                False,  # booth_requires_masks
+                date,
+                False,  # booth_day_is_golden
+                start_time,
+                start_time + datetime.timedelta(hours=2),
+                True,  # booth_block_enabled
+                index % 3 == 0,  # booth_block_reserved
+                False,  # booth_block_held_for_cookie_captains
+                300 if index % 3 == 0 else 0,  # booth_block_current_troop_owner
+                0,  # booth_block_current_cookie_captain_owner
+                False,  # booth_block_daisy_reserved
+                0,  # booth_block_daisy_troop_owner
+            )
+        )
+    return values
+
+
+def _build_model_rows(values):
+    # What .select_related().only() hands back: a block, day and location instance per row, with
+    # a dict wrapped around each block for the template
+    block_fields = ["id", "booth_day_id"] + [
+        field for field in BOOTH_BLOCK_TABLE_FIELDS if not field.startswith("booth_day__")
+    ]
+    table = []
+    for (
+        block_id,
+        day_id,
+        location_id,
+        location_name,
+        requires_masks,
+        date,
+        is_golden,
+        *block_values,
+    ) in values:
+        location = BoothLocation.from_db(
+            "default",
+            ["id", "booth_location", "booth_requires_masks"],
+            [location_id, location_name, requires_masks],
+        )
+        day = BoothDay.from_db(
+            "default",
+            ["id", "booth_id", "booth_day_date", "booth_day_is_golden"],
+            [day_id, location_id, date, is_golden],
+        )
+        day.booth = location
+        block = BoothBlock.from_db("default", block_fields, [block_id, day_id, *block_values])
+        block.booth_day = day
+        table.append(
+            {
+                "booth_block_information": block,
+                "booth_owned_by_current_user": False,
+                "booth_owned_by_cookie_captain": False,
+                "booth_block_cookie_captain_email": None,
+            }
+        )
+    return table
+
+
+def _build_rows(values, user_context):
+    # The same values as BoothBlockRow objects, without the location id the rows don't need
+    return [BoothBlockRow(row[:2] + row[3:], user_context, {}) for row in values]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookie_booths', '0011_alter_cookieseason_ffa_day_of_week'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boothblock',
+            name='booth_block_updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookie_booths', '0012_boothblock_booth_block_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boothday',
+            name='booth_day_updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='boothlocation',
+            name='booth_updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookie_booths', '0013_booth_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='boothblock',
+            index=models.Index(condition=models.Q(('booth_block_enabled', True)), fields=['booth_block_start_time'], name='boothblock_upcoming'),
+        ),
+    ]
@@ -1,14 +1,28 @@
 from datetime import timedelta, datetime
+from zoneinfo import ZoneInfo
 from pytz import utc
 
 from django.conf import settings
-from django.core.mail import send_mail
-from django.db import models
-from django.db.models import Q
-from django.db.models.signals import post_save, pre_delete
+from django.db import models, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from notifications.outbox import (
+    BLOCK_CANCELLED,
+    BLOCK_RESERVED,
+    BLOCKS_DISABLED,
+    BLOCKS_ENABLED,
+    BLOCKS_FREEFORALL,
+    DAISY_BLOCK_CANCELLED,
+    DAISY_BLOCK_RESERVED,
+    queue_block_notifications,
+    queue_changed_block_notifications,
+    queue_held_block_notifications,
+    queue_removed_block_notifications,
+)
+
 DAYS_OF_WEEK = [
     (0, "Monday"),
     (1, "Tuesday"),
@@ -40,6 +54,8 @@ class BoothLocation(models.Model):
 
     booth_notes = models.CharField(max_length=100, blank=True)
 
+    booth_updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         verbose_name_plural = "booth locations"
         verbose_name = "booth location"
@@ -54,15 +70,17 @@ class BoothLocation(models.Model):
 
         # If no date is set for either start or end date, delete all days owned by this booth
         if hours.booth_start_date is None or hours.booth_end_date is None:
-            BoothDay.objects.filter(booth=self).delete()
+            self.__delete_days(BoothDay.objects.filter(booth=self))
             return
 
         # Delete any days outside of the new start/end date - this will cascade down to the blocks
-        BoothDay.objects.filter(
-            Q(booth=self),
-            Q(booth_day_date__lt=hours.booth_start_date)
-            | Q(booth_day_date__gt=hours.booth_end_date),
-        ).delete()
+        self.__delete_days(
+            BoothDay.objects.filter(
+                Q(booth=self),
+                Q(booth_day_date__lt=hours.booth_start_date)
+                | Q(booth_day_date__gt=hours.booth_end_date),
+            )
+        )
 
         # Go through each day between the new start and end date
         for date in self.__daterange(hours.booth_start_date, hours.booth_end_date):
@@ -77,7 +95,7 @@ class BoothLocation(models.Model):
                 or ((date.weekday() == 5) and (not hours.saturday_open))
                 or ((date.weekday() == 6) and (not hours.sunday_open))
             ):
-                BoothDay.objects.filter(booth=self, booth_day_date=date).delete()
+                self.__delete_days(BoothDay.objects.filter(booth=self, booth_day_date=date))
             # 2. If we're open, add or update those hours
             else:
                 if date.weekday() == 0:  # Monday
@@ -172,6 +190,13 @@ class BoothLocation(models.Model):
 
         return
 
+    def __delete_days(self, days):
+        # Everyone holding a block on these days is told it's gone, all at once, before the
+        # delete cascades down to the blocks
+        with transaction.atomic():
+            queue_removed_block_notifications(BoothBlock.objects.filter(booth_day__in=days))
+            days.delete()
+
     def __daterange(self, start_date, end_date):
         # Need +1 to be inclusive of the end date
         for n in range(int((end_date - start_date).days) + 1):
@@ -244,6 +269,68 @@ class BoothHours(models.Model):
     saturday_close_time = models.TimeField(blank=True, null=True)
 
 
+class BoothDayQuerySet(models.QuerySet):
+    def set_enabled(self, enabled):
+        """
+        Enable or disable every day in this queryset, along with their blocks, in one transaction.
+
+        Days already in the requested state are left alone, blocks included, the same as
+        BoothDay.enable_day() and BoothDay.disable_day(). Everyone holding a changing block is
+        told in the same transaction, with one notification each however many blocks change.
+
+        Args:
+            enabled (bool): Whether the days should end up enabled.
+
+        Returns:
+            tuple: The IDs of the days that changed, and how many blocks changed with them.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            changing_days = self.exclude(booth_day_enabled=enabled)
+            day_ids = list(changing_days.values_list("id", flat=True))
+
+            changing_blocks = BoothBlock.objects.filter(booth_day__in=day_ids).exclude(
+                booth_block_enabled=enabled
+            )
+            queue_changed_block_notifications(
+                changing_blocks, BLOCKS_ENABLED if enabled else BLOCKS_DISABLED
+            )
+            blocks_updated = changing_blocks.update(
+                booth_block_enabled=enabled, booth_block_updated_at=now
+            )
+            BoothDay.objects.filter(id__in=day_ids).update(
+                booth_day_enabled=enabled, booth_day_updated_at=now
+            )
+
+        return day_ids, blocks_updated
+
+    def enable_freeforall(self):
+        """
+        Make every day in this queryset, along with their blocks, free for all in one transaction.
+
+        Days that are already free for all are left alone, the same as
+        BoothDay.enable_freeforall(). Everyone holding a block on the changing days is told in the
+        same transaction, with one notification each however many days change.
+
+        Returns:
+            list: The IDs of the days that changed.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            day_ids = list(
+                self.exclude(booth_day_freeforall_enabled=True).values_list("id", flat=True)
+            )
+
+            changing_blocks = BoothBlock.objects.filter(booth_day__in=day_ids)
+            queue_changed_block_notifications(changing_blocks, BLOCKS_FREEFORALL)
+            changing_blocks.update(booth_block_freeforall_enabled=True, booth_block_updated_at=now)
+            BoothDay.objects.filter(id__in=day_ids).update(
+                booth_day_freeforall_enabled=True, booth_day_updated_at=now
+            )
+
+        return day_ids
+
+
 class BoothDay(models.Model):
     """Contains data relevant for a day of a booth"""
 
@@ -259,6 +346,10 @@ class BoothDay(models.Model):
     booth_day_enabled = models.BooleanField(default=False)
     booth_day_freeforall_enabled = models.BooleanField(default=False)
 
+    booth_day_updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = BoothDayQuerySet.as_manager()
+
     class Meta:
         permissions = (
             ("toggle_day", "Enable/Disable a day for a booth"),
@@ -278,10 +369,14 @@ class BoothDay(models.Model):
 
         self.booth_day_enabled = True
 
-        for block in BoothBlock.objects.filter(booth_day__id=self.id):
-            block.enable_block()
-
-        self.save()
+        # Whoever holds the blocks is told they're back, along with the change
+        changing_blocks = BoothBlock.objects.filter(
+            booth_day__id=self.id, booth_block_enabled=False
+        )
+        with transaction.atomic():
+            queue_changed_block_notifications(changing_blocks, BLOCKS_ENABLED)
+            changing_blocks.update(booth_block_enabled=True, booth_block_updated_at=timezone.now())
+            self.save()
 
         return
 
@@ -292,10 +387,14 @@ class BoothDay(models.Model):
 
         self.booth_day_enabled = False
 
-        for block in BoothBlock.objects.filter(booth_day__id=self.id):
-            block.disable_block()
-
-        self.save()
+        # Whoever holds the blocks is told they're disabled, along with the change
+        changing_blocks = BoothBlock.objects.filter(
+            booth_day__id=self.id, booth_block_enabled=True
+        )
+        with transaction.atomic():
+            queue_changed_block_notifications(changing_blocks, BLOCKS_DISABLED)
+            changing_blocks.update(booth_block_enabled=False, booth_block_updated_at=timezone.now())
+            self.save()
 
         return
 
@@ -316,12 +415,15 @@ class BoothDay(models.Model):
             # So the hours differ, we need to handle this from both ends
 
             # A few easy operations - Blocks that start before the new open time
-            # or end after the new close time should be cleared
-            BoothBlock.objects.filter(
+            # or end after the new close time should be cleared, telling whoever held them
+            removed_blocks = BoothBlock.objects.filter(
                 Q(booth_day__id=self.id),
                 Q(booth_block_start_time__lt=open_time)
                 | Q(booth_block_end_time__gt=close_time),
-            ).delete()
+            )
+            with transaction.atomic():
+                queue_removed_block_notifications(removed_blocks)
+                removed_blocks.delete()
 
             if not BoothBlock.objects.filter(booth_day__id=self.id):
                 self.booth_day_hours_set = False
@@ -379,12 +481,8 @@ class BoothDay(models.Model):
         if self.booth_day_freeforall_enabled:
             return
 
-        for block in BoothBlock.objects.filter(booth_day__id=self.id):
-            block.booth_block_freeforall_enabled = True
-            block.save()
-
+        BoothDay.objects.filter(id=self.id).enable_freeforall()
         self.booth_day_freeforall_enabled = True
-        self.save()
 
     def disable_freeforall(self):
         # If we're already disabled, nothing to do
@@ -467,6 +565,109 @@ class BoothDay(models.Model):
         )
 
 
+# The columns the booth block tables show, across the block, its day and its location
+BOOTH_BLOCK_TABLE_FIELDS = (
+    "booth_day__booth__booth_location",
+    "booth_day__booth__booth_requires_masks",
+    "booth_day__booth_day_date",
+    "booth_day__booth_day_is_golden",
+    "booth_block_start_time",
+    "booth_block_end_time",
+    "booth_block_enabled",
+    "booth_block_reserved",
+    "booth_block_held_for_cookie_captains",
+    "booth_block_current_troop_owner",
+    "booth_block_current_cookie_captain_owner",
+    "booth_block_daisy_reserved",
+    "booth_block_daisy_troop_owner",
+)
+
+
+class BoothBlockQuerySet(models.QuerySet):
+    """
+    Queries for booth blocks as a particular user sees them.
+
+    The user_context arguments are the dictionaries built by the booth views, holding the user's
+    ID, troop number and level, and which of the booth permissions they have.
+    """
+
+    def for_table(self):
+        """
+        Order the blocks the way the booth tables list them, fetching their day and location in
+        the same query but only the columns the tables show.
+
+        Returns:
+            QuerySet: The blocks, ready to render.
+        """
+        return (
+            self.select_related("booth_day", "booth_day__booth")
+            .only(*BOOTH_BLOCK_TABLE_FIELDS)
+            .order_by("booth_day__booth", "booth_day", "booth_block_start_time")
+        )
+
+    def upcoming(self, start_after=None):
+        """
+        Narrow the blocks down to enabled blocks that haven't started yet (allowing for the grace
+        period), which the boothblock_upcoming index covers.
+
+        Args:
+            start_after (datetime): Blocks starting at or before this time are left out. Defaults
+                to get_upcoming_window_start().
+
+        Returns:
+            QuerySet: The upcoming blocks.
+        """
+        if start_after is None:
+            start_after = get_upcoming_window_start()
+
+        return self.filter(booth_block_enabled=True, booth_block_start_time__gt=start_after)
+
+    def visible_to(self, user_context, start_after=None):
+        """
+        Narrow the blocks down to those the user can see on the reservation page.
+
+        Disabled blocks, and blocks that have already started, are hidden from everyone. Daisy
+        troops only see blocks reserved by cookie captains, and only cookie captains see blocks
+        held for them.
+
+        Args:
+            user_context (dict): Who the user is, as far as booth reservations go.
+            start_after (datetime): Passed on to upcoming().
+
+        Returns:
+            QuerySet: The visible blocks.
+        """
+        booth_blocks_ = self.upcoming(start_after)
+
+        if user_context["is_daisy_troop"]:
+            return booth_blocks_.filter(booth_block_current_troop_owner=0, booth_block_reserved=True)
+        if not user_context["is_cookie_captain"]:
+            return booth_blocks_.exclude(booth_block_held_for_cookie_captains=True)
+
+        return booth_blocks_
+
+    def reserved_by(self, user_context):
+        """
+        Narrow the blocks down to those reserved by the user's troop (as the daisy troop, for
+        daisies), or by the user themselves as a cookie captain.
+
+        Args:
+            user_context (dict): Who the user is, as far as booth reservations go.
+
+        Returns:
+            QuerySet: The user's reservations, which is none at all for a user with no troop who
+            isn't a cookie captain.
+        """
+        if user_context["is_daisy_troop"]:
+            return self.filter(booth_block_daisy_troop_owner=user_context["troop_number"])
+        if user_context["troop_number"]:
+            return self.filter(booth_block_current_troop_owner=user_context["troop_number"])
+        if user_context["is_cookie_captain"]:
+            return self.filter(booth_block_current_cookie_captain_owner=user_context["user_id"])
+
+        return self.none()
+
+
 class BoothBlock(models.Model):
     """Contains information for a particular booth block"""
 
@@ -487,7 +688,21 @@ class BoothBlock(models.Model):
     booth_block_enabled = models.BooleanField(default=False)
     booth_block_freeforall_enabled = models.BooleanField(default=False)
 
+    # Bumped on every save, so changes can be picked up and pushed to anyone watching the blocks.
+    # Anything changing blocks through QuerySet.update() needs to set this itself.
+    booth_block_updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = BoothBlockQuerySet.as_manager()
+
     class Meta:
+        indexes = [
+            # Keeps the upcoming blocks quick to find however many past seasons the table holds
+            models.Index(
+                fields=["booth_block_start_time"],
+                condition=Q(booth_block_enabled=True),
+                name="boothblock_upcoming",
+            ),
+        ]
         permissions = (
             ("block_reservation", "Reserve/Cancel a booth"),
             ("reserve_block", "Reserve a booth"),
@@ -513,6 +728,10 @@ class BoothBlock(models.Model):
         else:
             return False
 
+        # Everyone who held the block is told, the daisy troop included
+        troop_numbers = [self.booth_block_current_troop_owner, self.booth_block_daisy_troop_owner]
+        cookie_captain_ids = [self.booth_block_current_cookie_captain_owner]
+
         # At this point we can cancel the reservation
         self.booth_block_reserved = False
         self.booth_block_current_troop_owner = 0
@@ -520,9 +739,9 @@ class BoothBlock(models.Model):
         self.booth_block_daisy_reserved = False
         self.booth_block_daisy_troop_owner = 0
 
-        # TODO: Send email confirmation to both the main owner, as well as the daisy troop owner if affected
-
-        self.save()
+        with transaction.atomic():
+            self.save()
+            queue_block_notifications(self, BLOCK_CANCELLED, troop_numbers, cookie_captain_ids)
 
         return True
 
@@ -540,9 +759,9 @@ class BoothBlock(models.Model):
         self.booth_block_current_troop_owner = troop_id
         self.booth_block_current_cookie_captain_owner = cookie_cap_id
 
-        # TODO: Send email confirmation
-
-        self.save()
+        with transaction.atomic():
+            self.save()
+            queue_block_notifications(self, BLOCK_RESERVED, [troop_id], [cookie_cap_id])
         return True
 
     def cancel_daisy_reservation(self):
@@ -563,11 +782,18 @@ class BoothBlock(models.Model):
             return False
 
         # At this point we should be able to safely cancel the reservation
+        daisy_troop_id = self.booth_block_daisy_troop_owner
         self.booth_block_daisy_reserved = False
         self.booth_block_daisy_troop_owner = 0
 
-        # TODO: send email confirmation
-        self.save()
+        with transaction.atomic():
+            self.save()
+            queue_block_notifications(
+                self,
+                DAISY_BLOCK_CANCELLED,
+                [daisy_troop_id],
+                [self.booth_block_current_cookie_captain_owner],
+            )
         return True
 
     def reserve_daisy_block(self, daisy_troop_id):
@@ -587,8 +813,14 @@ class BoothBlock(models.Model):
         self.booth_block_daisy_reserved = True
         self.booth_block_daisy_troop_owner = daisy_troop_id
 
-        # TODO: send email confirmation
-        self.save()
+        with transaction.atomic():
+            self.save()
+            queue_block_notifications(
+                self,
+                DAISY_BLOCK_RESERVED,
+                [daisy_troop_id],
+                [self.booth_block_current_cookie_captain_owner],
+            )
         return True
 
     def hold_for_cookie_captains(self):
@@ -601,7 +833,10 @@ class BoothBlock(models.Model):
             return False
 
         self.booth_block_held_for_cookie_captains = True
-        self.save()
+
+        with transaction.atomic():
+            self.save()
+            queue_held_block_notifications(self)
 
         return True
 
@@ -637,6 +872,58 @@ class BoothBlock(models.Model):
         return True
 
 
+def get_upcoming_window_start(now=None):
+    """
+    Return the start time a block needs to be after to still be upcoming.
+
+    Block times hold the booth's local wall clock time labelled as UTC, so the current time is
+    converted to the booths' time zone (daylight saving included) and labelled the same way before
+    the grace period is taken off. It is rounded down to the minute, like block times, so the
+    upcoming blocks (and anything cached on them) only change once a minute.
+
+    Args:
+        now (datetime): The current time. Defaults to timezone.now().
+
+    Returns:
+        datetime: The start of the upcoming window, comparable with booth_block_start_time.
+    """
+    now = now or timezone.now()
+    wall_clock_now = now.astimezone(ZoneInfo(settings.BOOTH_TIME_ZONE)).replace(tzinfo=utc)
+    window_start = wall_clock_now - timedelta(minutes=settings.BOOTH_BLOCK_GRACE_MINUTES)
+
+    return window_start.replace(second=0, microsecond=0)
+
+
+def get_booth_change_stamp():
+    """
+    Return a cheap summary of the state of every booth location, day and block.
+
+    The summary changes whenever any of them is saved (their updated at timestamps move) or deleted
+    (their counts drop), so listing views can compare it against what a client last saw and answer
+    304 Not Modified without building the page.
+
+    Returns:
+        tuple: The last time anything changed, and a tuple of (count, last change) per model.
+    """
+    stamp = tuple(
+        (aggregate["count"], aggregate["last_modified"])
+        for aggregate in (
+            BoothLocation.objects.aggregate(
+                count=Count("id"), last_modified=Max("booth_updated_at")
+            ),
+            BoothDay.objects.aggregate(count=Count("id"), last_modified=Max("booth_day_updated_at")),
+            BoothBlock.objects.aggregate(
+                count=Count("id"), last_modified=Max("booth_block_updated_at")
+            ),
+        )
+    )
+    last_modified = max(
+        (last_modified for _, last_modified in stamp if last_modified is not None), default=None
+    )
+
+    return last_modified, stamp
+
+
 class CookieSeason(models.Model):
     season_start_date = models.DateField(blank=True, null=True)
     season_end_date = models.DateField(blank=True, null=True)
@@ -700,55 +987,3 @@ def generate_hours_if_needed(sender, instance, created, **kwargs):
         BoothHours.objects.create(booth_location=instance)
     else:
         instance.update_booth()
-
-
-# # TODO: This is broken and our testing does not cover this
-# @receiver(pre_delete, sender=BoothBlock)
-# def notify_block_deletion(sender, instance, **kwargs):
-#     # If this block has been reserved, notify the owner. Otherwise we have nothing to do
-#     if not instance.booth_block_reserved:
-#         return
-
-#     # Get the troop
-#     reserved_troop = Troop.objects.get(
-#         troop_number=instance.booth_block_current_troop_owner
-#     )
-#     if not reserved_troop:
-#         return
-
-#     # Then the owner from that
-#     block_owner = User.objects.get(username=reserved_troop.troop_cookie_coordinator)
-#     if not block_owner:
-#         return
-
-#     title = "Your Reserved Booth Block Has Been Removed"
-#     message = (
-#         "Hello "
-#         + block_owner.first_name
-#         + ",\n"
-#         + "Due to a schedule change, the following block is no longer available for reservation:\n\n"
-#         + "Location: "
-#         + instance.booth_day.booth.booth_location
-#         + "\n"
-#         + "Address: "
-#         + instance.booth_day.booth.booth_address
-#         + "\n"
-#         + "Date: "
-#         + instance.booth_day.booth_day_date.strftime("%A, %B %d, %Y")
-#         + "\n"
-#         + "Time Block: "
-#         + instance.booth_block_start_time.strftime("%I:%M %p")
-#         + " - "
-#         + instance.booth_block_end_time.strftime("%I:%M %p")
-#         + "\n\n\n"
-#         + "NOTE: Please do not reply to this email directly, this email address is not monitored. Please reach out to an administrator with any further questions."
-#     )
-
-#     send_mail(
-#         title,
-#         message,
-#         from_email=settings.EMAIL_HOST_USER,
-#         recipient_list=[block_owner.email],
-#     )
-
-#     return
@@ -0,0 +1,275 @@
+"""Lightweight rows for the booth block tables.
+
+A season has thousands of blocks, and the listing pages used to build a model instance (plus the
+related day and location instances) for each of them, only for the template to walk
+block.booth_block_information.booth_day.booth to get at a handful of values. The tables are built
+from values_list() tuples instead, packed into BoothBlockRow objects that use __slots__, hold only
+what the row shows, and have the ownership of the block already worked out for the current user.
+
+Which buttons a row shows is worked out here too, as a single action per row along with the lines
+of status text above the buttons, so booth_block_row.html only has to pick the buttons for that
+action rather than branch on permissions, reservations, holds and ownership for every row.
+"""
+from functools import reduce
+
+from django.utils.timezone import localtime
+
+from accounts.models import CustomUser
+
+# Row attribute, and the lookup it is read from
+BOOTH_BLOCK_ROW_FIELDS = (
+    ("id", "id"),
+    ("day_id", "booth_day_id"),
+    ("location", "booth_day__booth__booth_location"),
+    ("requires_masks", "booth_day__booth__booth_requires_masks"),
+    ("date", "booth_day__booth_day_date"),
+    ("is_golden", "booth_day__booth_day_is_golden"),
+    ("start_time", "booth_block_start_time"),
+    ("end_time", "booth_block_end_time"),
+    ("enabled", "booth_block_enabled"),
+    ("reserved", "booth_block_reserved"),
+    ("held_for_cookie_captains", "booth_block_held_for_cookie_captains"),
+    ("troop_owner", "booth_block_current_troop_owner"),
+    ("cookie_captain_owner", "booth_block_current_cookie_captain_owner"),
+    ("daisy_reserved", "booth_block_daisy_reserved"),
+    ("daisy_troop_owner", "booth_block_daisy_troop_owner"),
+)
+
+# What the current user can do with a block, i.e. which buttons its row shows
+ACTION_NONE = "none"
+ACTION_RESERVE = "reserve"
+ACTION_RESERVE_OR_HOLD = "reserve_or_hold"
+ACTION_CANCEL = "cancel"
+ACTION_UNHOLD = "unhold"
+ACTION_CANCEL_OR_UNHOLD = "cancel_or_unhold"
+ACTION_ENABLE = "enable"
+ACTION_DISABLE = "disable"
+
+_COOKIE_CAPTAIN_OWNER_INDEX = [attribute for attribute, _ in BOOTH_BLOCK_ROW_FIELDS].index(
+    "cookie_captain_owner"
+)
+
+
+def is_block_owned_by_user(user_context, troop_owner, daisy_troop_owner, cookie_captain_owner):
+    """
+    Work out whether a block belongs to the current user.
+
+    Args:
+        user_context (dict): The user's troop and permissions, from views._get_user_context().
+        troop_owner (int): The block's current troop owner.
+        daisy_troop_owner (int): The block's daisy troop owner.
+        cookie_captain_owner (int): The id of the cookie captain who owns the block.
+
+    Returns:
+        bool: True if the block is owned by the user.
+    """
+    # If troop number is None, then we cannot possibly own the booth
+    if user_context["troop_number"] is None:
+        return False
+
+    # If the user is a cookie captain, that means they all share troop number 0, so we check
+    # to see if the user id matches if they own the booth.
+    if user_context["is_cookie_captain"]:
+        return cookie_captain_owner == user_context["user_id"]
+
+    # Otherwise, we see if the booth is owned by either the daisy troop or the current owner
+    return (
+        troop_owner == user_context["troop_number"]
+        or daisy_troop_owner == user_context["troop_number"]
+    )
+
+
+class BoothBlockRow:
+    """
+    One row of a booth block table.
+
+    Attributes:
+        owned_by_current_user (bool): Whether the block belongs to the current user. None when
+            there is no user to compare against (the enable pages).
+        owned_by_cookie_captain (bool): Whether the block is reserved by a cookie captain.
+        cookie_captain_label (str): How the cookie captain who reserved the block is shown.
+        action (str): One of the ACTION_ constants.
+        for_daisy (int): 1 if reserving or cancelling is on behalf of a daisy troop, otherwise 0.
+        status (list): Lines of text describing who has reserved the block.
+    """
+
+    __slots__ = tuple(attribute for attribute, _ in BOOTH_BLOCK_ROW_FIELDS) + (
+        "owned_by_current_user",
+        "owned_by_cookie_captain",
+        "cookie_captain_label",
+        "action",
+        "for_daisy",
+        "status",
+    )
+
+    def __init__(self, values, user_context=None, cookie_captains=None, short_label=False):
+        for (attribute, _), value in zip(BOOTH_BLOCK_ROW_FIELDS, values):
+            setattr(self, attribute, value)
+
+        self.owned_by_cookie_captain = False
+        self.cookie_captain_label = ""
+        self.for_daisy = 0
+        self.status = []
+        if user_context is None:
+            self.owned_by_current_user = None
+            self.action = ACTION_DISABLE if self.enabled else ACTION_ENABLE
+            return
+
+        self.owned_by_current_user = is_block_owned_by_user(
+            user_context, self.troop_owner, self.daisy_troop_owner, self.cookie_captain_owner
+        )
+
+        if self.cookie_captain_owner != 0 and not self.troop_owner:
+            self.owned_by_cookie_captain = True
+            first_name, last_name, email = cookie_captains[self.cookie_captain_owner]
+            if short_label:
+                self.cookie_captain_label = first_name
+            else:
+                self.cookie_captain_label = (
+                    f"Cookie Captain: {first_name} {last_name} || Contact: {email}"
+                )
+
+        permission_level = user_context["permission_level"]
+        if permission_level == "admin":
+            self.action = self._get_admin_action()
+        elif permission_level == "daisy":
+            self.for_daisy = 1
+            self.action = self._get_daisy_action()
+        elif permission_level == "tcc":
+            self.action = self._get_tcc_action()
+        else:
+            self.action = ACTION_NONE
+
+    # The table's date and time cells. Formatted with strftime rather than the template's date
+    # filter, which looks up the active locale's formats for every value it formats.
+    @property
+    def date_label(self):
+        return self.date.strftime("%m/%d") if self.date else ""
+
+    @property
+    def day_label(self):
+        return self.date.strftime("%a") if self.date else ""
+
+    @property
+    def start_label(self):
+        return _format_time(self.start_time)
+
+    @property
+    def end_label(self):
+        return _format_time(self.end_time)
+
+    def _get_admin_action(self):
+        # Admins can reserve/cancel any booth for any troop, and hold booths for cookie captains
+        if not self.reserved:
+            return ACTION_UNHOLD if self.held_for_cookie_captains else ACTION_RESERVE_OR_HOLD
+
+        if self.held_for_cookie_captains:
+            # Cancelling the hold also cancels the daisy troop's reservation
+            self.status.append(f"Reserved by {self.troop_owner}")
+            self._add_cookie_captain_status()
+            self._add_daisy_status()
+            return ACTION_CANCEL_OR_UNHOLD
+
+        if not self._add_cookie_captain_status():
+            self.status.append(f"Reserved by {self.troop_owner}")
+        self._add_daisy_status()
+        return ACTION_CANCEL
+
+    def _get_daisy_action(self):
+        # Daisy troops only see blocks reserved by cookie captains, which they can share
+        if not self.daisy_reserved:
+            self._add_cookie_captain_status()
+            return ACTION_RESERVE
+
+        if self.owned_by_current_user:
+            self._add_cookie_captain_status()
+            return ACTION_CANCEL
+
+        self.status.append(f"Reserved by {self.daisy_troop_owner}")
+        return ACTION_NONE
+
+    def _get_tcc_action(self):
+        # TCCs can reserve or cancel booths for their troop only
+        if not self.reserved:
+            return ACTION_RESERVE
+
+        if self.owned_by_current_user:
+            self._add_daisy_status()
+            return ACTION_CANCEL
+
+        if not self._add_cookie_captain_status():
+            self.status.append(f"Reserved by {self.troop_owner}")
+        self._add_daisy_status()
+        return ACTION_NONE
+
+    def _add_cookie_captain_status(self):
+        if self.owned_by_cookie_captain:
+            self.status.append(f"Reserved by Cookie Captain {self.cookie_captain_label}")
+        return self.owned_by_cookie_captain
+
+    def _add_daisy_status(self):
+        if self.daisy_reserved:
+            self.status.append(f"Reserved by Daisy Troop {self.daisy_troop_owner}")
+
+
+def get_booth_block_rows(booth_blocks_, user_context=None, short_label=False):
+    """
+    Build the rows for a booth block table in two queries: one for the blocks and one for the
+    cookie captains who own any of them.
+
+    Args:
+        booth_blocks_ (QuerySet): The blocks to show, already filtered and ordered.
+        user_context (dict): The current user, or None on the enable pages.
+        short_label (bool): Show only the cookie captain's first name.
+
+    Returns:
+        list: A BoothBlockRow per block.
+    """
+    values = list(booth_blocks_.values_list(*(lookup for _, lookup in BOOTH_BLOCK_ROW_FIELDS)))
+    cookie_captains = None
+    if user_context is not None:
+        cookie_captains = _get_cookie_captains(
+            {row[_COOKIE_CAPTAIN_OWNER_INDEX] for row in values} - {0}
+        )
+
+    return [BoothBlockRow(row, user_context, cookie_captains, short_label) for row in values]
+
+
+def get_booth_block_row(block, user_context=None):
+    """
+    Build the row for a block that has already been loaded, e.g. after reserving it.
+
+    Args:
+        block (BoothBlock): The block, with its day and location selected.
+        user_context (dict): The current user, or None on the enable pages.
+
+    Returns:
+        BoothBlockRow: The block's row.
+    """
+    values = [
+        reduce(getattr, lookup.split("__"), block) for _, lookup in BOOTH_BLOCK_ROW_FIELDS
+    ]
+    cookie_captains = None
+    if user_context is not None:
+        cookie_captains = _get_cookie_captains(
+            {block.booth_block_current_cookie_captain_owner} - {0}
+        )
+
+    return BoothBlockRow(values, user_context, cookie_captains)
+
+
+def _format_time(value):
+    return localtime(value).strftime("%I:%M %p") if value else ""
+
+
+def _get_cookie_captains(cookie_captain_ids):
+    # Names and email addresses of the given cookie captains, by id. No query if there are none.
+    if not cookie_captain_ids:
+        return {}
+
+    return {
+        user_id: (first_name, last_name, email)
+        for user_id, first_name, last_name, email in CustomUser.objects.filter(
+            id__in=cookie_captain_ids
+        ).values_list("id", "first_name", "last_name", "email")
+    }
@@ -0,0 +1,135 @@
+# Tests for the live booth block change stream
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.events import BlockEventPoller, BLOCK_EVENT_OVERLAP, format_block_event
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+
+TEST_DATE = datetime.date(2023, 2, 4)
+OPEN_TIME = make_aware(datetime.datetime(2023, 2, 4, 8, 0, 0, 0))
+CLOSE_TIME = make_aware(datetime.datetime(2023, 2, 4, 12, 0, 0, 0))
+
+
+class BlockEventPollerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        day = BoothDay.objects.create(booth=location, booth_day_date=TEST_DATE)
+        day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+        day.enable_day()
+
+        cls.block = BoothBlock.objects.order_by("booth_block_start_time").first()
+
+        return super().setUpTestData()
+
+    def setUp(self) -> None:
+        # Start the poller from after every block was created, so only new changes are reported
+        self.poller = BlockEventPoller()
+        latest_block = BoothBlock.objects.latest("booth_block_updated_at")
+        self.poller.reset(cursor=latest_block.booth_block_updated_at)
+        self.poller.poll()
+
+    def test_no_changes(self):
+        self.assertEqual(self.poller.poll(), [])
+
+    def test_reservation_is_reported_once(self):
+        self.block.reserve_block(300, 0)
+
+        changes = self.poller.poll()
+        self.assertEqual(
+            changes,
+            [
+                {
+                    "id": self.block.id,
+                    "enabled": True,
+                    "reserved": True,
+                    "daisy_reserved": False,
+                    "held": False,
+                }
+            ],
+        )
+
+        # Still inside the overlap window, but already sent
+        self.assertEqual(self.poller.poll(), [])
+
+    def test_every_change_is_reported(self):
+        self.block.reserve_block(300, 0)
+        self.poller.poll()
+
+        self.block.cancel_block()
+        changes = self.poller.poll()
+        self.assertEqual(len(changes), 1)
+        self.assertFalse(changes[0]["reserved"])
+
+    def test_late_commit_inside_overlap_is_reported(self):
+        # A change stamped slightly before the cursor (e.g. a slow transaction) is still picked up
+        self.block.hold_for_cookie_captains()
+        self.poller.reset(cursor=self.block.booth_block_updated_at + BLOCK_EVENT_OVERLAP / 2)
+
+        changes = {change["id"]: change for change in self.poller.poll()}
+        self.assertIn(self.block.id, changes)
+        self.assertTrue(changes[self.block.id]["held"])
+
+    def test_format_block_event(self):
+        change = {"id": 1, "enabled": True, "reserved": False, "daisy_reserved": False, "held": True}
+        event = format_block_event(change)
+
+        self.assertTrue(event.startswith("event: block\ndata: "))
+        self.assertTrue(event.endswith("\n\n"))
+        self.assertEqual(json.loads(event.split("data: ", 1)[1]), change)
+
+
+class BlockEventViewTestCase(TestCase):
+    USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        get_user_model().objects.create_user(email=cls.USER["email"], password=cls.USER["password"])
+
+        return super().setUpTestData()
+
+    async def test_requires_login(self):
+        response = await self.async_client.get(reverse("cookie_booths:block_events"))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_stream_opens(self):
+        await self.async_client.alogin(email=self.USER["email"], password=self.USER["password"])
+        response = await self.async_client.get(reverse("cookie_booths:block_events"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        stream = aiter(response.streaming_content)
+        first_chunk = await anext(stream)
+        self.assertTrue(first_chunk.startswith(b"retry: "))
+        await stream.aclose()
+
+    def test_not_served_over_wsgi(self):
+        # A WSGI worker would be held for as long as the page stayed open
+        self.client.login(email=self.USER["email"], password=self.USER["password"])
+        response = self.client.get(reverse("cookie_booths:block_events"))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_polls_over_wsgi(self):
+        self.client.login(email=self.USER["email"], password=self.USER["password"])
+        response = self.client.get(reverse("cookie_booths:booth_blocks"))
+
+        self.assertFalse(response.context["live_updates"])
+        self.assertNotContains(response, "EventSource")
+        self.assertContains(response, "/booths/blocks/status/")
+
+    async def test_page_streams_over_asgi(self):
+        await self.async_client.alogin(email=self.USER["email"], password=self.USER["password"])
+        response = await self.async_client.get(reverse("cookie_booths:booth_blocks"))
+
+        self.assertTrue(response.context["live_updates"])
+        self.assertContains(response, "EventSource")
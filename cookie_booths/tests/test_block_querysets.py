@@ -0,0 +1,223 @@
+# Tests for the role-aware booth block queries, and how many queries the booth pages make
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+from troops.coordinators import COORDINATOR_TROOPS_SESSION_KEY
+from troops.models import Troop
+
+PERMISSION_RESERVE_BOOTH = "Reserve/Cancel a booth"
+PERMISSION_COOKIE_CAPTAIN_RESERVE_BOOTH = "Reserve a block for a daisy scout"
+PERMISSION_ADMIN = (
+    "Administrator reserve/cancel any booth, or hold booths for cookie captains to reserve"
+)
+
+FIRST_DATE = datetime.date.today() + datetime.timedelta(days=30)
+NUM_LOCATIONS = 5
+NUM_DAYS = 4
+PASSWORD = "secret"
+
+
+def _user_context(**overrides):
+    user_context = {
+        "user_id": None,
+        "email": "",
+        "troop_number": None,
+        "troop_level": 0,
+        "is_daisy_troop": False,
+        "is_cookie_admin": False,
+        "is_tcc": False,
+        "is_cookie_captain": False,
+        "permission_level": "none",
+    }
+    user_context.update(overrides)
+    return user_context
+
+
+class BoothBlockQuerySetTestCase(TestCase):
+
+    TROOP_NUMBER = 300
+    DAISY_TROOP_NUMBER = 100
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user_model = get_user_model()
+        cls.tcc = user_model.objects.create_user(email="tcc@troop.org", password=PASSWORD)
+        cls.tcc.user_permissions.add(Permission.objects.get(name=PERMISSION_RESERVE_BOOTH))
+        cls.daisy = user_model.objects.create_user(email="daisy@troop.org", password=PASSWORD)
+        cls.daisy.user_permissions.add(Permission.objects.get(name=PERMISSION_RESERVE_BOOTH))
+        cls.admin = user_model.objects.create_user(email="admin@troop.org", password=PASSWORD)
+        cls.admin.user_permissions.add(Permission.objects.get(name=PERMISSION_ADMIN))
+        cls.cookie_captains = []
+        for number in range(3):
+            cookie_captain = user_model.objects.create_user(
+                email=f"captain{number}@troop.org", password=PASSWORD
+            )
+            cookie_captain.user_permissions.add(
+                Permission.objects.get(name=PERMISSION_COOKIE_CAPTAIN_RESERVE_BOOTH)
+            )
+            cls.cookie_captains.append(cookie_captain)
+
+        Troop.objects.create(
+            troop_number=cls.TROOP_NUMBER, troop_cookie_coordinator=cls.tcc.email, troop_level=2
+        )
+        Troop.objects.create(
+            troop_number=cls.DAISY_TROOP_NUMBER,
+            troop_cookie_coordinator=cls.daisy.email,
+            troop_level=1,
+        )
+
+        # Four blocks a day, at every location, for several days
+        for location_number in range(NUM_LOCATIONS):
+            location = BoothLocation.objects.create(booth_location=f"Location {location_number}")
+            for offset in range(NUM_DAYS):
+                date = FIRST_DATE + datetime.timedelta(days=offset)
+                day = BoothDay.objects.create(booth=location, booth_day_date=date)
+                day.add_or_update_hours(
+                    make_aware(datetime.datetime.combine(date, datetime.time(8, 0))),
+                    make_aware(datetime.datetime.combine(date, datetime.time(16, 0))),
+                )
+                day.enable_day()
+
+        # Spread reservations across every kind of owner, cookie captains in particular, since
+        # each of their blocks shows the captain's name
+        for index, block in enumerate(BoothBlock.objects.order_by("id")):
+            kind = index % 5
+            if kind == 0:
+                block.reserve_block(cls.TROOP_NUMBER, 0)
+            elif kind == 1:
+                cookie_captain = cls.cookie_captains[index % len(cls.cookie_captains)]
+                block.reserve_block(0, cookie_captain.id)
+            elif kind == 2:
+                cookie_captain = cls.cookie_captains[index % len(cls.cookie_captains)]
+                block.reserve_block(0, cookie_captain.id)
+                block.reserve_daisy_block(cls.DAISY_TROOP_NUMBER)
+            elif kind == 3:
+                block.hold_for_cookie_captains()
+
+        cls.start_after = make_aware(datetime.datetime.combine(FIRST_DATE, datetime.time(0, 0)))
+
+        return super().setUpTestData()
+
+    def test_visible_to_tcc(self):
+        user_context = _user_context(troop_number=self.TROOP_NUMBER, troop_level=2, is_tcc=True)
+        blocks = BoothBlock.objects.visible_to(user_context, self.start_after)
+
+        self.assertFalse(blocks.filter(booth_block_held_for_cookie_captains=True).exists())
+        self.assertEqual(
+            blocks.count(),
+            BoothBlock.objects.filter(booth_block_held_for_cookie_captains=False).count(),
+        )
+
+    def test_visible_to_daisy(self):
+        user_context = _user_context(
+            troop_number=self.DAISY_TROOP_NUMBER, troop_level=1, is_daisy_troop=True, is_tcc=True
+        )
+        blocks = BoothBlock.objects.visible_to(user_context, self.start_after)
+
+        self.assertTrue(blocks.exists())
+        for block in blocks:
+            self.assertTrue(block.booth_block_reserved)
+            self.assertEqual(block.booth_block_current_troop_owner, 0)
+
+    def test_visible_to_hides_past_and_disabled_blocks(self):
+        user_context = _user_context(troop_number=self.TROOP_NUMBER, troop_level=2, is_tcc=True)
+        BoothDay.objects.filter(booth_day_date=FIRST_DATE).set_enabled(False)
+
+        blocks = BoothBlock.objects.visible_to(user_context, self.start_after)
+        self.assertTrue(blocks.exists())
+        self.assertFalse(blocks.filter(booth_day__booth_day_date=FIRST_DATE).exists())
+
+        start_after = self.start_after + datetime.timedelta(days=NUM_DAYS)
+        self.assertFalse(BoothBlock.objects.visible_to(user_context, start_after).exists())
+
+    def test_reserved_by(self):
+        tcc_context = _user_context(troop_number=self.TROOP_NUMBER, troop_level=2)
+        daisy_context = _user_context(
+            troop_number=self.DAISY_TROOP_NUMBER, troop_level=1, is_daisy_troop=True
+        )
+        cookie_captain_context = _user_context(
+            user_id=self.cookie_captains[0].id, troop_number=0, is_cookie_captain=True
+        )
+
+        self.assertTrue(
+            all(
+                block.booth_block_current_troop_owner == self.TROOP_NUMBER
+                for block in BoothBlock.objects.reserved_by(tcc_context)
+            )
+        )
+        self.assertTrue(
+            all(
+                block.booth_block_daisy_troop_owner == self.DAISY_TROOP_NUMBER
+                for block in BoothBlock.objects.reserved_by(daisy_context)
+            )
+        )
+        self.assertEqual(
+            BoothBlock.objects.reserved_by(cookie_captain_context).count(),
+            BoothBlock.objects.filter(
+                booth_block_current_cookie_captain_owner=self.cookie_captains[0].id
+            ).count(),
+        )
+
+        # Someone with no troop who isn't a cookie captain has no reservations at all
+        self.assertFalse(BoothBlock.objects.reserved_by(_user_context()).exists())
+
+    # The page queries don't grow with the number of blocks: session and user, permissions, the
+    # ETag's change stamp and troop list, then the blocks themselves and the cookie captains who
+    # own any of them. Admins also get the troop dropdown. The user's troops are already in their
+    # session from an earlier page.
+    def test_booth_blocks_queries_tcc(self):
+        self._assert_page_queries(self.tcc, "cookie_booths:booth_blocks", 10)
+
+    def test_booth_blocks_queries_daisy(self):
+        self._assert_page_queries(self.daisy, "cookie_booths:booth_blocks", 10)
+
+    def test_booth_blocks_queries_cookie_captain(self):
+        self._assert_page_queries(self.cookie_captains[0], "cookie_booths:booth_blocks", 10)
+
+    def test_booth_blocks_queries_admin(self):
+        self._assert_page_queries(self.admin, "cookie_booths:booth_blocks", 11)
+
+    def test_booth_reservations_queries_tcc(self):
+        # None of the troop's own blocks belong to a cookie captain, so there is no one to look up
+        self._assert_page_queries(self.tcc, "cookie_booths:booth_reservations", 9)
+
+    def test_booth_reservations_queries_cookie_captain(self):
+        self._assert_page_queries(self.cookie_captains[0], "cookie_booths:booth_reservations", 10)
+
+    def test_booth_reservations_queries_admin(self):
+        self._assert_page_queries(self.admin, "cookie_booths:booth_reservations", 11)
+
+    def test_troops_read_once_per_session(self):
+        self.client.login(email=self.tcc.email, password=PASSWORD)
+
+        # The first page reads the user's troops and writes them to the session
+        with self.assertNumQueries(14):
+            self.client.get(reverse("cookie_booths:booth_blocks"))
+        with self.assertNumQueries(10):
+            self.client.get(reverse("cookie_booths:booth_blocks"))
+
+        # Until one of their troops changes
+        Troop.objects.filter(troop_number=self.TROOP_NUMBER).get().save()
+        with self.assertNumQueries(14):
+            self.client.get(reverse("cookie_booths:booth_blocks"))
+        troops = self.client.session[COORDINATOR_TROOPS_SESSION_KEY]["troops"]
+        self.assertEqual([troop[1] for troop in troops], [self.TROOP_NUMBER])
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    def _assert_page_queries(self, user, url_name, num_queries):
+        self.client.login(email=user.email, password=PASSWORD)
+        self.client.get(reverse(url_name))
+
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(reverse(url_name))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["booth_blocks"])
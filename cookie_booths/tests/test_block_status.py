@@ -0,0 +1,169 @@
+# Batched Booth Block Status Tests
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+from troops.models import Troop
+
+PERMISSION_RESERVE_BOOTH = "Reserve/Cancel a booth"
+PERMISSION_COOKIE_CAPTAIN_RESERVE_BOOTH = "Reserve a block for a daisy scout"
+
+# Far enough ahead that the blocks are still upcoming
+TEST_DATE = datetime.date.today() + datetime.timedelta(days=30)
+OPEN_TIME = make_aware(datetime.datetime.combine(TEST_DATE, datetime.time(8, 0)))
+CLOSE_TIME = make_aware(datetime.datetime.combine(TEST_DATE, datetime.time(16, 0)))
+
+
+class BlockStatusTestCase(TestCase):
+
+    TCC_USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    COOKIE_CAPTAIN_USER = {
+        "email": "cookies@monster.com",
+        "password": "secret",
+    }
+
+    TROOP_NUMBER = 300
+    OTHER_TROOP_NUMBER = 301
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.tcc_user = get_user_model().objects.create_user(
+            email=cls.TCC_USER["email"], password=cls.TCC_USER["password"]
+        )
+        cls.cookie_captain = get_user_model().objects.create_user(
+            email=cls.COOKIE_CAPTAIN_USER["email"],
+            password=cls.COOKIE_CAPTAIN_USER["password"],
+        )
+        cls.cookie_captain.user_permissions.add(
+            Permission.objects.get(name=PERMISSION_COOKIE_CAPTAIN_RESERVE_BOOTH)
+        )
+        cls.tcc_user.user_permissions.add(Permission.objects.get(name=PERMISSION_RESERVE_BOOTH))
+
+        Troop.objects.create(
+            troop_number=cls.TROOP_NUMBER,
+            troop_cookie_coordinator=cls.TCC_USER["email"],
+            troop_level=2,
+        )
+
+        location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        day = BoothDay.objects.create(booth=location, booth_day_date=TEST_DATE)
+        day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+        day.enable_day()
+
+        # Four blocks: one free, one ours, one someone else's, one held for cookie captains
+        cls.free_block, cls.own_block, cls.other_block, cls.held_block = BoothBlock.objects.order_by(
+            "booth_block_start_time"
+        )
+        cls.own_block.reserve_block(cls.TROOP_NUMBER, 0)
+        cls.other_block.reserve_block(cls.OTHER_TROOP_NUMBER, 0)
+        cls.held_block.hold_for_cookie_captains()
+
+        return super().setUpTestData()
+
+    def test_status_for_tcc(self):
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+        response = self._get_status(
+            [self.free_block.id, self.own_block.id, self.other_block.id, self.held_block.id]
+        )
+
+        self.assertTrue(response["is_success"])
+        blocks = response["blocks"]
+        self.assertEqual(
+            blocks[str(self.free_block.id)],
+            {
+                "enabled": True,
+                "reserved": False,
+                "reserved_by_user": False,
+                "daisy_reserved": False,
+                "held": False,
+            },
+        )
+        self.assertTrue(blocks[str(self.own_block.id)]["reserved_by_user"])
+        self.assertFalse(blocks[str(self.own_block.id)]["reserved"])
+        self.assertTrue(blocks[str(self.other_block.id)]["reserved"])
+        self.assertFalse(blocks[str(self.other_block.id)]["reserved_by_user"])
+        # Only cookie captains can see blocks held for them
+        self.assertNotIn(str(self.held_block.id), blocks)
+
+    def test_status_for_cookie_captain(self):
+        self.other_block.cancel_block()
+        self.other_block.reserve_block(0, self.cookie_captain.id)
+
+        self.client.login(
+            email=self.COOKIE_CAPTAIN_USER["email"], password=self.COOKIE_CAPTAIN_USER["password"]
+        )
+        blocks = self._get_status([self.own_block.id, self.other_block.id])["blocks"]
+
+        self.assertTrue(blocks[str(self.other_block.id)]["reserved_by_user"])
+        self.assertTrue(blocks[str(self.own_block.id)]["reserved"])
+        self.assertFalse(blocks[str(self.own_block.id)]["reserved_by_user"])
+
+    def test_status_held_for_cookie_captain(self):
+        self.client.login(
+            email=self.COOKIE_CAPTAIN_USER["email"], password=self.COOKIE_CAPTAIN_USER["password"]
+        )
+        blocks = self._get_status([self.held_block.id])["blocks"]
+
+        self.assertTrue(blocks[str(self.held_block.id)]["held"])
+
+    def test_status_hidden_blocks_left_out(self):
+        self.free_block.disable_block()
+        past_day = BoothDay.objects.create(
+            booth=self.free_block.booth_day.booth, booth_day_date=datetime.date(2023, 2, 4)
+        )
+        past_day.add_or_update_hours(
+            make_aware(datetime.datetime(2023, 2, 4, 8, 0)),
+            make_aware(datetime.datetime(2023, 2, 4, 10, 0)),
+        )
+        past_day.enable_day()
+        past_block = BoothBlock.objects.get(booth_day=past_day)
+
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+        blocks = self._get_status([self.free_block.id, past_block.id, self.own_block.id])["blocks"]
+
+        # Disabled blocks and blocks that have already started are hidden from everyone
+        self.assertEqual(list(blocks), [str(self.own_block.id)])
+
+    def test_status_uses_one_block_query(self):
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+        block_ids = list(BoothBlock.objects.values_list("id", flat=True))
+
+        with CaptureQueriesContext(connection) as queries:
+            self._get_status(block_ids)
+
+        block_queries = [
+            query for query in queries.captured_queries if "cookie_booths_boothblock" in query["sql"]
+        ]
+        self.assertEqual(len(block_queries), 1)
+
+    def test_status_unknown_and_invalid_ids(self):
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+
+        # Unknown blocks are simply left out
+        self.assertEqual(self._get_status([999999])["blocks"], {})
+
+        response = self.client.get(reverse("cookie_booths:block_status"), {"block_ids": "1,abc"})
+        self.assertFalse(json.loads(response.content)["is_success"])
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    def _get_status(self, block_ids):
+        response = self.client.get(
+            reverse("cookie_booths:block_status"),
+            {"block_ids": ",".join(str(block_id) for block_id in block_ids)},
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
@@ -0,0 +1,167 @@
+# Tests for the columnar week calendar of booth blocks
+import datetime
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+from cookie_booths.rows import get_booth_block_rows
+from cookie_booths.views import (
+    CALENDAR_AVAILABLE,
+    CALENDAR_HELD_FOR_COOKIE_CAPTAINS,
+    CALENDAR_RESERVED,
+    CALENDAR_RESERVED_BY_USER,
+)
+from troops.models import Troop
+
+PERMISSION_RESERVE_BOOTH = "Reserve/Cancel a booth"
+
+# A Monday far enough ahead that every block is still upcoming
+WEEK_START = datetime.date.today() + datetime.timedelta(
+    days=28 - datetime.date.today().weekday()
+)
+
+
+class BoothCalendarTestCase(TestCase):
+
+    TCC_USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    TROOP_NUMBER = 300
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        tcc_user = get_user_model().objects.create_user(
+            email=cls.TCC_USER["email"], password=cls.TCC_USER["password"]
+        )
+        tcc_user.user_permissions.add(Permission.objects.get(name=PERMISSION_RESERVE_BOOTH))
+        Troop.objects.create(
+            troop_number=cls.TROOP_NUMBER,
+            troop_cookie_coordinator=cls.TCC_USER["email"],
+            troop_level=2,
+        )
+
+        # Every day of the week at three locations, plus a day the following week
+        cls.locations = [
+            BoothLocation.objects.create(booth_location=f"Location {number}") for number in range(3)
+        ]
+        for location in cls.locations:
+            for offset in range(8):
+                cls._create_day(location, WEEK_START + datetime.timedelta(days=offset))
+
+        cls.own_block, cls.other_block, cls.held_block = BoothBlock.objects.filter(
+            booth_day__booth_day_date=WEEK_START, booth_day__booth=cls.locations[0]
+        ).order_by("booth_block_start_time")[:3]
+        cls.own_block.reserve_block(cls.TROOP_NUMBER, 0)
+        cls.other_block.reserve_block(301, 0)
+        cls.held_block.hold_for_cookie_captains()
+
+        return super().setUpTestData()
+
+    def setUp(self) -> None:
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+
+    def test_calendar_payload(self):
+        payload = self._get_calendar(week=(WEEK_START + datetime.timedelta(days=3)).isoformat())
+
+        self.assertTrue(payload["is_success"])
+        self.assertEqual(
+            payload["locations"],
+            {str(location.id): location.booth_location for location in self.locations},
+        )
+        self.assertEqual(payload["dates"][0], WEEK_START.isoformat())
+        self.assertEqual(len(payload["dates"]), 7)
+        self.assertEqual(payload["slots"], ["08:00", "10:00", "12:00", "14:00"])
+
+        # Held blocks aren't shown to troops, and the following week isn't included
+        blocks = payload["blocks"]
+        self.assertEqual(len(blocks["id"]), 3 * 7 * 4 - 1)
+        self.assertNotIn(self.held_block.id, blocks["id"])
+        for column in ("location", "date", "slot", "state"):
+            self.assertEqual(len(blocks[column]), len(blocks["id"]))
+
+        states = dict(zip(blocks["id"], blocks["state"]))
+        self.assertEqual(states[self.own_block.id], CALENDAR_RESERVED_BY_USER)
+        self.assertEqual(states[self.other_block.id], CALENDAR_RESERVED)
+        self.assertEqual(
+            set(states.values()), {CALENDAR_AVAILABLE, CALENDAR_RESERVED, CALENDAR_RESERVED_BY_USER}
+        )
+        self.assertIn(str(CALENDAR_HELD_FOR_COOKIE_CAPTAINS), payload["states"])
+
+        index = blocks["id"].index(self.other_block.id)
+        self.assertEqual(blocks["location"][index], self.locations[0].id)
+        self.assertEqual(payload["dates"][blocks["date"][index]], WEEK_START.isoformat())
+        self.assertEqual(payload["slots"][blocks["slot"][index]], "10:00")
+
+    def test_calendar_location_filter(self):
+        payload = self._get_calendar(week=WEEK_START.isoformat(), location=self.locations[1].id)
+
+        self.assertEqual(list(payload["locations"]), [str(self.locations[1].id)])
+        self.assertEqual(set(payload["blocks"]["location"]), {self.locations[1].id})
+
+    def test_calendar_uses_one_block_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._get_calendar(week=WEEK_START.isoformat())
+
+        block_queries = [
+            query for query in queries.captured_queries if "cookie_booths_boothblock" in query["sql"]
+        ]
+        self.assertEqual(len(block_queries), 1)
+
+    def test_calendar_smaller_than_html_rows(self):
+        response = self.client.get(
+            reverse("cookie_booths:booth_calendar"), {"week": WEEK_START.isoformat()}
+        )
+        booth_blocks = BoothBlock.objects.filter(
+            booth_day__booth_day_date__lt=WEEK_START + datetime.timedelta(days=7)
+        ).for_table()
+        rows = render_to_string(
+            "cookie_booths/booth_block_rows.html",
+            {"booth_blocks": get_booth_block_rows(booth_blocks)},
+        )
+
+        self.assertLess(len(response.content) * 10, len(rows.encode()))
+
+    @override_settings(BOOTH_TIME_ZONE="America/New_York")
+    def test_calendar_defaults_to_booth_week(self):
+        # Late on Sunday evening where the booths are is already Monday in UTC
+        now = datetime.datetime(2024, 3, 11, 2, 0, tzinfo=datetime.timezone.utc)
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            payload = self._get_calendar()
+
+        self.assertEqual(payload["dates"][0], "2024-03-04")
+
+    def test_calendar_invalid_week(self):
+        payload = self._get_calendar(week="next tuesday")
+        self.assertFalse(payload["is_success"])
+
+    def test_calendar_invalid_location(self):
+        payload = self._get_calendar(week=WEEK_START.isoformat(), location="abc")
+        self.assertFalse(payload["is_success"])
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    @staticmethod
+    def _create_day(location, date):
+        day = BoothDay.objects.create(booth=location, booth_day_date=date)
+        day.add_or_update_hours(
+            make_aware(datetime.datetime.combine(date, datetime.time(8, 0))),
+            make_aware(datetime.datetime.combine(date, datetime.time(16, 0))),
+        )
+        day.enable_day()
+
+    def _get_calendar(self, **params):
+        response = self.client.get(reverse("cookie_booths:booth_calendar"), params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
@@ -0,0 +1,208 @@
+# Tests for the lightweight rows behind the booth block tables
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+from cookie_booths.rows import (
+    ACTION_CANCEL,
+    ACTION_CANCEL_OR_UNHOLD,
+    ACTION_DISABLE,
+    ACTION_NONE,
+    ACTION_RESERVE,
+    ACTION_RESERVE_OR_HOLD,
+    ACTION_UNHOLD,
+    BoothBlockRow,
+    get_booth_block_row,
+    get_booth_block_rows,
+)
+
+TEST_DATE = datetime.date(2023, 2, 4)
+OPEN_TIME = make_aware(datetime.datetime(2023, 2, 4, 8, 0, 0, 0))
+CLOSE_TIME = make_aware(datetime.datetime(2023, 2, 4, 16, 0, 0, 0))
+TROOP_NUMBER = 300
+
+
+def _user_context(**overrides):
+    user_context = {
+        "user_id": None,
+        "troop_number": TROOP_NUMBER,
+        "is_cookie_captain": False,
+        "permission_level": "tcc",
+    }
+    user_context.update(overrides)
+    return user_context
+
+
+class BoothBlockRowTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.cookie_captain = get_user_model().objects.create_user(
+            email="captain@troop.org", password="secret", first_name="Rick", last_name="Astley"
+        )
+
+        location = BoothLocation.objects.create(
+            booth_location="Dunkin Donuts", booth_requires_masks=True
+        )
+        day = BoothDay.objects.create(booth=location, booth_day_date=TEST_DATE)
+        day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+        day.enable_day()
+
+        cls.own_block, cls.cookie_captain_block, cls.free_block = BoothBlock.objects.order_by(
+            "booth_block_start_time"
+        )[:3]
+        cls.own_block.reserve_block(TROOP_NUMBER, 0)
+        cls.cookie_captain_block.reserve_block(0, cls.cookie_captain.id)
+
+        return super().setUpTestData()
+
+    def test_rows_carry_block_values(self):
+        rows = get_booth_block_rows(BoothBlock.objects.for_table(), _user_context())
+
+        self.assertEqual(len(rows), 4)
+        row = rows[0]
+        self.assertEqual(row.id, self.own_block.id)
+        self.assertEqual(row.day_id, self.own_block.booth_day_id)
+        self.assertEqual(row.location, "Dunkin Donuts")
+        self.assertTrue(row.requires_masks)
+        self.assertEqual(row.date, TEST_DATE)
+        self.assertEqual(row.start_time, OPEN_TIME)
+        self.assertTrue(row.reserved)
+        self.assertEqual(row.troop_owner, TROOP_NUMBER)
+
+        # Rows only carry their slots
+        self.assertFalse(hasattr(row, "__dict__"))
+        with self.assertRaises(AttributeError):
+            row.booth_day = None
+
+    def test_ownership(self):
+        rows = self._get_rows(_user_context())
+
+        self.assertTrue(rows[self.own_block.id].owned_by_current_user)
+        self.assertFalse(rows[self.own_block.id].owned_by_cookie_captain)
+        self.assertFalse(rows[self.free_block.id].owned_by_current_user)
+
+        cookie_captain_row = rows[self.cookie_captain_block.id]
+        self.assertFalse(cookie_captain_row.owned_by_current_user)
+        self.assertTrue(cookie_captain_row.owned_by_cookie_captain)
+        self.assertEqual(
+            cookie_captain_row.cookie_captain_label,
+            "Cookie Captain: Rick Astley || Contact: captain@troop.org",
+        )
+
+    def test_cookie_captain_rows(self):
+        user_context = _user_context(
+            user_id=self.cookie_captain.id, troop_number=0, is_cookie_captain=True
+        )
+        booth_blocks_ = BoothBlock.objects.filter(id=self.cookie_captain_block.id)
+        rows = get_booth_block_rows(booth_blocks_, user_context, short_label=True)
+
+        self.assertTrue(rows[0].owned_by_current_user)
+        self.assertEqual(rows[0].cookie_captain_label, "Rick")
+
+    def test_rows_without_user(self):
+        rows = get_booth_block_rows(BoothBlock.objects.all())
+
+        self.assertTrue(all(row.owned_by_current_user is None for row in rows))
+        self.assertFalse(any(row.owned_by_cookie_captain for row in rows))
+        self.assertTrue(all(row.action == ACTION_DISABLE for row in rows))
+
+    def test_labels(self):
+        row = get_booth_block_rows(BoothBlock.objects.for_table())[0]
+
+        self.assertEqual(row.date_label, "02/04")
+        self.assertEqual(row.day_label, "Sat")
+        self.assertEqual(row.start_label, "08:00 AM")
+        self.assertEqual(row.end_label, "10:00 AM")
+
+    def test_tcc_actions(self):
+        rows = self._get_rows(_user_context())
+
+        self.assertEqual(rows[self.own_block.id].action, ACTION_CANCEL)
+        self.assertEqual(rows[self.free_block.id].action, ACTION_RESERVE)
+        self.assertEqual(rows[self.free_block.id].for_daisy, 0)
+        self.assertEqual(rows[self.cookie_captain_block.id].action, ACTION_NONE)
+        self.assertEqual(
+            rows[self.cookie_captain_block.id].status,
+            [
+                "Reserved by Cookie Captain "
+                "Cookie Captain: Rick Astley || Contact: captain@troop.org"
+            ],
+        )
+
+    def test_daisy_actions(self):
+        self.cookie_captain_block.reserve_daisy_block(100)
+        rows = self._get_rows(_user_context(troop_number=100, permission_level="daisy"))
+
+        cookie_captain_row = rows[self.cookie_captain_block.id]
+        self.assertEqual(cookie_captain_row.action, ACTION_CANCEL)
+        self.assertEqual(cookie_captain_row.for_daisy, 1)
+
+        rows = self._get_rows(_user_context(troop_number=101, permission_level="daisy"))
+        self.assertEqual(rows[self.cookie_captain_block.id].action, ACTION_NONE)
+        self.assertEqual(rows[self.cookie_captain_block.id].status, ["Reserved by 100"])
+
+    def test_admin_actions(self):
+        held_block = BoothBlock.objects.order_by("booth_block_start_time").last()
+        held_block.hold_for_cookie_captains()
+        rows = self._get_rows(_user_context(troop_number=None, permission_level="admin"))
+
+        self.assertEqual(rows[self.free_block.id].action, ACTION_RESERVE_OR_HOLD)
+        self.assertEqual(rows[self.own_block.id].action, ACTION_CANCEL)
+        self.assertEqual(rows[self.own_block.id].status, [f"Reserved by {TROOP_NUMBER}"])
+        self.assertEqual(rows[held_block.id].action, ACTION_UNHOLD)
+
+        held_block.reserve_block(0, self.cookie_captain.id)
+        held_block.reserve_daisy_block(100)
+        rows = self._get_rows(_user_context(troop_number=None, permission_level="admin"))
+        self.assertEqual(rows[held_block.id].action, ACTION_CANCEL_OR_UNHOLD)
+        self.assertEqual(len(rows[held_block.id].status), 3)
+
+    def test_row_html(self):
+        rows = self._get_rows(_user_context())
+        html = render_to_string(
+            "cookie_booths/booth_block_row.html", {"block": rows[self.own_block.id]}
+        )
+
+        self.assertTrue(html.startswith(f'<tr id="block-{self.own_block.id}"'))
+        self.assertIn(f"CancelBooth({self.own_block.id}, 0)", html)
+        self.assertNotIn("Reserve Booth", html)
+
+    def test_queries(self):
+        # The blocks, then the cookie captains who own any of them
+        with self.assertNumQueries(2):
+            get_booth_block_rows(BoothBlock.objects.for_table(), _user_context())
+
+        with self.assertNumQueries(1):
+            get_booth_block_rows(BoothBlock.objects.for_table())
+
+    def test_row_from_loaded_block(self):
+        block = BoothBlock.objects.for_table().get(id=self.cookie_captain_block.id)
+        row = get_booth_block_row(block, _user_context())
+        expected = get_booth_block_rows(BoothBlock.objects.filter(id=block.id), _user_context())[0]
+
+        for attribute in BoothBlockRow.__slots__:
+            self.assertEqual(getattr(row, attribute), getattr(expected, attribute), attribute)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_booth_rows", rows=40, repeat=1, stdout=out)
+
+        self.assertIn("40 blocks", out.getvalue())
+        self.assertIn("BoothBlockRow", out.getvalue())
+        self.assertIn("Rendering rows as daisy", out.getvalue())
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    @staticmethod
+    def _get_rows(user_context):
+        return {
+            row.id: row
+            for row in get_booth_block_rows(BoothBlock.objects.for_table(), user_context)
+        }
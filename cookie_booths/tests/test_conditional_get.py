@@ -0,0 +1,117 @@
+# Tests for answering 304 Not Modified on the booth listing pages
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+from troops.models import Troop
+
+PERMISSION_RESERVE_BOOTH = "Reserve/Cancel a booth"
+PERMISSION_TOGGLE_DAY = "Enable/Disable a day for a booth"
+
+# Far enough in the future that the blocks are still shown on booth_blocks
+TEST_DATE = datetime.date.today() + datetime.timedelta(days=30)
+OPEN_TIME = make_aware(datetime.datetime.combine(TEST_DATE, datetime.time(8, 0)))
+CLOSE_TIME = make_aware(datetime.datetime.combine(TEST_DATE, datetime.time(12, 0)))
+
+
+class ConditionalGetTestCase(TestCase):
+
+    TCC_USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    TROOP_NUMBER = 300
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.tcc_user = get_user_model().objects.create_user(
+            email=cls.TCC_USER["email"], password=cls.TCC_USER["password"]
+        )
+        cls.tcc_user.user_permissions.add(Permission.objects.get(name=PERMISSION_RESERVE_BOOTH))
+        cls.tcc_user.user_permissions.add(Permission.objects.get(name=PERMISSION_TOGGLE_DAY))
+
+        Troop.objects.create(
+            troop_number=cls.TROOP_NUMBER,
+            troop_cookie_coordinator=cls.TCC_USER["email"],
+            troop_level=2,
+        )
+
+        location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        cls.day = BoothDay.objects.create(booth=location, booth_day_date=TEST_DATE)
+        cls.day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+        cls.day.enable_day()
+
+        return super().setUpTestData()
+
+    def setUp(self) -> None:
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+
+    def test_booth_blocks_not_modified(self):
+        etag = self._get_etag("cookie_booths:booth_blocks")
+
+        response = self.client.get(reverse("cookie_booths:booth_blocks"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_booth_blocks_modified_after_reservation(self):
+        etag = self._get_etag("cookie_booths:booth_blocks")
+
+        BoothBlock.objects.order_by("booth_block_start_time").first().reserve_block(
+            self.TROOP_NUMBER, 0
+        )
+
+        response = self.client.get(reverse("cookie_booths:booth_blocks"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_booth_reservations_modified_after_troop_change(self):
+        etag = self._get_etag("cookie_booths:booth_reservations")
+
+        # Nothing about the booths changed, but the user now belongs to a different troop
+        Troop.objects.filter(troop_number=self.TROOP_NUMBER).update(troop_number=301)
+
+        response = self.client.get(
+            reverse("cookie_booths:booth_reservations"), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_enable_or_disable_day_modified_after_toggle(self):
+        etag = self._get_etag("cookie_booths:enable_day")
+
+        response = self.client.get(reverse("cookie_booths:enable_day"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.day.disable_day()
+
+        response = self.client.get(reverse("cookie_booths:enable_day"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_modified_after_day_deleted(self):
+        other_day = BoothDay.objects.create(
+            booth=self.day.booth, booth_day_date=TEST_DATE + datetime.timedelta(days=1)
+        )
+        etag = self._get_etag("cookie_booths:enable_day")
+
+        # Deleting leaves no newer timestamp behind, so the counts have to catch it
+        other_day.delete()
+
+        response = self.client.get(reverse("cookie_booths:enable_day"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    def _get_etag(self, url_name):
+        # The first page load hands out the CSRF cookie, which is part of the ETag from then on
+        self.client.get(reverse(url_name))
+        response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+        self.assertIn("private", response["Cache-Control"])
+        return response["ETag"]
@@ -0,0 +1,97 @@
+# Tests for the location summary on the enable-by-block page
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+
+PERMISSION_TOGGLE_DAY = "Enable/Disable a day for a booth"
+
+TEST_DATE = datetime.date(2023, 2, 4)
+OPEN_TIME = make_aware(datetime.datetime(2023, 2, 4, 8, 0, 0, 0))
+CLOSE_TIME = make_aware(datetime.datetime(2023, 2, 4, 12, 0, 0, 0))
+
+
+class EnableByLocationTestCase(TestCase):
+
+    ADMIN_USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.admin_user = get_user_model().objects.create_user(
+            email=cls.ADMIN_USER["email"], password=cls.ADMIN_USER["password"]
+        )
+        cls.admin_user.user_permissions.add(Permission.objects.get(name=PERMISSION_TOGGLE_DAY))
+
+        cls.location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        cls.other_location = BoothLocation.objects.create(booth_location="Stop & Shop")
+
+        # Two days at the first location, one enabled and with a reservation
+        for date in (TEST_DATE, TEST_DATE + datetime.timedelta(days=1)):
+            day = BoothDay.objects.create(booth=cls.location, booth_day_date=date)
+            day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+        cls.enabled_day = BoothDay.objects.get(booth=cls.location, booth_day_date=TEST_DATE)
+        cls.enabled_day.enable_day()
+        BoothBlock.objects.filter(booth_day=cls.enabled_day).first().reserve_block(300, 0)
+
+        other_day = BoothDay.objects.create(booth=cls.other_location, booth_day_date=TEST_DATE)
+        other_day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+
+        return super().setUpTestData()
+
+    def setUp(self) -> None:
+        self.client.login(email=self.ADMIN_USER["email"], password=self.ADMIN_USER["password"])
+
+    def test_summary(self):
+        response = self.client.get(reverse("cookie_booths:enable_location_by_block"))
+        self.assertEqual(response.status_code, 200)
+
+        locations = response.context["locations"]
+        self.assertEqual(
+            [location["booth_location"] for location in locations],
+            ["Dunkin Donuts", "Stop & Shop"],
+        )
+
+        location = locations[0]
+        self.assertEqual(location["total_blocks"], 4)
+        self.assertEqual(location["enabled_blocks"], 2)
+        self.assertEqual(location["reserved_blocks"], 1)
+        self.assertEqual(len(location["days"]), 2)
+        self.assertEqual(location["days"][0]["booth_day"], self.enabled_day.id)
+        self.assertEqual(location["days"][0]["disabled_blocks"], 0)
+        self.assertEqual(location["days"][1]["disabled_blocks"], 2)
+
+        # No blocks are rendered until a location is expanded
+        self.assertNotContains(response, 'id="block-')
+
+    def test_location_blocks(self):
+        response = self.client.get(
+            reverse("cookie_booths:enable_location_blocks", args=[self.location.id])
+        )
+        message_response = json.loads(response.content)
+
+        self.assertTrue(message_response["is_success"])
+        for block in BoothBlock.objects.all():
+            row_id = f'id="block-{block.id}"'
+            if block.booth_day.booth_id == self.location.id:
+                self.assertIn(row_id, message_response["rows"])
+            else:
+                self.assertNotIn(row_id, message_response["rows"])
+        self.assertEqual(message_response["rows"].count("Disable Booth"), 2)
+        self.assertEqual(message_response["rows"].count("Enable Booth"), 2)
+
+    def test_location_blocks_without_permission(self):
+        self.admin_user.user_permissions.clear()
+
+        response = self.client.get(
+            reverse("cookie_booths:enable_location_blocks", args=[self.location.id])
+        )
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,149 @@
+# Tests for exporting booth reservations
+import csv
+import datetime
+import io
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.exports import EXPORT_HEADER
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+from troops.models import Troop
+
+PERMISSION_RESERVE_BOOTH = "Reserve/Cancel a booth"
+PERMISSION_ADMIN = (
+    "Administrator reserve/cancel any booth, or hold booths for cookie captains to reserve"
+)
+
+TEST_DATE = datetime.date(2023, 2, 4)
+OPEN_TIME = make_aware(datetime.datetime(2023, 2, 4, 8, 0, 0, 0))
+CLOSE_TIME = make_aware(datetime.datetime(2023, 2, 4, 12, 0, 0, 0))
+
+
+class ReservationExportTestCase(TestCase):
+
+    TCC_USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    ADMIN_USER = {
+        "email": "nevergonna@letyou.down",
+        "password": "secret",
+    }
+
+    TROOP_NUMBER = 300
+    OTHER_TROOP_NUMBER = 301
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        tcc_user = get_user_model().objects.create_user(
+            email=cls.TCC_USER["email"], password=cls.TCC_USER["password"]
+        )
+        tcc_user.user_permissions.add(Permission.objects.get(name=PERMISSION_RESERVE_BOOTH))
+        admin_user = get_user_model().objects.create_user(
+            email=cls.ADMIN_USER["email"], password=cls.ADMIN_USER["password"]
+        )
+        admin_user.user_permissions.add(Permission.objects.get(name=PERMISSION_ADMIN))
+
+        Troop.objects.create(
+            troop_number=cls.TROOP_NUMBER,
+            troop_cookie_coordinator=cls.TCC_USER["email"],
+            troop_level=2,
+        )
+
+        cls.location = BoothLocation.objects.create(
+            booth_location="Dunkin Donuts", booth_address="1 Main St, Anytown"
+        )
+        other_location = BoothLocation.objects.create(booth_location="Stop & Shop")
+        for location in (cls.location, other_location):
+            day = BoothDay.objects.create(booth=location, booth_day_date=TEST_DATE)
+            day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+            day.enable_day()
+
+        # Our troop has the first block at each location, the other troop the second
+        for location in (cls.location, other_location):
+            first_block, second_block = BoothBlock.objects.filter(
+                booth_day__booth=location
+            ).order_by("booth_block_start_time")[:2]
+            first_block.reserve_block(cls.TROOP_NUMBER, 0)
+            second_block.reserve_block(cls.OTHER_TROOP_NUMBER, 0)
+
+        return super().setUpTestData()
+
+    def test_csv_only_own_reservations(self):
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+        rows = self._get_csv()
+
+        self.assertEqual(tuple(rows[0]), EXPORT_HEADER)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(
+            rows[1],
+            [
+                "Dunkin Donuts",
+                "1 Main St, Anytown",
+                "02/04/2023",
+                "Sat",
+                "08:00 AM",
+                "10:00 AM",
+                str(self.TROOP_NUMBER),
+                "",
+                "",
+                "No",
+            ],
+        )
+
+    def test_csv_admin_with_filters(self):
+        self.client.login(email=self.ADMIN_USER["email"], password=self.ADMIN_USER["password"])
+
+        self.assertEqual(len(self._get_csv()), 5)
+        self.assertEqual(len(self._get_csv(troop=self.OTHER_TROOP_NUMBER)), 3)
+        self.assertEqual(len(self._get_csv(location=self.location.id)), 3)
+        self.assertEqual(len(self._get_csv(start_date="2023-02-05")), 1)
+
+    def test_csv_formulas_not_run(self):
+        BoothLocation.objects.filter(id=self.location.id).update(
+            booth_location='=HYPERLINK("http://example.com")', booth_address="@SUM(A1)"
+        )
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+        rows = self._get_csv()
+
+        self.assertEqual(rows[1][0], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(rows[1][1], "'@SUM(A1)")
+        self.assertEqual(rows[1][2], "02/04/2023")
+
+    def test_xlsx(self):
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+        response = self.client.get(reverse("cookie_booths:export_reservations"), {"format": "xlsx"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        workbook = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 3)
+        self.assertIn("1 Main St, Anytown", sheet)
+        self.assertIn("Stop &amp; Shop", sheet)
+
+    def test_invalid_filters(self):
+        self.client.login(email=self.TCC_USER["email"], password=self.TCC_USER["password"])
+        response = self.client.get(
+            reverse("cookie_booths:export_reservations"),
+            {"start_date": "2023-02-05", "end_date": "2023-02-04"},
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    def _get_csv(self, **filters):
+        response = self.client.get(reverse("cookie_booths:export_reservations"), filters)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
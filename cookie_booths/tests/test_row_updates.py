@@ -0,0 +1,80 @@
+# Tests for the AJAX endpoints returning a single updated row
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+
+PERMISSION_TOGGLE_DAY = "Enable/Disable a day for a booth"
+
+TEST_DATE = datetime.date(2023, 2, 4)
+OPEN_TIME = make_aware(datetime.datetime(2023, 2, 4, 8, 0, 0, 0))
+CLOSE_TIME = make_aware(datetime.datetime(2023, 2, 4, 12, 0, 0, 0))
+
+
+class RowUpdateTestCase(TestCase):
+
+    ADMIN_USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.admin_user = get_user_model().objects.create_user(
+            email=cls.ADMIN_USER["email"], password=cls.ADMIN_USER["password"]
+        )
+        cls.admin_user.user_permissions.add(Permission.objects.get(name=PERMISSION_TOGGLE_DAY))
+
+        cls.location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        cls.day = BoothDay.objects.create(booth=cls.location, booth_day_date=TEST_DATE)
+        cls.day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+        cls.day.save()
+
+        cls.block = BoothBlock.objects.first()
+
+        return super().setUpTestData()
+
+    def setUp(self) -> None:
+        self.client.login(email=self.ADMIN_USER["email"], password=self.ADMIN_USER["password"])
+
+    def test_enable_block_returns_row(self):
+        response = self.client.post(
+            reverse("cookie_booths:ajax_enable_location_by_block", args=[self.block.id])
+        )
+        message_response = json.loads(response.content)
+
+        # Only the toggled row comes back, now offering to disable the block
+        self.assertTrue(message_response["is_success"])
+        self.assertIn(f'id="block-{self.block.id}"', message_response["row"])
+        self.assertIn("Disable Booth", message_response["row"])
+        self.assertNotIn("Enable Booth", message_response["row"])
+        self.assertTrue(BoothBlock.objects.get(id=self.block.id).booth_block_enabled)
+
+    def test_disable_day_returns_row(self):
+        self.day.enable_day()
+
+        response = self.client.post(reverse("cookie_booths:ajax_disable_day"), {"booth_id": self.day.id})
+        message_response = json.loads(response.content)
+
+        self.assertTrue(message_response["is_success"])
+        self.assertIn(f'id="day-{self.day.id}"', message_response["row"])
+        self.assertIn("Enable Day", message_response["row"])
+        self.assertFalse(BoothDay.objects.get(id=self.day.id).booth_day_enabled)
+
+    def test_toggle_without_permission(self):
+        self.admin_user.user_permissions.clear()
+
+        response = self.client.post(
+            reverse("cookie_booths:ajax_enable_location_by_block", args=[self.block.id])
+        )
+        message_response = json.loads(response.content)
+
+        self.assertFalse(message_response["is_success"])
+        self.assertIsNone(message_response["row"])
+        self.assertFalse(BoothBlock.objects.get(id=self.block.id).booth_block_enabled)
@@ -0,0 +1,122 @@
+# Tests for enabling and disabling booth days across a date range
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock
+
+PERMISSION_TOGGLE_DAY = "Enable/Disable a day for a booth"
+
+TEST_DATE = datetime.date(2023, 2, 4)
+OPEN_TIME = make_aware(datetime.datetime(2023, 2, 4, 8, 0, 0, 0))
+CLOSE_TIME = make_aware(datetime.datetime(2023, 2, 4, 12, 0, 0, 0))
+
+
+class ToggleDaysInRangeTestCase(TestCase):
+
+    ADMIN_USER = {
+        "email": "nevergonna@giveyou.up",
+        "password": "secret",
+    }
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.admin_user = get_user_model().objects.create_user(
+            email=cls.ADMIN_USER["email"], password=cls.ADMIN_USER["password"]
+        )
+        cls.admin_user.user_permissions.add(Permission.objects.get(name=PERMISSION_TOGGLE_DAY))
+
+        # Three days at each of two locations, two blocks per day
+        cls.location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        cls.other_location = BoothLocation.objects.create(booth_location="Stop & Shop")
+        for location in (cls.location, cls.other_location):
+            for offset in range(3):
+                day = BoothDay.objects.create(
+                    booth=location, booth_day_date=TEST_DATE + datetime.timedelta(days=offset)
+                )
+                day.add_or_update_hours(OPEN_TIME, CLOSE_TIME)
+                day.save()
+
+        return super().setUpTestData()
+
+    def setUp(self) -> None:
+        self.client.login(email=self.ADMIN_USER["email"], password=self.ADMIN_USER["password"])
+
+    def test_enable_range_at_location(self):
+        message_response = self._toggle(
+            "enable", TEST_DATE, TEST_DATE + datetime.timedelta(days=1), [self.location.id]
+        )
+
+        self.assertTrue(message_response["is_success"])
+        self.assertTrue(message_response["enabled"])
+        self.assertEqual(message_response["days_updated"], 2)
+        self.assertEqual(message_response["blocks_updated"], 4)
+
+        enabled_days = BoothDay.objects.filter(booth_day_enabled=True)
+        self.assertEqual(
+            sorted(message_response["rows"]), sorted(str(day.id) for day in enabled_days)
+        )
+        self.assertTrue(all(day.booth == self.location for day in enabled_days))
+        self.assertEqual(BoothBlock.objects.filter(booth_block_enabled=True).count(), 4)
+        for row in message_response["rows"].values():
+            self.assertIn("Disable Day", row)
+
+    def test_disable_every_location(self):
+        BoothDay.objects.get(booth=self.location, booth_day_date=TEST_DATE).enable_day()
+        BoothDay.objects.get(booth=self.other_location, booth_day_date=TEST_DATE).enable_day()
+
+        message_response = self._toggle("disable", TEST_DATE, TEST_DATE)
+
+        self.assertEqual(message_response["days_updated"], 2)
+        self.assertEqual(message_response["blocks_updated"], 4)
+        self.assertFalse(BoothBlock.objects.filter(booth_block_enabled=True).exists())
+
+    def test_days_already_in_state_are_left_alone(self):
+        # A block disabled by hand on an enabled day stays disabled
+        day = BoothDay.objects.get(booth=self.location, booth_day_date=TEST_DATE)
+        day.enable_day()
+        BoothBlock.objects.filter(booth_day=day).first().disable_block()
+
+        message_response = self._toggle("enable", TEST_DATE, TEST_DATE, [self.location.id])
+
+        self.assertEqual(message_response["days_updated"], 0)
+        self.assertEqual(message_response["blocks_updated"], 0)
+        self.assertEqual(message_response["rows"], {})
+        self.assertEqual(
+            BoothBlock.objects.filter(booth_day=day, booth_block_enabled=True).count(), 1
+        )
+
+    def test_invalid_range(self):
+        message_response = self._toggle("enable", TEST_DATE + datetime.timedelta(days=1), TEST_DATE)
+
+        self.assertFalse(message_response["is_success"])
+        self.assertFalse(BoothDay.objects.filter(booth_day_enabled=True).exists())
+
+    def test_without_permission(self):
+        self.admin_user.user_permissions.clear()
+
+        message_response = self._toggle("enable", TEST_DATE, TEST_DATE)
+
+        self.assertFalse(message_response["is_success"])
+        self.assertFalse(BoothDay.objects.filter(booth_day_enabled=True).exists())
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    def _toggle(self, action, start_date, end_date, locations=()):
+        response = self.client.post(
+            reverse("cookie_booths:ajax_toggle_days_in_range"),
+            {
+                "action": action,
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "locations": list(locations),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
@@ -0,0 +1,62 @@
+# Tests for working out which booth blocks are still upcoming
+import datetime
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from cookie_booths.models import BoothLocation, BoothDay, BoothBlock, get_upcoming_window_start
+
+TEST_DATE = datetime.date(2024, 3, 9)
+
+
+@override_settings(BOOTH_TIME_ZONE="America/New_York", BOOTH_BLOCK_GRACE_MINUTES=90)
+class UpcomingBlocksTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        # Block times are the booth's wall clock time, labelled as UTC
+        location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        day = BoothDay.objects.create(booth=location, booth_day_date=TEST_DATE)
+        day.add_or_update_hours(
+            datetime.datetime(2024, 3, 9, 8, 0, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2024, 3, 9, 16, 0, tzinfo=datetime.timezone.utc),
+        )
+        day.enable_day()
+
+        return super().setUpTestData()
+
+    def test_window_start_in_winter(self):
+        # 3:00 PM UTC is 10:00 AM EST, less the 90 minute grace period
+        now = datetime.datetime(2024, 1, 15, 15, 0, 30, tzinfo=datetime.timezone.utc)
+        self.assertEqual(
+            get_upcoming_window_start(now),
+            datetime.datetime(2024, 1, 15, 8, 30, tzinfo=datetime.timezone.utc),
+        )
+
+    def test_window_start_in_summer(self):
+        # 3:00 PM UTC is 11:00 AM EDT
+        now = datetime.datetime(2024, 7, 15, 15, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(
+            get_upcoming_window_start(now),
+            datetime.datetime(2024, 7, 15, 9, 30, tzinfo=datetime.timezone.utc),
+        )
+
+    def test_upcoming_keeps_blocks_within_grace_period(self):
+        # 11:00 AM local: the 10 AM block started an hour ago so is still listed, the 8 AM one isn't
+        now = datetime.datetime(2024, 3, 9, 16, 0, tzinfo=datetime.timezone.utc)
+        blocks = BoothBlock.objects.upcoming(get_upcoming_window_start(now)).order_by(
+            "booth_block_start_time"
+        )
+
+        self.assertEqual([block.booth_block_start_time.hour for block in blocks], [10, 12, 14])
+
+    def test_upcoming_leaves_out_disabled_blocks(self):
+        BoothBlock.objects.filter(booth_block_start_time__hour=12).update(booth_block_enabled=False)
+        now = datetime.datetime(2024, 3, 9, 5, 0, tzinfo=datetime.timezone.utc)
+
+        self.assertEqual(BoothBlock.objects.upcoming(get_upcoming_window_start(now)).count(), 3)
+
+    def test_upcoming_uses_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Query plan format is database specific")
+
+        self.assertIn("boothblock_upcoming", BoothBlock.objects.upcoming().explain())
@@ -38,6 +38,16 @@ urlpatterns = [
         views.cancel_block,
         name="block_cancellation",
     ),
+    # AJAX Batched Booth Block Status
+    path("blocks/status/", views.block_status, name="block_status"),
+    # AJAX Week Calendar of Booth Blocks
+    path("blocks/calendar/", views.booth_calendar, name="booth_calendar"),
+    # Reservation Export (CSV/Excel)
+    path("blocks/export/", views.export_reservations, name="export_reservations"),
+    # AJAX Single Booth Block Row
+    path("blocks/row/<int:block_id>", views.booth_block_row, name="booth_block_row"),
+    # Live Booth Block Changes (Server-Sent Events, ASGI only)
+    path("blocks/events/", views.block_events, name="block_events"),
     # Hold Booth For Cookie Captains
     path(
         "blocks/cchold/<int:block_id>",
@@ -56,6 +66,12 @@ urlpatterns = [
         views.enable_location_by_block,
         name="enable_location_by_block",
     ),
+    # AJAX Booth Blocks for a Single Location
+    path(
+        "blocks/enable_blocks/location/<int:booth_id>",
+        views.enable_location_blocks,
+        name="enable_location_blocks",
+    ),
     # AJAX Enable Booth by Block
     path(
         "blocks/enable_blocks/<int:block_id>",
@@ -82,6 +98,12 @@ urlpatterns = [
         views.disable_location_by_day,
         name="ajax_disable_day",
     ),
+    # AJAX Enable/Disable Booth Days in a Date Range
+    path(
+        "blocks/enable_booth_days/range",
+        views.toggle_days_in_range,
+        name="ajax_toggle_days_in_range",
+    ),
     #
     path("enable_ffa", views.enable_all_locations_ffa, name="enable_ffa"),
 ]
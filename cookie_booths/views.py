@@ -1,23 +1,125 @@
+import hashlib
 import json
+from itertools import groupby
+from zoneinfo import ZoneInfo
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.core.mail import send_mail
-from django.db.models import Q
-from django.http import HttpResponse, HttpResponseRedirect
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Q
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
-from django.utils.timezone import datetime, make_aware, timedelta
+from django.utils import timezone
+from django.utils.timezone import datetime, timedelta
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic.edit import DeleteView
-from twilio.rest import Client
 
-from accounts.models import CustomUser
 from cookie_website.settings import NO_COOKIE_CAPTAIN_ID
+from troops.coordinators import get_coordinator_troops
 from troops.models import Troop
 
-from .forms import BoothHoursForm, BoothLocationForm, EnableFreeForAll
-from .models import BoothBlock, BoothDay, BoothHours, BoothLocation, CookieSeason
+from .events import block_event_stream
+from .exports import export_rows, stream_csv, stream_xlsx
+from .forms import (
+    BoothHoursForm,
+    BoothLocationForm,
+    BulkToggleDaysForm,
+    EnableFreeForAll,
+    ReservationExportForm,
+)
+from .models import (
+    BoothBlock,
+    BoothDay,
+    BoothHours,
+    BoothLocation,
+    CookieSeason,
+    get_booth_change_stamp,
+    get_upcoming_window_start,
+)
+from .rows import get_booth_block_row, get_booth_block_rows, is_block_owned_by_user
+
+# Upper bound on how many blocks can be asked about in a single status request
+MAX_BLOCK_STATUS_IDS = 500
+
+# Block states in the calendar payload, from the current user's point of view
+CALENDAR_AVAILABLE = 0
+CALENDAR_RESERVED_BY_USER = 1
+CALENDAR_RESERVED = 2
+CALENDAR_HELD_FOR_COOKIE_CAPTAINS = 3
+CALENDAR_STATES = {
+    CALENDAR_AVAILABLE: "available",
+    CALENDAR_RESERVED_BY_USER: "reserved_by_user",
+    CALENDAR_RESERVED: "reserved",
+    CALENDAR_HELD_FOR_COOKIE_CAPTAINS: "held_for_cookie_captains",
+}
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# -----------------------------------------------------------------------
+# Conditional GET Functions
+# -----------------------------------------------------------------------
+# The booth listing pages answer 304 Not Modified when nothing they show has changed since the
+# browser last loaded them, rather than re-querying and re-rendering every block.
+
+
+def _get_booth_change_stamp(request):
+    # Shared by the ETag and Last-Modified checks, so it is only looked up once per request
+    if not hasattr(request, "_booth_change_stamp"):
+        request._booth_change_stamp = get_booth_change_stamp()
+    return request._booth_change_stamp
+
+
+def _make_etag(request, *parts):
+    # Every page embeds a CSRF token, which only stays valid for as long as the CSRF cookie does
+    parts += (request.user.id, request.COOKIES.get(settings.CSRF_COOKIE_NAME))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _get_troop_list_signature():
+    # The booth pages list every troop for admins to reserve on behalf of
+    return tuple(Troop.objects.order_by("troop_number").values_list("troop_number", flat=True))
+
+
+def _booth_listing_last_modified(request):
+    return _get_booth_change_stamp(request)[0]
+
+
+def _booth_blocks_etag(request):
+    return _make_etag(
+        request,
+        _get_booth_change_stamp(request)[1],
+        _get_user_context(request),
+        _get_troop_list_signature(),
+        get_upcoming_window_start(),
+    )
+
+
+def _booth_reservations_etag(request):
+    return _make_etag(
+        request,
+        _get_booth_change_stamp(request)[1],
+        _get_user_context(request),
+        _get_troop_list_signature(),
+    )
+
+
+def _booth_days_etag(request):
+    return _make_etag(request, _get_booth_change_stamp(request)[1])
+
 
 # -----------------------------------------------------------------------
 # Booth Admin Functions
@@ -104,66 +206,96 @@ class BoothLocationDelete(PermissionRequiredMixin, LoginRequiredMixin, DeleteVie
 @login_required
 @permission_required("cookie_booths.toggle_day", raise_exception=True)
 def enable_location_by_block(request):
-    booth_information = []
-    booth_blocks_ = BoothBlock.objects.order_by(
-        "booth_day__booth", "booth_day", "booth_block_start_time"
-    ).select_related("booth_day", "booth_day__booth")
-
-    for booth in booth_blocks_:
-        current_booth_information = {
-            "booth_block_information": booth,
-            "booth_owned_by_current_user": None,
-            "booth_owned_by_cookie_captain": False,
-            "booth_block_cookie_captain_email": "",
-        }
-        booth_information.append(current_booth_information)
+    """Summarise every location's blocks by date; each location's blocks are loaded on demand"""
+    day_summaries = (
+        BoothBlock.objects.values(
+            "booth_day",
+            "booth_day__booth",
+            "booth_day__booth__booth_location",
+            "booth_day__booth_day_date",
+        )
+        .annotate(
+            total_blocks=Count("id"),
+            enabled_blocks=Count("id", filter=Q(booth_block_enabled=True)),
+            disabled_blocks=Count("id", filter=Q(booth_block_enabled=False)),
+            reserved_blocks=Count("id", filter=Q(booth_block_reserved=True)),
+        )
+        .order_by(
+            "booth_day__booth__booth_location", "booth_day__booth", "booth_day__booth_day_date"
+        )
+    )
 
-    permission_level = "none"
-    if request.user.has_perm("cookie_booths.block_reservation_admin"):
-        permission_level = "admin"
-    elif request.user.has_perm("cookie_booths.block_reservation"):
-        permission_level = "tcc"
+    locations = []
+    for booth_id, days in groupby(day_summaries, key=lambda day: day["booth_day__booth"]):
+        days = list(days)
+        locations.append(
+            {
+                "booth_id": booth_id,
+                "booth_location": days[0]["booth_day__booth__booth_location"],
+                "days": days,
+                "total_blocks": sum(day["total_blocks"] for day in days),
+                "enabled_blocks": sum(day["enabled_blocks"] for day in days),
+                "reserved_blocks": sum(day["reserved_blocks"] for day in days),
+            }
+        )
 
     context = {
-        "booth_blocks": booth_information,
-        "available_troops": None,
-        "permission_level": permission_level,
+        "locations": locations,
         "page_title": "Enable Booths by Block",
-        "reserve_or_enable_booths": "enable",
     }
 
-    return render(request, "cookie_booths/booth_blocks.html", context)
+    return render(request, "cookie_booths/enable_blocks_by_location.html", context)
+
+
+@login_required
+@permission_required("cookie_booths.toggle_day", raise_exception=True)
+def enable_location_blocks(request, booth_id):
+    """Render the rows for a single location's blocks, when it is expanded on the summary page"""
+    booth_blocks_ = BoothBlock.objects.filter(booth_day__booth_id=booth_id).for_table()
+
+    context = {"booth_blocks": get_booth_block_rows(booth_blocks_)}
+    message_response = {
+        "is_success": True,
+        "rows": render_to_string("cookie_booths/booth_block_rows.html", context, request=request),
+    }
+
+    return HttpResponse(json.dumps(message_response))
 
 
 @login_required
 def ajax_enable_location_by_block(request, block_id):
-    is_success = False
+    message_response = {"is_success": False, "row": None}
     if request.method == "POST":
-        block_to_enable = BoothBlock.objects.get(id=block_id)
+        block_to_enable = BoothBlock.objects.select_related("booth_day__booth").get(id=block_id)
         if request.user.has_perm("cookie_booths.toggle_day"):
-            is_success = block_to_enable.enable_block()
+            message_response["is_success"] = block_to_enable.enable_block()
+            message_response["row"] = _render_booth_block_row(request, block_to_enable)
 
-    return HttpResponse(is_success)
+    return HttpResponse(json.dumps(message_response))
 
 
 @login_required
 def ajax_disable_location_by_block(request, block_id):
-    is_success = False
+    message_response = {"is_success": False, "row": None}
     if request.method == "POST":
-        block_to_enable = BoothBlock.objects.get(id=block_id)
+        block_to_disable = BoothBlock.objects.select_related("booth_day__booth").get(id=block_id)
         if request.user.has_perm("cookie_booths.toggle_day"):
-            is_success = block_to_enable.disable_block()
+            message_response["is_success"] = block_to_disable.disable_block()
+            message_response["row"] = _render_booth_block_row(request, block_to_disable)
 
-    return HttpResponse(is_success)
+    return HttpResponse(json.dumps(message_response))
 
 
 @login_required
 @permission_required("cookie_booths.toggle_day", raise_exception=True)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_booth_days_etag, last_modified_func=_booth_listing_last_modified)
 def enable_or_disable_day(request):
-    booth_days = BoothDay.objects.order_by("booth", "booth_day_date")
+    booth_days = BoothDay.objects.order_by("booth", "booth_day_date").select_related("booth")
 
     context = {
         "booth_days": booth_days,
+        "locations": BoothLocation.objects.order_by("booth_location"),
         "page_title": "Enable/Disable Booth Days",
     }
 
@@ -172,43 +304,93 @@ def enable_or_disable_day(request):
 
 @login_required
 def enable_location_by_day(request):
-    # Enable all dates for a particular booth up to and including a particular date
+    # Enable a single day for a booth (toggle_days_in_range handles whole date ranges)
+    message_response = {"is_success": False, "row": None}
     if request.method == "POST":
         booth_id = request.POST["booth_id"]
-        booth_day = BoothDay.objects.get(id=booth_id)
+        booth_day = BoothDay.objects.select_related("booth").get(id=booth_id)
         if request.user.has_perm("cookie_booths.toggle_day"):
             booth_day.enable_day()
+            message_response["is_success"] = True
+            message_response["row"] = render_to_string(
+                "cookie_booths/booth_day_row.html", {"day": booth_day}, request=request
+            )
 
-    return HttpResponse()
+    return HttpResponse(json.dumps(message_response))
 
 
 @login_required
 def disable_location_by_day(request):
-    # Disable all dates for a particular booth up to and including a particular date
+    # Disable a single day for a booth (toggle_days_in_range handles whole date ranges)
+    message_response = {"is_success": False, "row": None}
     if request.method == "POST":
         booth_id = request.POST["booth_id"]
-        booth_day = BoothDay.objects.get(id=booth_id)
+        booth_day = BoothDay.objects.select_related("booth").get(id=booth_id)
         if request.user.has_perm("cookie_booths.toggle_day"):
             booth_day.disable_day()
+            message_response["is_success"] = True
+            message_response["row"] = render_to_string(
+                "cookie_booths/booth_day_row.html", {"day": booth_day}, request=request
+            )
+
+    return HttpResponse(json.dumps(message_response))
+
+
+@login_required
+def toggle_days_in_range(request):
+    # Enable or disable every day (and its blocks) for the chosen locations within a date range
+    message_response = {"is_success": False, "message": "", "rows": {}}
+    if request.method != "POST" or not request.user.has_perm("cookie_booths.toggle_day"):
+        message_response["message"] = "You do not have permission to enable or disable booth days."
+        return HttpResponse(json.dumps(message_response))
+
+    form = BulkToggleDaysForm(data=request.POST)
+    if not form.is_valid():
+        message_response["message"] = " ".join(
+            error for errors in form.errors.values() for error in errors
+        )
+        return HttpResponse(json.dumps(message_response))
+
+    booth_days = BoothDay.objects.filter(
+        booth_day_date__range=(form.cleaned_data["start_date"], form.cleaned_data["end_date"])
+    )
+    if form.cleaned_data["locations"]:
+        booth_days = booth_days.filter(booth__in=form.cleaned_data["locations"])
+
+    enabled = form.cleaned_data["action"] == "enable"
+    day_ids, blocks_updated = booth_days.set_enabled(enabled)
+
+    # Hand back the changed rows so the page can patch them in place
+    changed_days = BoothDay.objects.filter(id__in=day_ids).select_related("booth")
+    message_response.update(
+        {
+            "is_success": True,
+            "message": f"{'Enabled' if enabled else 'Disabled'} {len(day_ids)} days "
+            f"and {blocks_updated} blocks.",
+            "enabled": enabled,
+            "days_updated": len(day_ids),
+            "blocks_updated": blocks_updated,
+            "rows": {
+                day.id: render_to_string(
+                    "cookie_booths/booth_day_row.html", {"day": day}, request=request
+                )
+                for day in changed_days
+            },
+        }
+    )
 
-    return HttpResponse()
+    return HttpResponse(json.dumps(message_response))
 
 
 @login_required
 def enable_location_ffa(request, booth_id, date):
     # Enable free-for-all for a particular booth up to and including a particular date.
     # Will also enable dates up until that day if not already
-    for booth_day in BoothDay.objects.filter(booth_id=booth_id, booth_day_date__lte=date):
-        booth_day.enable_freeforall()
+    BoothDay.objects.filter(booth_id=booth_id, booth_day_date__lte=date).enable_freeforall()
 
     return
 
 
-def daterange(start_date, end_date):
-    for n in range(int((end_date - start_date).days) + 1):
-        yield start_date + timedelta(n)
-
-
 @login_required
 def enable_all_locations_ffa(request):
     # Enable free-for-all for all locations up to and including a particular date.
@@ -223,9 +405,10 @@ def enable_all_locations_ffa(request):
         if form.is_valid():
             start_date = datetime.strptime(request.POST["start_date"], "%m/%d/%Y")
             end_date = datetime.strptime(request.POST["end_date"], "%m/%d/%Y")
-            for date_ in daterange(start_date, end_date):
-                for booth_day in BoothDay.objects.filter(booth_day_date=date_):
-                    booth_day.enable_freeforall()
+            # All at once, so each troop hears about every day in one message
+            BoothDay.objects.filter(
+                booth_day_date__range=(start_date.date(), end_date.date())
+            ).enable_freeforall()
 
             return HttpResponse("Complete")
 
@@ -241,202 +424,131 @@ def enable_all_locations_ffa(request):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_booth_blocks_etag, last_modified_func=_booth_listing_last_modified)
 def booth_blocks(request):
     """Display all booths"""
-    booth_blocks_ = BoothBlock.objects.order_by(
-        "booth_day__booth", "booth_day", "booth_block_start_time"
-    ).select_related("booth_day", "booth_day__booth")
     available_troops = Troop.objects.order_by("troop_number")
-    booth_information = []
-    email = request.user.email
-    user_id = request.user.id
-    is_cookie_captain = request.user.has_perm("cookie_booths.cookie_captain_reserve_block")
+    user_context = _get_user_context(request)
+    booth_blocks_ = BoothBlock.objects.for_table().visible_to(user_context)
 
-    troop_number = None
-    try:
-        user_troop = Troop.objects.get(troop_cookie_coordinator=email)
-        troop_number = user_troop.troop_number
-        is_daisy_troop = user_troop.troop_level == 1
-    except Troop.DoesNotExist:
-        # Troop doesn't exist, so it cannot be a Daisy Troop
-        if is_cookie_captain:
-            troop_number = 0
-        is_daisy_troop = False
-
-    # Let's filter the booths following these steps
-    # 1. Disabled Booths should be excluded for everyone
-    # TO DO: THIS IS A TEMPORARY FIX, THIS CAUSES A TEST FAILURE
-    time_threshold = make_aware(datetime.today()) - timedelta(hours=6, minutes=30)
-    booth_blocks_ = booth_blocks_.filter(
-        booth_block_enabled=True, booth_block_start_time__gt=time_threshold
-    )
-    # 2a. If the active user belongs to a Daisy Troop, they should ONLY be able to see booths that
-    # are reserved by Cookie Captains.
-    if is_daisy_troop:
-        booth_blocks_ = booth_blocks_.filter(
-            Q(booth_block_current_troop_owner=0) & Q(booth_block_reserved=True)
-        )
-    # 2b. If the user is not a Cookie Captain, they should not be able to see booths held for CCs
-    elif not is_cookie_captain:
-        booth_blocks_ = booth_blocks_.exclude(booth_block_held_for_cookie_captains=True)
-
-    for booth in booth_blocks_:
-        # If a booth is owned by the current user then we know for certain that we can display
-        # the cancel button
-
-        # If troop number is None, then we cannot possibly own the booth
-        if troop_number is None:
-            booth_owned_by_current_user_ = False
-        # If the user is a cookie captain, that means they all share troop number 0, so we check
-        # to see if the user id matches if they own the booth.
-        elif is_cookie_captain:
-            booth_owned_by_current_user_ = booth.booth_block_current_cookie_captain_owner == user_id
-        # Otherwise, we see if the booth is owned by either the daisy troop or the current owner
-        else:
-            booth_owned_by_current_user_ = (
-                booth.booth_block_current_troop_owner == troop_number
-                or booth.booth_block_daisy_troop_owner == troop_number
-            )
-
-        # Next, if the booth does happen to be owned by a cookie captain, try to get their email address
-        booth_owned_by_cookie_captain_ = False
-        cookie_cap_user_email_ = None
-        if (
-            booth.booth_block_current_cookie_captain_owner != 0
-            and not booth.booth_block_current_troop_owner
-        ):
-            booth_owned_by_cookie_captain_ = True
-            cookie_cap_user_email_ = f"""Cookie Captain: {CustomUser.objects.get(id=booth.booth_block_current_cookie_captain_owner).first_name}
-                                         {CustomUser.objects.get(id=booth.booth_block_current_cookie_captain_owner).last_name}
-                                        || Contact: {CustomUser.objects.get(id=booth.booth_block_current_cookie_captain_owner)}"""
-
-        # Provide information back to the table about the booth
-        current_booth_information = {
-            "booth_block_information": booth,
-            "booth_owned_by_current_user": booth_owned_by_current_user_,
-            "booth_owned_by_cookie_captain": booth_owned_by_cookie_captain_,
-            "booth_block_cookie_captain_email": cookie_cap_user_email_,
-        }
-        booth_information.append(current_booth_information)
-
-    permission_level = "none"
-    if request.user.has_perm("cookie_booths.block_reservation_admin"):
-        permission_level = "admin"
-    elif request.user.has_perm("cookie_booths.block_reservation"):
-        if is_daisy_troop:
-            permission_level = "daisy"
-        else:
-            permission_level = "tcc"
-    elif is_cookie_captain:
-        permission_level = "tcc"
+    booth_information = get_booth_block_rows(booth_blocks_, user_context)
 
     context = {
         "booth_blocks": booth_information,
         "available_troops": available_troops,
-        "permission_level": permission_level,
+        "permission_level": user_context["permission_level"],
         "page_title": "Make Booth Reservations",
         "reserve_or_enable_booths": "reserve",
+        # Otherwise the page polls block_status instead
+        "live_updates": _is_served_over_asgi(request),
     }
 
     return render(request, "cookie_booths/booth_blocks.html", context)
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_booth_reservations_etag, last_modified_func=_booth_listing_last_modified)
 def booth_reservations(request):
     """Display all blocks currently reserved by the current user"""
-    booth_blocks_ = BoothBlock.objects.order_by(
-        "booth_day__booth", "booth_day", "booth_block_start_time"
-    ).select_related("booth_day", "booth_day__booth")
-    booth_blocks_ = booth_blocks_.exclude(booth_block_enabled=False)
+    booth_blocks_ = BoothBlock.objects.for_table().exclude(booth_block_enabled=False)
     available_troops = Troop.objects.order_by("troop_number")
-    email = request.user.email
-    booth_information = []
-    is_cookie_captain = request.user.has_perm("cookie_booths.cookie_captain_reserve_block")
-
-    try:
-        user_troop = Troop.objects.get(troop_cookie_coordinator=email)
-        troop_number = user_troop.troop_number
-        if user_troop.troop_level == 1:
-            booth_blocks_ = booth_blocks_.filter(
-                booth_block_daisy_troop_owner=user_troop.troop_number
-            )
-        else:
-            booth_blocks_ = booth_blocks_.filter(
-                booth_block_current_troop_owner=user_troop.troop_number
-            )
-    except Troop.DoesNotExist:
-        user_troop = None
-        if is_cookie_captain:
-            booth_blocks_ = booth_blocks_.filter(
-                booth_block_current_cookie_captain_owner=request.user.id
-            )
-
-            troop_number = 0
+    user_context = _get_user_context(request)
 
-    for booth in booth_blocks_:
+    # Admins without a troop of their own manage every block from here
+    if not (user_context["is_cookie_admin"] and user_context["troop_number"] is None):
+        booth_blocks_ = booth_blocks_.reserved_by(user_context)
 
-        # If a booth is owned by the current user then we know for certain that we can display
-        # the cancel button
-
-        # If troop number is None, then we cannot possibly own the booth
-        if troop_number is None:
-            booth_owned_by_current_user_ = False
-        # If the user is a cookie captain, that means they all share troop number 0, so we check
-        # to see if the user id matches if they own the booth.
-        elif is_cookie_captain:
-            booth_owned_by_current_user_ = (
-                booth.booth_block_current_cookie_captain_owner == request.user.id
-            )
-        # Otherwise, we see if the booth is owned by either the daisy troop or the current owner
-        else:
-            booth_owned_by_current_user_ = (
-                booth.booth_block_current_troop_owner == troop_number
-                or booth.booth_block_daisy_troop_owner == troop_number
-            )
-
-        # Next, if the booth does happen to be owned by a cookie captain, try to get their email address
-        booth_owned_by_cookie_captain_ = False
-        cookie_cap_user_email_ = None
-        if (
-            booth.booth_block_current_cookie_captain_owner != 0
-            and not booth.booth_block_current_troop_owner
-        ):
-            booth_owned_by_cookie_captain_ = True
-            cookie_cap_user_email_ = CustomUser.objects.get(
-                id=booth.booth_block_current_cookie_captain_owner
-            ).first_name
-
-        # Provide information back to the table about the booth
-        current_booth_information = {
-            "booth_block_information": booth,
-            "booth_owned_by_current_user": booth_owned_by_current_user_,
-            "booth_owned_by_cookie_captain": booth_owned_by_cookie_captain_,
-            "booth_block_cookie_captain_email": cookie_cap_user_email_,
-        }
-        booth_information.append(current_booth_information)
-
-    permission_level = "none"
-    if request.user.has_perm("cookie_booths.block_reservation_admin"):
-        permission_level = "admin"
-    elif request.user.has_perm("cookie_booths.block_reservation"):
-        if user_troop is not None and user_troop.troop_level == 1:
-            permission_level = "daisy"
-        else:
-            permission_level = "tcc"
-    elif is_cookie_captain:
-        permission_level = "tcc"
+    booth_information = get_booth_block_rows(booth_blocks_, user_context, short_label=True)
 
     context = {
         "booth_blocks": booth_information,
         "available_troops": available_troops,
-        "permission_level": permission_level,
+        "permission_level": user_context["permission_level"],
         "page_title": "Manage Your Booth Reservations",
         "reserve_or_enable_booths": "reserve",
+        "remove_cancelled_rows": True,
     }
 
     return render(request, "cookie_booths/booth_blocks.html", context)
 
 
+@login_required
+def export_reservations(request):
+    """Stream the reservations the current user can see as a CSV or Excel file"""
+    form = ReservationExportForm(data=request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(
+            json.dumps({"is_success": False, "errors": form.errors.get_json_data()})
+        )
+    filters = form.cleaned_data
+
+    booth_blocks_ = BoothBlock.objects.filter(
+        booth_block_enabled=True, booth_block_reserved=True
+    ).order_by("booth_day__booth", "booth_day", "booth_block_start_time")
+
+    # Admins can export everyone's reservations, everyone else only their own
+    user_context = _get_user_context(request)
+    if not user_context["is_cookie_admin"]:
+        booth_blocks_ = booth_blocks_.reserved_by(user_context)
+
+    if filters["start_date"]:
+        booth_blocks_ = booth_blocks_.filter(booth_day__booth_day_date__gte=filters["start_date"])
+    if filters["end_date"]:
+        booth_blocks_ = booth_blocks_.filter(booth_day__booth_day_date__lte=filters["end_date"])
+    if filters["location"]:
+        booth_blocks_ = booth_blocks_.filter(booth_day__booth=filters["location"])
+    if filters["troop"]:
+        booth_blocks_ = booth_blocks_.filter(
+            Q(booth_block_current_troop_owner=filters["troop"])
+            | Q(booth_block_daisy_reserved=True, booth_block_daisy_troop_owner=filters["troop"])
+        )
+
+    export_format = filters["format"]
+    stream = stream_xlsx if export_format == "xlsx" else stream_csv
+    response = StreamingHttpResponse(
+        stream(export_rows(booth_blocks_)), content_type=EXPORT_CONTENT_TYPES[export_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="booth_reservations.{export_format}"'
+    return response
+
+
+@login_required
+def booth_block_row(request, block_id):
+    """Render a single booth_blocks.html row for the current user, if they can see the block"""
+    user_context = _get_user_context(request)
+    booth = (
+        BoothBlock.objects.for_table()
+        .visible_to(user_context)
+        .filter(id=block_id)
+        .first()
+    )
+
+    message_response = {
+        "is_success": True,
+        "row": None if booth is None else _render_booth_block_row(request, booth, user_context),
+    }
+    return HttpResponse(json.dumps(message_response))
+
+
+async def block_events(request):
+    """Stream booth block changes as Server-Sent Events. Only usable when served over ASGI."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if not _is_served_over_asgi(request):
+        # Under WSGI the stream would be read to the end before anything was sent, tying up a
+        # worker forever
+        raise Http404("Live updates are only available when the site is served over ASGI")
+
+    response = StreamingHttpResponse(block_event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop proxies (e.g. nginx) from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def get_available_dates(request):
     # Go through all booth locations, and based on an intersection of those, figure out the list of available
@@ -452,21 +564,175 @@ def get_available_blocks(request, date):
 
 
 @login_required
-def is_block_enabled(request, block_id):
-    # Check if block is enabled for reservation. May still be cancelable
-    return
+def block_status(request):
+    """Return the enabled/reserved/held status of a batch of blocks the current user can see"""
+    # Block IDs can be passed as ?block_ids=1,2,3 or repeated ?block_id=1&block_id=2
+    raw_block_ids = request.GET.getlist("block_id")
+    if request.GET.get("block_ids"):
+        raw_block_ids += request.GET["block_ids"].split(",")
 
+    try:
+        block_ids = {int(block_id) for block_id in raw_block_ids if block_id}
+    except ValueError:
+        message_response = {
+            "message": "Block IDs must be integers",
+            "is_success": False,
+        }
+        return HttpResponse(json.dumps(message_response))
 
-@login_required
-def is_block_reserved(request, block_id):
-    # Check if block is reserved by a user that is *not* the current user
-    return
+    if len(block_ids) > MAX_BLOCK_STATUS_IDS:
+        message_response = {
+            "message": f"Cannot request more than {MAX_BLOCK_STATUS_IDS} blocks at once",
+            "is_success": False,
+        }
+        return HttpResponse(json.dumps(message_response))
+
+    user_context = _get_user_context(request)
+
+    # One query for every block requested, only pulling the columns needed to work out the status.
+    # Blocks the user can't see on the reservation page are left out, as unknown ones are.
+    blocks_ = BoothBlock.objects.visible_to(user_context).filter(id__in=block_ids).values_list(
+        "id",
+        "booth_block_enabled",
+        "booth_block_reserved",
+        "booth_block_held_for_cookie_captains",
+        "booth_block_daisy_reserved",
+        "booth_block_current_troop_owner",
+        "booth_block_daisy_troop_owner",
+        "booth_block_current_cookie_captain_owner",
+    )
+
+    statuses = {}
+    for (
+        block_id,
+        enabled,
+        reserved,
+        held,
+        daisy_reserved,
+        troop_owner,
+        daisy_troop_owner,
+        cookie_captain_owner,
+    ) in blocks_:
+        reserved_by_user = reserved and is_block_owned_by_user(
+            user_context, troop_owner, daisy_troop_owner, cookie_captain_owner
+        )
+        statuses[block_id] = {
+            "enabled": enabled,
+            # Reserved means reserved by someone that is *not* the current user
+            "reserved": reserved and not reserved_by_user,
+            "reserved_by_user": reserved_by_user,
+            "daisy_reserved": daisy_reserved,
+            "held": held,
+        }
+
+    message_response = {
+        "message": None,
+        "is_success": True,
+        "blocks": statuses,
+    }
+    return HttpResponse(json.dumps(message_response))
 
 
 @login_required
-def is_block_reserved_by_user(request, block_id):
-    # Check if block is reserved by the current user, and thus can be cancelled
-    return
+def booth_calendar(request):
+    """Return a week of the blocks the current user can see, as columns for a calendar grid"""
+    # Any date in the week will do, e.g. ?week=2024-03-06, defaulting to the booths' current week
+    try:
+        week_of = datetime.strptime(request.GET["week"], "%Y-%m-%d").date()
+    except KeyError:
+        week_of = timezone.localdate(timezone=ZoneInfo(settings.BOOTH_TIME_ZONE))
+    except ValueError:
+        message_response = {"message": "Week must be a date like 2024-03-06", "is_success": False}
+        return HttpResponse(json.dumps(message_response))
+    week_start, week_end = get_week_start_end_from_date(week_of)
+    # And any number of locations, e.g. ?location=3&location=7, defaulting to all of them
+    try:
+        location_ids = [int(location_id) for location_id in request.GET.getlist("location")]
+    except ValueError:
+        message_response = {"message": "Location must be a location id like 3", "is_success": False}
+        return HttpResponse(json.dumps(message_response))
+
+    user_context = _get_user_context(request)
+    booth_blocks_ = BoothBlock.objects.visible_to(user_context).filter(
+        booth_day__booth_day_date__range=(week_start, week_end)
+    )
+    if location_ids:
+        booth_blocks_ = booth_blocks_.filter(booth_day__booth__in=location_ids)
+
+    # The location, date and start time of each block are sent once, in lookup tables, and each
+    # block refers to them by position, so no row repeats them
+    locations = {}
+    dates = [(week_start + timedelta(days=offset)).isoformat() for offset in range(7)]
+    slots = []
+    slot_index = {}
+    columns = {"id": [], "location": [], "date": [], "slot": [], "state": []}
+    for (
+        block_id,
+        location_id,
+        location_name,
+        date,
+        start_time,
+        reserved,
+        held,
+        troop_owner,
+        daisy_reserved,
+        daisy_troop_owner,
+        cookie_captain_owner,
+    ) in booth_blocks_.order_by("booth_block_start_time").values_list(
+        "id",
+        "booth_day__booth_id",
+        "booth_day__booth__booth_location",
+        "booth_day__booth_day_date",
+        "booth_block_start_time",
+        "booth_block_reserved",
+        "booth_block_held_for_cookie_captains",
+        "booth_block_current_troop_owner",
+        "booth_block_daisy_reserved",
+        "booth_block_daisy_troop_owner",
+        "booth_block_current_cookie_captain_owner",
+    ):
+        locations[location_id] = location_name
+        slot = start_time.strftime("%H:%M")
+        if slot not in slot_index:
+            slot_index[slot] = len(slots)
+            slots.append(slot)
+
+        if is_block_owned_by_user(
+            user_context, troop_owner, daisy_troop_owner, cookie_captain_owner
+        ):
+            state = CALENDAR_RESERVED_BY_USER
+        elif user_context["is_daisy_troop"]:
+            # Daisy troops see cookie captain blocks, which are open to them until a daisy claims one
+            state = CALENDAR_RESERVED if daisy_reserved else CALENDAR_AVAILABLE
+        elif reserved:
+            state = CALENDAR_RESERVED
+        elif held:
+            state = CALENDAR_HELD_FOR_COOKIE_CAPTAINS
+        else:
+            state = CALENDAR_AVAILABLE
+
+        columns["id"].append(block_id)
+        columns["location"].append(location_id)
+        columns["date"].append((date - week_start).days)
+        columns["slot"].append(slot_index[slot])
+        columns["state"].append(state)
+
+    # Blocks came back in date order, so put the slots in time of day order now they're all known
+    sorted_slots = sorted(slots)
+    new_slot_index = [sorted_slots.index(slot) for slot in slots]
+    columns["slot"] = [new_slot_index[slot] for slot in columns["slot"]]
+
+    message_response = {
+        "message": None,
+        "is_success": True,
+        "locations": locations,
+        "dates": dates,
+        "slots": sorted_slots,
+        "states": CALENDAR_STATES,
+        "blocks": columns,
+    }
+    # Compact separators, since this is meant to be small
+    return HttpResponse(json.dumps(message_response, separators=(",", ":")))
 
 
 @login_required
@@ -480,7 +746,7 @@ def reserve_block(request, daisy, block_id):
     email = request.user.email
     message_response = {}
     successful = False
-    block_to_reserve = BoothBlock.objects.get(id=block_id)
+    block_to_reserve = BoothBlock.objects.select_related("booth_day__booth").get(id=block_id)
 
     # Default message response
     message_response = {
@@ -578,6 +844,9 @@ def reserve_block(request, daisy, block_id):
             if user_identification["cookie_captain_id"]:
                 message_snippit = email
             message_response["message"] = f"Successfully reserved booth for {message_snippit}"
+            message_response["row"] = _render_booth_block_row(
+                request, block_to_reserve, user_context=_get_user_context(request)
+            )
         else:
             message_response["message"] = f"Failed to reserve booth"
 
@@ -588,21 +857,20 @@ def reserve_block(request, daisy, block_id):
 @login_required
 def cancel_block(request, daisy, block_id):
     user_id = request.user.id
-    email = request.user.email
     is_cookie_admin = request.user.has_perm("cookie_booths.block_reservation_admin")
     is_tcc = request.user.has_perm("cookie_booths.block_reservation")
     is_cookie_captain = request.user.has_perm("cookie_booths.cookie_captain_reserve_block")
 
     if request.method == "POST":
-        block_to_cancel = BoothBlock.objects.get(id=block_id)
+        block_to_cancel = BoothBlock.objects.select_related("booth_day__booth").get(id=block_id)
         if is_cookie_admin:
             # The user is a SUCM or higher they can do this unconditionally
             pass
         elif is_tcc:
-            # The user is a TCC; the user's troop # is used to check if they can cancel
-            troop_trying_to_cancel = Troop.objects.get(troop_cookie_coordinator=email).troop_number
-            if troop_trying_to_cancel != block_to_cancel.booth_block_current_troop_owner and (
-                daisy and troop_trying_to_cancel != block_to_cancel.booth_block_daisy_troop_owner
+            # The user is a TCC; the user's troop #s are used to check if they can cancel
+            troop_numbers = _get_user_context(request)["troop_numbers"]
+            if block_to_cancel.booth_block_current_troop_owner not in troop_numbers and (
+                daisy and block_to_cancel.booth_block_daisy_troop_owner not in troop_numbers
             ):
                 message_response = {
                     "message": "You cannot cancel a reservation for another troop",
@@ -643,12 +911,18 @@ def cancel_block(request, daisy, block_id):
             message_response = {
                 "message": "Successfully cancelled reserved booth",
                 "is_success": True,
+                "row": _render_booth_block_row(
+                    request, block_to_cancel, user_context=_get_user_context(request)
+                ),
             }
         elif daisy and block_to_cancel.cancel_daisy_reservation():
             # Successfully reserved the booth
             message_response = {
                 "message": "Successfully cancelled reserved booth",
                 "is_success": True,
+                "row": _render_booth_block_row(
+                    request, block_to_cancel, user_context=_get_user_context(request)
+                ),
             }
         else:
             message_response = {
@@ -668,7 +942,7 @@ def cancel_block(request, daisy, block_id):
 def hold_block_for_cookie_captain(request, block_id):
     # Only admins have the ability to do this
     if request.user.has_perm("cookie_booths.block_reservation_admin"):
-        block_to_hold = BoothBlock.objects.get(id=block_id)
+        block_to_hold = BoothBlock.objects.select_related("booth_day__booth").get(id=block_id)
 
         # A few things to validate in regards to the booth itself:
         # 1. It should not have an existing reservation on it
@@ -682,6 +956,9 @@ def hold_block_for_cookie_captain(request, block_id):
             message_response = {
                 "message": "Successfully held booth for cookie captains",
                 "is_success": True,
+                "row": _render_booth_block_row(
+                    request, block_to_hold, user_context=_get_user_context(request)
+                ),
             }
         else:
             message_response = {
@@ -702,7 +979,7 @@ def hold_block_for_cookie_captain(request, block_id):
 def cancel_hold_for_cookie_captain(request, block_id):
     # Only admins have the ability to do this
     if request.user.has_perm("cookie_booths.block_reservation_admin"):
-        block_to_unhold = BoothBlock.objects.get(id=block_id)
+        block_to_unhold = BoothBlock.objects.select_related("booth_day__booth").get(id=block_id)
 
         # We should validate that the booth is not currently being held
         if block_to_unhold.booth_block_held_for_cookie_captains:
@@ -711,6 +988,9 @@ def cancel_hold_for_cookie_captain(request, block_id):
             message_response = {
                 "message": "Successfully unheld booth for cookie captains",
                 "is_success": True,
+                "row": _render_booth_block_row(
+                    request, block_to_unhold, user_context=_get_user_context(request)
+                ),
             }
         else:
             message_response = {
@@ -727,19 +1007,62 @@ def cancel_hold_for_cookie_captain(request, block_id):
     return HttpResponse(message_response)
 
 
-def send_sms(message, recipients):
-    try:
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        for recipient in recipients:
-            if recipient:
-                client.messages.create(to=recipient, from_=settings.TWILIO_NUMBER, body=message)
-        success = True
-    except:
-        success = False
-    return success
+# Helper Functions
+def _is_served_over_asgi(request):
+    # Only an ASGI server can hold the live update stream open without tying up a worker
+    return isinstance(request, ASGIRequest)
+
+
+def _get_user_context(request):
+    # Resolve who the current user is in terms of booth reservations: their troop (if any), whether
+    # they are a cookie captain, and the permission level used by the booth templates.
+    # The result is kept on the request, since the conditional GET checks need it before the view.
+    if hasattr(request, "_booth_user_context"):
+        return request._booth_user_context
+
+    user_context = {
+        "user_id": request.user.id,
+        "email": request.user.email,
+        "troop_number": None,
+        "troop_numbers": [],
+        "troop_level": 0,
+        "is_daisy_troop": False,
+        "is_cookie_admin": request.user.has_perm("cookie_booths.block_reservation_admin"),
+        "is_tcc": request.user.has_perm("cookie_booths.block_reservation"),
+        "is_cookie_captain": request.user.has_perm("cookie_booths.cookie_captain_reserve_block"),
+        "permission_level": "none",
+    }
+
+    # A coordinator of more than one troop reserves for the lowest numbered one, but can cancel
+    # for any of them
+    user_troops = get_coordinator_troops(request)
+    if user_troops:
+        user_troop = user_troops[0]
+        user_context["troop_number"] = user_troop.troop_number
+        user_context["troop_numbers"] = [troop.troop_number for troop in user_troops]
+        user_context["troop_level"] = user_troop.troop_level
+        user_context["is_daisy_troop"] = user_troop.troop_level == 1
+    elif user_context["is_cookie_captain"]:
+        # Cookie captains all share troop number 0
+        user_context["troop_number"] = 0
+
+    if user_context["is_cookie_admin"]:
+        user_context["permission_level"] = "admin"
+    elif user_context["is_tcc"]:
+        user_context["permission_level"] = "daisy" if user_context["is_daisy_troop"] else "tcc"
+    elif user_context["is_cookie_captain"]:
+        user_context["permission_level"] = "tcc"
+
+    request._booth_user_context = user_context
+    return user_context
+
+
+def _render_booth_block_row(request, booth, user_context=None):
+    # Render a single booth_blocks.html row so the page can swap it in place after an AJAX action
+    context = {"block": get_booth_block_row(booth, user_context)}
+    return render_to_string("cookie_booths/booth_block_row.html", context, request=request)
 
 
-# Helper Functions
 def get_week_start_end_from_date(date):
     start_date = date - timedelta(days=date.weekday())
     end_date = start_date + timedelta(days=6)
@@ -805,15 +1128,13 @@ def get_num_tickets_remaining(troop, date, is_cookie_captain=False):
 
         total_booth_count += 1
 
-    rem = (
-        0
-        if (total_booth_count > troop.total_booth_tickets_per_week)
-        else (troop.total_booth_tickets_per_week - total_booth_count)
-    )
+    # Worked out once, since each of the allowance properties would look up the ticket settings
+    total_tickets, golden_tickets = troop.get_ticket_allowances()
+    rem = 0 if (total_booth_count > total_tickets) else (total_tickets - total_booth_count)
     rem_golden_ticket = (
         0
-        if (golden_ticket_booth_count > troop.booth_golden_tickets_per_week)
-        else (troop.booth_golden_tickets_per_week - golden_ticket_booth_count)
+        if (golden_ticket_booth_count > golden_tickets)
+        else (golden_tickets - golden_ticket_booth_count)
     )
 
     return rem, rem_golden_ticket
@@ -826,8 +1147,6 @@ def _identify_user(request, block_to_reserve):
     is_tcc = request.user.has_perm("cookie_booths.block_reservation")
     is_cookie_captain = request.user.has_perm("cookie_booths.cookie_captain_reserve_block")
 
-    email = request.user.email
-
     # To simplify the return, let's make it a dictionary.
     user_identification = {
         "success": False,
@@ -857,7 +1176,11 @@ def _identify_user(request, block_to_reserve):
 
     elif is_tcc:
         # The user is a TCC; the user's troop # is used for reservation
-        troop = Troop.objects.get(troop_cookie_coordinator=email)
+        user_troops = get_coordinator_troops(request)
+        if not user_troops:
+            user_identification["message"] = "Your account is not linked to a troop"
+            return user_identification
+        troop = user_troops[0]
         troop_trying_to_reserve = troop.troop_number
         troop_trying_to_reserve_level = troop.troop_level
         rem_tickets, rem_golden_tickets = get_num_tickets_remaining(
@@ -3,6 +3,11 @@ ASGI config for cookie_website project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live booth block stream (cookie_booths.views.block_events) holds its connection open, so it
+must be served through this entry point by an ASGI server such as uvicorn or daphne. Under WSGI
+(the gunicorn command in the Procfile) the stream isn't served, and the booth blocks page polls
+cookie_booths.views.block_status instead.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
@@ -0,0 +1,100 @@
+"""Reading and checking the rows of a CSV file that is about to be written in bulk.
+
+Used by troops.imports and accounts.provisioning. Every row is validated in memory with a form, so
+the callers can check the whole file against the database with a query or two, then write it all
+at once, or nothing at all if any row has a problem.
+"""
+import csv
+import io
+import time
+
+
+class CsvImportResult:
+    """
+    The outcome of an import. Timed from when it is made until finish() is called.
+
+    Attributes:
+        rows (int): How many rows were read, not counting the header.
+        created (int): How many rows were created. None are if any row has an error.
+        errors (list): (line number, message) for every problem found.
+        seconds (float): How long the import took.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.seconds = 0.0
+        self._start = time.perf_counter()
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def summary(self):
+        return f"{self.rows} rows in {self.seconds:.2f}s ({self.rows_per_second:.0f} rows/sec)"
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        return self
+
+
+def read_rows(csv_file, form_class, required_columns, result, unique_field, duplicate_error):
+    """
+    Validate every row of a CSV file with a form, adding any problems to the result.
+
+    Args:
+        csv_file (file): The CSV, opened in text or binary mode, with a header row.
+        form_class (type): The form checking one row. Its fields are the columns read.
+        required_columns (list): The columns the header has to have.
+        result (CsvImportResult): Counts the rows and collects the errors.
+        unique_field (str): The field no two rows can have the same value of.
+        duplicate_error (str): The error for a row repeating another, formatted with the value
+            and the line it was first seen on.
+
+    Returns:
+        list: (line number, cleaned data) for every good row.
+    """
+    reader = csv.DictReader(_as_text(csv_file))
+    columns = [column.strip() for column in reader.fieldnames or []]
+    missing = [column for column in required_columns if column not in columns]
+    if missing:
+        result.errors.append((1, f"Missing column(s): {', '.join(missing)}."))
+        return []
+    reader.fieldnames = columns
+
+    rows = []
+    seen = {}
+    for row in reader:
+        result.rows += 1
+        line = reader.line_num
+        form = form_class(
+            data={
+                column: (row.get(column) or "").strip()
+                for column in form_class.base_fields
+                if column in columns
+            }
+        )
+        if not form.is_valid():
+            for field, errors in form.errors.items():
+                result.errors.extend((line, f"{field}: {error}") for error in errors)
+            continue
+
+        data = form.cleaned_data
+        value = data[unique_field]
+        if value in seen:
+            result.errors.append((line, duplicate_error.format(value=value, line=seen[value])))
+            continue
+        seen[value] = line
+
+        rows.append((line, data))
+
+    return rows
+
+
+def _as_text(csv_file):
+    # Uploaded files and files opened with "rb" hand back bytes
+    if isinstance(csv_file, io.TextIOBase):
+        return csv_file
+    return io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline="")
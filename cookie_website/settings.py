@@ -39,6 +39,21 @@ TWILIO_ACCOUNT_SID = env.str("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = env.str("TWILIO_AUTH_TOKEN")
 TWILIO_NUMBER = env.str("TWILIO_NUMBER")
 
+# Text messages are sent through Twilio, unless SMS_BACKEND is "notifications.sms.FakeBackend",
+# which keeps them in memory after waiting SMS_FAKE_LATENCY seconds
+SMS_BACKEND = env.str("SMS_BACKEND", default="notifications.sms.TwilioBackend")
+SMS_FAKE_LATENCY = env.float("SMS_FAKE_LATENCY", default=0)
+# How many messages can be sending at once, and the most to start each second
+SMS_MAX_WORKERS = env.int("SMS_MAX_WORKERS", default=4)
+SMS_RATE_PER_SECOND = env.float("SMS_RATE_PER_SECOND", default=10)
+# How many times to try each recipient, waiting SMS_RETRY_BACKOFF seconds, doubling each time
+SMS_MAX_ATTEMPTS = env.int("SMS_MAX_ATTEMPTS", default=3)
+SMS_RETRY_BACKOFF = env.float("SMS_RETRY_BACKOFF", default=0.5)
+
+# Notifications wait this many seconds before they are sent, and any others written for the same
+# person in that time go out with them as one digest
+NOTIFICATION_DIGEST_WINDOW = env.int("NOTIFICATION_DIGEST_WINDOW", default=60)
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -47,6 +62,7 @@ INSTALLED_APPS = [
     "accounts.apps.AccountsConfig",
     "pages.apps.PagesConfig",
     "troops.apps.TroopsConfig",
+    "notifications.apps.NotificationsConfig",
     # Third Party Apps
     "django_bootstrap5",
     "bootstrap_datepicker_plus",
@@ -155,13 +171,34 @@ LOGOUT_REDIRECT_URL = "home"
 # Heroku settings
 django_heroku.settings(locals())
 
-# Email settings
-EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
-# EMAIL_HOST = 'smtp.gmail.com'
-# EMAIL_PORT = 587
-# EMAIL_USE_TLS = True
-# EMAIL_HOST_USER = 'cfsu.cookiewebsite@gmail.com'
-# EMAIL_HOST_PASSWORD = env.str("GMAIL_PASSWORD")
+# The cache has to be shared by every worker when there is more than one, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and CACHE_LOCATION=redis://..., since
+# it holds the versions that tell each worker when its copy of the ticket settings is out of date.
+# The default only lasts as long as the process, which is fine for one worker.
+CACHES = {
+    "default": {
+        "BACKEND": env.str(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": env.str("CACHE_LOCATION", default=""),
+    }
+}
+
+# Email settings. Emails are printed to the console, unless EMAIL_BACKEND is
+# "django.core.mail.backends.smtp.EmailBackend", which sends them through Gmail.
+EMAIL_BACKEND = env.str("EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = env.str("EMAIL_HOST", default="smtp.gmail.com")
+EMAIL_PORT = env.int("EMAIL_PORT", default=587)
+EMAIL_USE_TLS = env.bool("EMAIL_USE_TLS", default=True)
+EMAIL_HOST_USER = env.str("EMAIL_HOST_USER", default="cfsu.cookiewebsite@gmail.com")
+EMAIL_HOST_PASSWORD = env.str("GMAIL_PASSWORD", default="")
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=30)
+# How many notification emails to send over each connection, and the most to send each second
+EMAIL_BATCH_SIZE = env.int("EMAIL_BATCH_SIZE", default=50)
+EMAIL_RATE_PER_SECOND = env.float("EMAIL_RATE_PER_SECOND", default=10)
+# How many times to try each email, waiting EMAIL_RETRY_BACKOFF seconds, doubling each time
+EMAIL_MAX_ATTEMPTS = env.int("EMAIL_MAX_ATTEMPTS", default=3)
+EMAIL_RETRY_BACKOFF = env.float("EMAIL_RETRY_BACKOFF", default=1)
 
 # Project Level Constants
 GIRL_SCOUT_TROOP_LEVELS_WITH_NONE = [
@@ -177,6 +214,12 @@ GIRL_SCOUT_TROOP_LEVELS_WITH_NONE = [
 NO_COOKIE_CAPTAIN_ID = 0
 NO_DAISY_TROOP = 0
 
+# Booth hours are entered as the booths' own wall clock time (and stored labelled as UTC), so
+# working out which blocks are still upcoming needs to know what time it is where the booths are.
+BOOTH_TIME_ZONE = env.str("BOOTH_TIME_ZONE", default="America/New_York")
+# How long after a block has started it is still listed, for troops running late
+BOOTH_BLOCK_GRACE_MINUTES = env.int("BOOTH_BLOCK_GRACE_MINUTES", default=90)
+
 BOOTSTRAP_DATEPICKER_PLUS = {
     "variant_options": {
         "date": {
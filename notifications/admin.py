@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Notification
+
+
+class NotificationAdmin(admin.ModelAdmin):
+    model = Notification
+    list_display = ["subject", "address", "channel", "status", "attempts", "created_at", "sent_at"]
+    list_filter = ["status", "channel", "event"]
+    search_fields = ["address", "subject"]
+    readonly_fields = ["created_at", "sent_at"]
+
+
+admin.site.register(Notification, NotificationAdmin)
@@ -0,0 +1,189 @@
+"""Sending the notifications waiting in the outbox, a batch at a time.
+
+Each batch is claimed in a short transaction first: its attempts are counted, and it is marked as
+claimed and its next attempt pushed back until DISPATCH_CLAIM_TIMEOUT from now, so another
+dispatcher running at the same time skips it, and a dispatcher that dies mid-batch only delays it.
+The messages are then sent outside of any transaction.
+
+Notifications are written NOTIFICATION_DIGEST_WINDOW seconds before they are due. When the first
+one for an address comes due, every other one still pending for that address is claimed with it,
+and they are all sent as a single digest, so a bulk change by an admin sends each person one
+message instead of dozens.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .mail import build_email, send_emails
+from .models import CHANNEL_TEXT, STATUS_FAILED, STATUS_PENDING, STATUS_SENT, Notification
+from .outbox import NOTE
+from .sms import send_sms_messages
+
+DISPATCH_BATCH_SIZE = 100
+DISPATCH_MAX_ATTEMPTS = 5
+# How long a claimed batch is left alone before another dispatcher may try it
+DISPATCH_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+class DispatchResult:
+    """
+    The outcome of a dispatch.
+
+    Attributes:
+        sent (int): How many notifications were sent.
+        retrying (int): How many failed, and will be tried again later.
+        failed (int): How many failed for the last time.
+        messages (int): How many emails and texts they were sent in, with digests counted once.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.retrying = 0
+        self.failed = 0
+        self.messages = 0
+
+    @property
+    def attempted(self):
+        return self.sent + self.retrying + self.failed
+
+
+def dispatch_notifications(batch_size=DISPATCH_BATCH_SIZE, max_attempts=DISPATCH_MAX_ATTEMPTS):
+    """
+    Send every notification that is due, a batch at a time.
+
+    Args:
+        batch_size (int): How many notifications to claim at once.
+        max_attempts (int): How many times to try a notification before giving up on it.
+
+    Returns:
+        DispatchResult: How many were sent, and how many failed.
+    """
+    result = DispatchResult()
+    while True:
+        batch = _claim_batch(batch_size)
+        if not batch:
+            return result
+        _send_batch(batch, max_attempts, result)
+
+
+def _claim_batch(batch_size):
+    now = timezone.now()
+    claimed_until = now + DISPATCH_CLAIM_TIMEOUT
+    with transaction.atomic():
+        batch = list(
+            Notification.objects.due(now).select_for_update(skip_locked=True)[:batch_size]
+        )
+        if batch:
+            batch += _claim_digest_companions(batch, now)
+        Notification.objects.filter(id__in=[notification.id for notification in batch]).update(
+            attempts=F("attempts") + 1, next_attempt_at=claimed_until, claimed_until=claimed_until
+        )
+
+    for notification in batch:
+        notification.attempts += 1
+    return batch
+
+
+def _claim_digest_companions(batch, now):
+    # Everything else pending for the same people, due yet or not, goes out in their digests,
+    # unless another dispatcher has claimed it. That dispatcher's row locks are released as soon
+    # as it has claimed its batch, and the batch stays pending while it is sent, so only the claim
+    # keeps it from being sent twice
+    keys = {_get_digest_key(notification) for notification in batch}
+    companions = (
+        Notification.objects.filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lte=now),
+            status=STATUS_PENDING,
+            address__in={address for _, address in keys},
+        )
+        .exclude(id__in=[notification.id for notification in batch])
+        .order_by("id")
+        .select_for_update(skip_locked=True)
+    )
+    return [notification for notification in companions if _get_digest_key(notification) in keys]
+
+
+def _get_digest_key(notification):
+    return notification.channel, notification.address
+
+
+def _group_digests(batch):
+    # One group per channel and address, oldest notification first
+    digests = {}
+    for notification in sorted(batch, key=lambda notification: notification.id):
+        digests.setdefault(_get_digest_key(notification), []).append(notification)
+    return list(digests.values())
+
+
+def get_digest(notifications):
+    """
+    Combine notifications for the same address into one message.
+
+    Args:
+        notifications (list): The notifications, in the order they were written.
+
+    Returns:
+        tuple: The subject and the message. A single notification is left as it is.
+    """
+    if len(notifications) == 1:
+        return notifications[0].subject, notifications[0].message
+
+    # Each message ends with the same note, so it is only kept once, at the end
+    messages = [
+        notification.message.removesuffix(NOTE).rstrip() for notification in notifications
+    ]
+    subject = f"{len(notifications)} Booth Reservation Updates"
+    return subject, "\n\n----------\n\n".join(messages) + "\n\n" + NOTE
+
+
+def _send_batch(batch, max_attempts, result):
+    digests = _group_digests(batch)
+    texts = [digest for digest in digests if digest[0].channel == CHANNEL_TEXT]
+    emails = [digest for digest in digests if digest[0].channel != CHANNEL_TEXT]
+    sent_digests = [*zip(texts, _send_texts(texts)), *zip(emails, _send_emails(emails))]
+    result.messages += len(digests)
+
+    # Everything in a digest is sent, or not, together
+    errors = {
+        notification.id: error for digest, error in sent_digests for notification in digest
+    }
+
+    now = timezone.now()
+    for notification in batch:
+        notification.claimed_until = None
+        error = errors[notification.id]
+        if error:
+            notification.last_error = error
+            if notification.attempts >= max_attempts:
+                notification.status = STATUS_FAILED
+                result.failed += 1
+            else:
+                # Back off 1, 2, 4, 8... minutes between attempts
+                notification.next_attempt_at = now + timedelta(
+                    minutes=2 ** (notification.attempts - 1)
+                )
+                result.retrying += 1
+        else:
+            notification.status = STATUS_SENT
+            notification.sent_at = now
+            notification.last_error = ""
+            result.sent += 1
+
+    Notification.objects.bulk_update(
+        batch, ["status", "sent_at", "next_attempt_at", "claimed_until", "last_error"]
+    )
+
+
+def _send_texts(digests):
+    # Every text in the batch is sent at once, on the SMS service's thread pool
+    results = send_sms_messages([(digest[0].address, get_digest(digest)[1]) for digest in digests])
+    return ["" if result.success else result.error for result in results]
+
+
+def _send_emails(digests):
+    # Every email in the batch is sent over the same connection
+    return send_emails(
+        [build_email(*get_digest(digest), digest[0].address) for digest in digests]
+    )
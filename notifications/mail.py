@@ -0,0 +1,107 @@
+"""Sending emails in batches over one reused connection.
+
+Every message in a batch of EMAIL_BATCH_SIZE goes over the same connection to the email server,
+instead of send_mail opening (and logging in to) a new one for each. Messages are sent no faster
+than EMAIL_RATE_PER_SECOND, and each one is retried on its own, over a fresh connection, when the
+server fails in a way that might not happen again.
+"""
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+
+from .sms import RateLimiter
+
+
+def build_email(subject, message, address):
+    """
+    Render a notification email, as plain text with an HTML alternative.
+
+    Args:
+        subject (str): The subject.
+        message (str): The plain text message.
+        address (str): Who to send it to.
+
+    Returns:
+        EmailMultiAlternatives: The email.
+    """
+    context = {"subject": subject, "message": message}
+    email = EmailMultiAlternatives(
+        subject,
+        render_to_string("notifications/email.txt", context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[address],
+    )
+    email.attach_alternative(render_to_string("notifications/email.html", context), "text/html")
+    return email
+
+
+def send_emails(messages, batch_size=None, rate=None, max_attempts=None, connection=None):
+    """
+    Send emails in batches, each batch over one connection.
+
+    Args:
+        messages (iterable): The EmailMessages.
+        batch_size (int): How many to send over each connection. Defaults to EMAIL_BATCH_SIZE.
+        rate (float): The most to send per second, or 0 for no limit. Defaults to
+            EMAIL_RATE_PER_SECOND.
+        max_attempts (int): How many times to try each one. Defaults to EMAIL_MAX_ATTEMPTS.
+        connection (object): The email backend to send with. Defaults to EMAIL_BACKEND.
+
+    Returns:
+        list: Why each message couldn't be sent, or "" if it was, in the same order.
+    """
+    messages = list(messages)
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    limiter = RateLimiter(settings.EMAIL_RATE_PER_SECOND if rate is None else rate)
+    max_attempts = max_attempts or settings.EMAIL_MAX_ATTEMPTS
+    connection = connection or get_connection()
+
+    errors = []
+    for start in range(0, len(messages), batch_size):
+        try:
+            for message in messages[start : start + batch_size]:
+                errors.append(_send_with_retries(connection, limiter, max_attempts, message))
+        finally:
+            _close(connection)
+    return errors
+
+
+def _send_with_retries(connection, limiter, max_attempts, message):
+    attempt = 0
+    while True:
+        attempt += 1
+        limiter.wait()
+        try:
+            # Opens the connection if it isn't already, and leaves it open for the next message
+            connection.open()
+            connection.send_messages([message])
+        except Exception as error:
+            if attempt >= max_attempts or not _is_retryable(error):
+                return f"{type(error).__name__}: {error}"
+            # Start again on a new connection, in case this one is what went wrong, after
+            # backing off 1, 2, 4... seconds
+            _close(connection)
+            time.sleep(settings.EMAIL_RETRY_BACKOFF * 2 ** (attempt - 1))
+        else:
+            return ""
+
+
+def _is_retryable(error):
+    # 4xx answers are the server asking us to try again later, and dropped connections may not
+    # happen again. A 5xx answer, such as an unknown address, will be the same next time.
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        # A connection that has already failed may fail to close, too
+        pass
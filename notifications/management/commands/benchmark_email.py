@@ -0,0 +1,49 @@
+"""Compare sending emails over a new connection each with sending them in batches over one.
+
+The emails go to a local SMTP sink, so nothing is sent and no account is needed:
+
+    python manage.py benchmark_email --messages 500
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.mail import build_email, send_emails
+from notifications.smtp_sink import SmtpSink
+
+
+class Command(BaseCommand):
+    help = "Benchmark sending emails one connection each against batches over one connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=500, help="Number of emails")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_BATCH_SIZE,
+            help="Number of emails to send over each connection",
+        )
+
+    def handle(self, *args, **options):
+        messages = [
+            build_email("Benchmark", f"Benchmark message {number}", f"tcc{number}@troop.org")
+            for number in range(options["messages"])
+        ]
+
+        for label, batch_size in (
+            ("One connection each", 1),
+            (f"Batches of {options['batch_size']}", options["batch_size"]),
+        ):
+            with SmtpSink() as sink:
+                start = time.perf_counter()
+                errors = send_emails(
+                    messages, batch_size=batch_size, rate=0, connection=sink.get_connection()
+                )
+                seconds = time.perf_counter() - start
+
+            sent = errors.count("")
+            self.stdout.write(
+                f"{label}: {sent} emails over {sink.connections} connections in {seconds:.2f}s "
+                f"({sent / seconds:.0f} emails/sec)"
+            )
@@ -0,0 +1,53 @@
+"""Compare sending text messages one after another with sending them on the thread pool.
+
+The messages go to the FakeBackend, which waits as long as a real service would take to answer, so
+nothing is sent and no account is needed:
+
+    python manage.py benchmark_sms --messages 200 --latency 0.1
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.sms import FakeBackend, send_sms_messages
+
+
+class Command(BaseCommand):
+    help = "Benchmark sending text messages sequentially against the pooled SMS service"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200, help="Number of messages")
+        parser.add_argument(
+            "--latency", type=float, default=0.1, help="Seconds the fake service takes per message"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.SMS_MAX_WORKERS,
+            help="Number of messages sending at once on the pool",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=0,
+            help="Most messages to start per second on the pool, or 0 for no limit",
+        )
+
+    def handle(self, *args, **options):
+        messages = [(f"+1202555{number:04d}", "Benchmark") for number in range(options["messages"])]
+        backend = FakeBackend(latency=options["latency"])
+
+        for label, workers, rate in (
+            ("Sequential", 1, 0),
+            (f"Pool of {options['workers']}", options["workers"], options["rate"]),
+        ):
+            start = time.perf_counter()
+            results = send_sms_messages(
+                messages, max_workers=workers, rate=rate, backend=backend
+            )
+            seconds = time.perf_counter() - start
+            sent = sum(result.success for result in results)
+            self.stdout.write(
+                f"{label}: {sent} messages in {seconds:.2f}s ({sent / seconds:.0f} messages/sec)"
+            )
@@ -0,0 +1,51 @@
+"""Send the notifications waiting in the outbox. Run it from cron, or leave it running:
+
+    python manage.py dispatch_notifications --loop
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.dispatch import (
+    DISPATCH_BATCH_SIZE,
+    DISPATCH_MAX_ATTEMPTS,
+    dispatch_notifications,
+)
+
+
+class Command(BaseCommand):
+    help = "Send pending email and text notifications, retrying the ones that fail"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DISPATCH_BATCH_SIZE,
+            help="Number of notifications to claim at once",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=DISPATCH_MAX_ATTEMPTS,
+            help="Number of times to try a notification before giving up on it",
+        )
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep running, checking for new notifications"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Seconds to wait between checks with --loop"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = dispatch_notifications(
+                batch_size=options["batch_size"], max_attempts=options["max_attempts"]
+            )
+            if result.attempted or not options["loop"]:
+                self.stdout.write(
+                    f"Sent {result.sent}, retrying {result.retrying}, failed {result.failed} "
+                    f"in {result.messages} messages"
+                )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
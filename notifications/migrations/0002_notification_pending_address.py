@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookie_booths', '0014_boothblock_upcoming'),
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('status', 0)), fields=['address'], name='notification_pending_address'),
+        ),
+    ]
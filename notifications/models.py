@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+CHANNEL_EMAIL = 0
+CHANNEL_TEXT = 1
+CHANNELS = [(CHANNEL_EMAIL, "Email"), (CHANNEL_TEXT, "Text")]
+
+STATUS_PENDING = 0
+STATUS_SENT = 1
+STATUS_FAILED = 2
+STATUSES = [(STATUS_PENDING, "Pending"), (STATUS_SENT, "Sent"), (STATUS_FAILED, "Failed")]
+
+
+class NotificationQuerySet(models.QuerySet):
+    def due(self, now=None):
+        """
+        Filter to the notifications still waiting to be sent whose next attempt has come.
+
+        Args:
+            now (datetime): The time to compare against. Defaults to now.
+
+        Returns:
+            QuerySet: The notifications, oldest first.
+        """
+        return self.filter(
+            status=STATUS_PENDING, next_attempt_at__lte=now or timezone.now()
+        ).order_by("id")
+
+
+class Notification(models.Model):
+    """
+    A message waiting to be sent, or already sent, to one user.
+
+    Notifications are written in the same transaction as the change they are about, and sent later
+    by the dispatch_notifications command, so a slow email or text provider never holds up the
+    change itself.
+    """
+
+    event = models.CharField(max_length=50)
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    block = models.ForeignKey(
+        "cookie_booths.BoothBlock", null=True, blank=True, on_delete=models.SET_NULL
+    )
+    channel = models.SmallIntegerField(choices=CHANNELS, default=CHANNEL_EMAIL)
+    # The email address or phone number, as it was when the notification was written
+    address = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+
+    status = models.SmallIntegerField(choices=STATUSES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Set while a dispatcher is sending it, so that no other dispatcher claims it as well
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The dispatcher only ever looks for pending notifications that are due
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=Q(status=STATUS_PENDING),
+                name="notification_due",
+            ),
+            # And for everything else pending for an address, to send with it as a digest
+            models.Index(
+                fields=["address"],
+                condition=Q(status=STATUS_PENDING),
+                name="notification_pending_address",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.address}"
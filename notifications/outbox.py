@@ -0,0 +1,319 @@
+"""Writing notifications about booth reservations to the outbox.
+
+Call these inside the transaction that makes the change, so a notification is kept if and only if
+the change is. Sending them is left to the dispatch_notifications command, which combines the ones
+for the same person that are written within NOTIFICATION_DIGEST_WINDOW seconds of each other.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CHANNEL_EMAIL, CHANNEL_TEXT, Notification
+
+NOTE = (
+    "NOTE: Please do not reply to this message directly, it is not monitored. Please reach out to "
+    "an administrator with any further questions."
+)
+
+BLOCK_RESERVED = "block_reserved"
+BLOCK_CANCELLED = "block_cancelled"
+DAISY_BLOCK_RESERVED = "daisy_block_reserved"
+DAISY_BLOCK_CANCELLED = "daisy_block_cancelled"
+BLOCKS_REMOVED = "blocks_removed"
+BLOCKS_ENABLED = "blocks_enabled"
+BLOCKS_DISABLED = "blocks_disabled"
+BLOCKS_FREEFORALL = "blocks_freeforall"
+BLOCK_HELD = "block_held"
+
+BLOCK_EVENT_SUBJECTS = {
+    BLOCK_RESERVED: "Booth Reservation Confirmed",
+    BLOCK_CANCELLED: "Booth Reservation Cancelled",
+    DAISY_BLOCK_RESERVED: "Daisy Booth Reservation Confirmed",
+    DAISY_BLOCK_CANCELLED: "Daisy Booth Reservation Cancelled",
+    BLOCKS_REMOVED: "Your Reserved Booth Blocks Have Been Removed",
+    BLOCKS_ENABLED: "Your Reserved Booth Blocks Have Been Enabled",
+    BLOCKS_DISABLED: "Your Reserved Booth Blocks Have Been Disabled",
+    BLOCKS_FREEFORALL: "Your Reserved Booth Blocks Are Now Free For All",
+    BLOCK_HELD: "Booth Held For Cookie Captains",
+}
+
+# What the people who held a batch of changed blocks are told before the list of them
+BLOCKS_CHANGED_INTROS = {
+    BLOCKS_REMOVED: (
+        "Due to a schedule change, the following blocks are no longer available for reservation:"
+    ),
+    BLOCKS_ENABLED: "The following blocks you reserved have been enabled again:",
+    BLOCKS_DISABLED: (
+        "The following blocks you reserved have been disabled until an administrator enables "
+        "them again:"
+    ),
+    BLOCKS_FREEFORALL: (
+        "The days of the following blocks you reserved are now free for all, so any troop can "
+        "reserve the blocks around them. Your reservations are unchanged:"
+    ),
+}
+
+# The permission that makes a user a cookie captain
+COOKIE_CAPTAIN_PERMISSION = ("cookie_booths", "cookie_captain_reserve_block")
+
+# What the blocks being changed are read with, in one query
+REMOVED_BLOCK_FIELDS = (
+    "booth_day__booth__booth_location",
+    "booth_day__booth__booth_address",
+    "booth_day__booth_day_date",
+    "booth_block_start_time",
+    "booth_block_end_time",
+    "booth_block_current_troop_owner",
+    "booth_block_current_cookie_captain_owner",
+    "booth_block_daisy_reserved",
+    "booth_block_daisy_troop_owner",
+)
+
+
+def queue_block_notifications(block, event, troop_numbers=(), cookie_captain_ids=()):
+    """
+    Write a notification about a block to the coordinators of the given troops and to the given
+    cookie captains, by email or text as each of them prefers.
+
+    Args:
+        block (BoothBlock): The block the notification is about.
+        event (str): One of the BLOCK_EVENT_SUBJECTS.
+        troop_numbers (iterable): The troops whose coordinators to notify. 0 is ignored.
+        cookie_captain_ids (iterable): The cookie captains to notify. 0 is ignored.
+
+    Returns:
+        list: The notifications written.
+    """
+    troop_numbers = [troop_number for troop_number in troop_numbers if troop_number]
+    cookie_captain_ids = [user_id for user_id in cookie_captain_ids if user_id]
+    if not troop_numbers and not cookie_captain_ids:
+        return []
+
+    return _queue_for_block(block, event, _get_recipients(troop_numbers, cookie_captain_ids))
+
+
+def queue_held_block_notifications(block):
+    """
+    Write a notification about a block being held for cookie captains to every cookie captain, by
+    email or text as each of them prefers.
+
+    Args:
+        block (BoothBlock): The block that was held.
+
+    Returns:
+        list: The notifications written.
+    """
+    app_label, codename = COOKIE_CAPTAIN_PERMISSION
+    cookie_captains = get_user_model().objects.filter(
+        Q(
+            user_permissions__content_type__app_label=app_label,
+            user_permissions__codename=codename,
+        )
+        | Q(
+            groups__permissions__content_type__app_label=app_label,
+            groups__permissions__codename=codename,
+        )
+    )
+
+    return _queue_for_block(block, BLOCK_HELD, cookie_captains)
+
+
+def queue_removed_block_notifications(blocks):
+    """
+    Write one notification to everyone who held any of the given blocks, listing every one of
+    their blocks among them, before the blocks are deleted.
+
+    Args:
+        blocks (QuerySet): The blocks about to be deleted. Only reserved ones are told about.
+
+    Returns:
+        list: The notifications written.
+    """
+    return queue_changed_block_notifications(blocks, BLOCKS_REMOVED)
+
+
+def queue_changed_block_notifications(blocks, event):
+    """
+    Write one notification to everyone who held any of the given blocks, listing every one of
+    their blocks among them.
+
+    The blocks and their owners are each read with one query, however many blocks there are, so
+    call this with the blocks a bulk change is about to make, inside the same transaction.
+
+    Args:
+        blocks (QuerySet): The blocks about to change. Only reserved ones are told about.
+        event (str): One of the BLOCKS_CHANGED_INTROS.
+
+    Returns:
+        list: The notifications written.
+    """
+    rows = list(
+        blocks.filter(booth_block_reserved=True)
+        .order_by("booth_day__booth_day_date", "booth_block_start_time")
+        .values_list(*REMOVED_BLOCK_FIELDS)
+    )
+    if not rows:
+        return []
+
+    troop_numbers = set()
+    cookie_captain_ids = set()
+    for *_, troop_number, cookie_captain_id, daisy_reserved, daisy_troop_number in rows:
+        troop_numbers.add(troop_number)
+        cookie_captain_ids.add(cookie_captain_id)
+        if daisy_reserved:
+            troop_numbers.add(daisy_troop_number)
+    troop_numbers.discard(0)
+    cookie_captain_ids.discard(0)
+
+    # One row per user and troop they coordinate, so each troop's coordinators can be looked up
+    recipients = {}
+    troop_recipients = {}
+    for user_id, email, first_name, communication_preference, phone_number, troop_number in (
+        _get_recipients(troop_numbers, cookie_captain_ids).values_list(
+            "id",
+            "email",
+            "first_name",
+            "userpreferences__communication_preference",
+            "userpreferences__phone_number",
+            "coordinated_troops__troop_number",
+        )
+    ):
+        recipients[user_id] = (email, first_name, communication_preference, phone_number)
+        troop_recipients.setdefault(troop_number, set()).add(user_id)
+
+    # Each user's blocks in date order, once each even when they held a block more than one way
+    user_blocks = {}
+    for (
+        location,
+        address,
+        date,
+        start_time,
+        end_time,
+        troop_number,
+        cookie_captain_id,
+        daisy_reserved,
+        daisy_troop_number,
+    ) in rows:
+        owners = troop_recipients.get(troop_number, set()) | {cookie_captain_id}
+        if daisy_reserved:
+            owners |= troop_recipients.get(daisy_troop_number, set())
+        description = _describe_block(location, address, date, start_time, end_time)
+        for user_id in owners & recipients.keys():
+            user_blocks.setdefault(user_id, []).append(description)
+
+    subject = BLOCK_EVENT_SUBJECTS[event]
+    notifications = []
+    for user_id, descriptions in user_blocks.items():
+        email, first_name, communication_preference, phone_number = recipients[user_id]
+        message = (
+            f"Hello {first_name or email},\n\n{BLOCKS_CHANGED_INTROS[event]}\n\n"
+            + "\n\n".join(descriptions)
+            + "\n\n"
+            + NOTE
+        )
+        notifications.append(
+            _notification(
+                event,
+                user_id,
+                email,
+                communication_preference,
+                phone_number,
+                subject,
+                message,
+            )
+        )
+
+    return Notification.objects.bulk_create(notifications)
+
+
+def get_block_message(block, subject):
+    """
+    Describe a block for a notification.
+
+    Args:
+        block (BoothBlock): The block.
+        subject (str): What happened to it.
+
+    Returns:
+        str: The message.
+    """
+    booth_day = block.booth_day
+    description = _describe_block(
+        booth_day.booth.booth_location,
+        booth_day.booth.booth_address,
+        booth_day.booth_day_date,
+        block.booth_block_start_time,
+        block.booth_block_end_time,
+    )
+    return f"{subject}\n\n{description}\n\n{NOTE}"
+
+
+def _queue_for_block(block, event, users):
+    # The users are found in one query
+    recipients = users.distinct().values_list(
+        "id",
+        "email",
+        "userpreferences__communication_preference",
+        "userpreferences__phone_number",
+    )
+
+    subject = BLOCK_EVENT_SUBJECTS[event]
+    message = get_block_message(block, subject)
+    notifications = [
+        _notification(
+            event, user_id, email, communication_preference, phone_number, subject, message, block
+        )
+        for user_id, email, communication_preference, phone_number in recipients
+    ]
+
+    return Notification.objects.bulk_create(notifications)
+
+
+def _get_recipients(troop_numbers, cookie_captain_ids):
+    # Coordinators are linked to their troops, so the troops themselves don't need to be read
+    return get_user_model().objects.filter(
+        Q(coordinated_troops__troop_number__in=troop_numbers) | Q(id__in=cookie_captain_ids)
+    )
+
+
+def _notification(
+    event, user_id, email, communication_preference, phone_number, subject, message, block=None
+):
+    # By text for users who would rather, and have a number to text. It isn't due until the
+    # digest window has passed, so anything else for them by then goes in the same message.
+    if communication_preference == CHANNEL_TEXT and phone_number:
+        channel, address = CHANNEL_TEXT, str(phone_number)
+    else:
+        channel, address = CHANNEL_EMAIL, email
+
+    return Notification(
+        event=event,
+        recipient_id=user_id,
+        block=block,
+        channel=channel,
+        address=address,
+        subject=subject,
+        message=message,
+        next_attempt_at=timezone.now() + timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW),
+    )
+
+
+def _describe_block(location, address, date, start_time, end_time):
+    return (
+        f"Location: {location}\n"
+        f"Address: {address}\n"
+        f"Date: {_format(date, '%A, %B %d, %Y')}\n"
+        f"Time Block: {_format(start_time, '%I:%M %p')} - {_format(end_time, '%I:%M %p')}"
+    )
+
+
+def _format(value, format_):
+    # Blocks of days without hours yet have no times
+    if value is None:
+        return ""
+    if hasattr(value, "tzinfo"):
+        value = timezone.localtime(value)
+    return value.strftime(format_)
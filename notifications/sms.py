@@ -0,0 +1,194 @@
+"""Sending text messages.
+
+Which service sends them is set by SMS_BACKEND, the same way EMAIL_BACKEND picks the email one.
+Each process keeps one backend, and so one Twilio client, for every message it sends. Messages are
+sent in parallel on a small thread pool, no faster than SMS_RATE_PER_SECOND, and each recipient is
+retried on its own when the service fails in a way that might not happen again.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from twilio.base.exceptions import TwilioRestException
+from twilio.rest import Client
+
+# Messages sent with the FakeBackend, like django.core.mail.outbox for emails
+outbox = []
+
+
+class SmsResult:
+    """
+    The outcome of sending one message.
+
+    Attributes:
+        recipient (str): The phone number.
+        success (bool): Whether the message was sent.
+        message_id (str): The id the service gave the message, if it was sent.
+        error (str): Why the message wasn't sent, if it wasn't.
+        attempts (int): How many times sending it was tried.
+    """
+
+    def __init__(self, recipient, success, message_id=None, error="", attempts=1):
+        self.recipient = recipient
+        self.success = success
+        self.message_id = message_id
+        self.error = error
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"<SmsResult {self.recipient} success={self.success} attempts={self.attempts}>"
+
+
+class TwilioBackend:
+    """Sends text messages through Twilio, with one client for as long as the backend is kept"""
+
+    def __init__(self):
+        self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+    def send(self, recipient, message):
+        return self.client.messages.create(
+            to=recipient, from_=settings.TWILIO_NUMBER, body=message
+        ).sid
+
+    def is_retryable(self, error):
+        # Twilio answers 429 when we send too fast, and 5xx when it's having trouble. Anything
+        # else it turns down, such as a bad phone number, will be turned down again.
+        if isinstance(error, TwilioRestException):
+            return error.status == 429 or error.status >= 500
+        return True
+
+
+class FakeBackend:
+    """
+    Keeps text messages in outbox instead of sending them, after waiting SMS_FAKE_LATENCY seconds
+    as a real service would. Used by the tests, and for trying out throughput offline.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = settings.SMS_FAKE_LATENCY if latency is None else latency
+        self.lock = threading.Lock()
+
+    def send(self, recipient, message):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            outbox.append((recipient, message))
+            return f"FAKE{len(outbox)}"
+
+    def is_retryable(self, error):
+        return True
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1 / rate seconds apart, across every thread"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_until = max(self.next_time, now)
+            self.next_time = wait_until + self.interval
+        if wait_until > now:
+            time.sleep(wait_until - now)
+
+
+_backend = {}
+
+
+def get_sms_backend():
+    """
+    Get this process's backend for SMS_BACKEND, creating it the first time.
+
+    Returns:
+        object: The backend.
+    """
+    if "backend" not in _backend:
+        _backend["backend"] = import_string(settings.SMS_BACKEND)()
+    return _backend["backend"]
+
+
+@receiver(setting_changed)
+def reset_sms_backend(setting, **kwargs):
+    # Tests switch backends with override_settings
+    if setting in ("SMS_BACKEND", "SMS_FAKE_LATENCY", "TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN"):
+        _backend.clear()
+
+
+def send_sms(message, recipients, **kwargs):
+    """
+    Send the same text message to every recipient.
+
+    Args:
+        message (str): The message.
+        recipients (iterable): Phone numbers.
+        **kwargs: See send_sms_messages.
+
+    Returns:
+        list: An SmsResult for each recipient, in the same order.
+    """
+    return send_sms_messages([(recipient, message) for recipient in recipients], **kwargs)
+
+
+def send_sms_messages(messages, max_workers=None, rate=None, max_attempts=None, backend=None):
+    """
+    Send a text message to each recipient.
+
+    Args:
+        messages (iterable): (phone number, message) pairs.
+        max_workers (int): How many messages can be sending at once. Defaults to SMS_MAX_WORKERS.
+        rate (float): The most messages to start per second, or 0 for no limit. Defaults to
+            SMS_RATE_PER_SECOND.
+        max_attempts (int): How many times to try each recipient. Defaults to SMS_MAX_ATTEMPTS.
+        backend (object): Send with this instead of this process's SMS_BACKEND.
+
+    Returns:
+        list: An SmsResult for each message, in the same order. Ones with a blank phone number
+            aren't tried.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+
+    backend = backend or get_sms_backend()
+    limiter = RateLimiter(settings.SMS_RATE_PER_SECOND if rate is None else rate)
+    max_attempts = max_attempts or settings.SMS_MAX_ATTEMPTS
+    max_workers = min(max_workers or settings.SMS_MAX_WORKERS, len(messages))
+
+    def send(recipient_message):
+        return _send_with_retries(backend, limiter, max_attempts, *recipient_message)
+
+    if max_workers == 1:
+        return [send(recipient_message) for recipient_message in messages]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(send, messages))
+
+
+def _send_with_retries(backend, limiter, max_attempts, recipient, message):
+    if not recipient:
+        return SmsResult(recipient, False, error="No phone number", attempts=0)
+
+    attempt = 0
+    while True:
+        attempt += 1
+        limiter.wait()
+        try:
+            message_id = backend.send(recipient, message)
+        except Exception as error:
+            if attempt >= max_attempts or not backend.is_retryable(error):
+                return SmsResult(
+                    recipient, False, error=f"{type(error).__name__}: {error}", attempts=attempt
+                )
+            # Back off 0.5, 1, 2... seconds before trying this recipient again
+            time.sleep(settings.SMS_RETRY_BACKOFF * 2 ** (attempt - 1))
+        else:
+            return SmsResult(recipient, True, message_id=message_id, attempts=attempt)
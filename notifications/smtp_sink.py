@@ -0,0 +1,140 @@
+"""A local SMTP server that keeps every message it is sent, for tests and benchmarks.
+
+It speaks just enough SMTP for Django's SMTP backend (no TLS and no login), counts the connections
+made to it, and can turn messages down to test retries:
+
+    with SmtpSink() as sink:
+        connection = sink.get_connection()
+        ...
+    print(len(sink.messages), sink.connections, sink.messages_per_second)
+"""
+import socketserver
+import threading
+import time
+
+from django.core.mail import get_connection
+
+
+class SmtpSink:
+    """
+    Accepts SMTP connections on a free local port, on a background thread.
+
+    Attributes:
+        host (str): The address it listens on.
+        port (int): The port it listens on, picked when it starts.
+        messages (list): (sender, recipients, data) for each message accepted.
+        connections (int): How many connections have been made to it.
+        reject_next (int): How many of the next messages to turn down.
+        reject_code (int): What to turn them down with: a 4xx is worth retrying, a 5xx isn't.
+    """
+
+    def __init__(self, host="127.0.0.1"):
+        self.host = host
+        self.port = None
+        self.messages = []
+        self.connections = 0
+        self.reject_next = 0
+        self.reject_code = 451
+        self.message_times = []
+        self.lock = threading.Lock()
+        self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self.server = socketserver.ThreadingTCPServer((self.host, 0), _SmtpHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_connection(self, **kwargs):
+        """
+        Get an SMTP email backend that sends to this sink.
+
+        Returns:
+            EmailBackend: The backend, not opened yet.
+        """
+        return get_connection(
+            "django.core.mail.backends.smtp.EmailBackend",
+            host=self.host,
+            port=self.port,
+            username="",
+            password="",
+            use_tls=False,
+            use_ssl=False,
+            **kwargs,
+        )
+
+    @property
+    def messages_per_second(self):
+        """How fast messages arrived, from the first to the last"""
+        if len(self.message_times) < 2:
+            return 0
+        seconds = self.message_times[-1] - self.message_times[0]
+        return (len(self.message_times) - 1) / seconds if seconds else float("inf")
+
+    def accept(self, sender, recipients, data):
+        # Return the reply to send for a message, keeping it unless it's turned down
+        with self.lock:
+            if self.reject_next:
+                self.reject_next -= 1
+                return f"{self.reject_code} Message turned down by the test sink"
+            self.messages.append((sender, recipients, data))
+            self.message_times.append(time.perf_counter())
+        return "250 OK"
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    @property
+    def sink(self):
+        return self.server.sink
+
+    def handle(self):
+        with self.sink.lock:
+            self.sink.connections += 1
+        self.reply("220 localhost SMTP sink")
+
+        sender, recipients = None, []
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                sender, recipients = command[10:], []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command[8:])
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                self.reply(self.sink.accept(sender, recipients, self.read_data()))
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def read_data(self):
+        lines = []
+        for line in self.rfile:
+            if line == b".\r\n":
+                break
+            # Lines starting with a dot had another added to them to be sent
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+    def reply(self, response):
+        self.wfile.write(f"{response}\r\n".encode())
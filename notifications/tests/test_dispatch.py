@@ -0,0 +1,211 @@
+# Tests for sending the notifications in the outbox
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notifications import sms
+from notifications.dispatch import (
+    DISPATCH_CLAIM_TIMEOUT,
+    _claim_batch,
+    dispatch_notifications,
+    get_digest,
+)
+from notifications.models import (
+    CHANNEL_EMAIL,
+    CHANNEL_TEXT,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_SENT,
+    Notification,
+)
+from notifications.outbox import NOTE
+
+
+def _notification(**fields):
+    fields = {
+        "event": "block_reserved",
+        "channel": CHANNEL_EMAIL,
+        "address": "tcc@troop.org",
+        "subject": "Booth Reservation Confirmed",
+        "message": "Location: Dunkin Donuts",
+        **fields,
+    }
+    return Notification.objects.create(**fields)
+
+
+@override_settings(
+    SMS_BACKEND="notifications.sms.FakeBackend", SMS_RETRY_BACKOFF=0, EMAIL_RETRY_BACKOFF=0
+)
+class DispatchTestCase(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+
+    def test_sends_email(self):
+        notification = _notification()
+
+        result = dispatch_notifications()
+
+        self.assertEqual(result.sent, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["tcc@troop.org"])
+        self.assertEqual(mail.outbox[0].subject, "Booth Reservation Confirmed")
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, STATUS_SENT)
+        self.assertEqual(notification.attempts, 1)
+        self.assertIsNotNone(notification.sent_at)
+
+        # Nothing is sent twice
+        self.assertEqual(dispatch_notifications().attempted, 0)
+
+    def test_sends_text(self):
+        _notification(channel=CHANNEL_TEXT, address="+12025550123")
+
+        result = dispatch_notifications()
+
+        self.assertEqual(result.sent, 1)
+        self.assertEqual(sms.outbox, [("+12025550123", "Location: Dunkin Donuts")])
+        self.assertEqual(mail.outbox, [])
+
+    def test_sends_texts_in_one_batch(self):
+        for number in range(3):
+            _notification(channel=CHANNEL_TEXT, address=f"+1202555012{number}")
+
+        result = dispatch_notifications()
+
+        self.assertEqual(result.sent, 3)
+        self.assertEqual(
+            sorted(address for address, _ in sms.outbox),
+            ["+12025550120", "+12025550121", "+12025550122"],
+        )
+
+    def test_batches(self):
+        for number in range(5):
+            _notification(address=f"tcc{number}@troop.org")
+
+        # Each batch is claimed with a select, a select for anything else pending for the same
+        # addresses and an update, inside a savepoint here since the test is in a transaction, and
+        # marked sent with one more update. The last claim finds nothing.
+        with self.assertNumQueries(3 * 6 + 3):
+            result = dispatch_notifications(batch_size=2)
+
+        self.assertEqual(result.sent, 5)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_retries_with_backoff(self):
+        notification = _notification(channel=CHANNEL_TEXT, address="+12025550123")
+
+        with mock.patch.object(sms.FakeBackend, "send", side_effect=ConnectionError("Timed out")):
+            result = dispatch_notifications(max_attempts=2)
+            self.assertEqual(result.retrying, 1)
+            notification.refresh_from_db()
+            self.assertEqual(notification.status, STATUS_PENDING)
+            self.assertEqual(notification.last_error, "ConnectionError: Timed out")
+            self.assertGreater(notification.next_attempt_at, timezone.now())
+
+            # Not due again until the back off has passed
+            self.assertEqual(dispatch_notifications(max_attempts=2).attempted, 0)
+            Notification.objects.update(next_attempt_at=timezone.now())
+            result = dispatch_notifications(max_attempts=2)
+
+        self.assertEqual(result.failed, 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, STATUS_FAILED)
+        self.assertEqual(notification.attempts, 2)
+
+    def test_sends_digest(self):
+        first = _notification(message=f"Location: Dunkin Donuts\n\n{NOTE}")
+        # Not due yet, but sent with the first rather than on its own later
+        second = _notification(
+            message=f"Location: Safeway\n\n{NOTE}",
+            next_attempt_at=timezone.now() + timedelta(minutes=1),
+        )
+        other = _notification(address="other@troop.org")
+        _notification(channel=CHANNEL_TEXT, address="+12025550123")
+        _notification(channel=CHANNEL_TEXT, address="+12025550123")
+
+        result = dispatch_notifications()
+
+        self.assertEqual(result.sent, 5)
+        self.assertEqual(result.messages, 3)
+        self.assertEqual(len(mail.outbox), 2)
+        digest = mail.outbox[0]
+        self.assertEqual(digest.to, ["tcc@troop.org"])
+        self.assertEqual(digest.subject, "2 Booth Reservation Updates")
+        self.assertLess(digest.body.index("Dunkin Donuts"), digest.body.index("Safeway"))
+        self.assertEqual(digest.body.count(NOTE), 1)
+        self.assertEqual(mail.outbox[1].subject, other.subject)
+        self.assertEqual(len(sms.outbox), 1)
+        self.assertEqual(
+            set(Notification.objects.filter(id__in=[first.id, second.id]).values_list("status")),
+            {(STATUS_SENT,)},
+        )
+
+    def test_digest_retried_together(self):
+        _notification()
+        _notification(next_attempt_at=timezone.now() + timedelta(minutes=1))
+
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=ConnectionError("Down"),
+        ):
+            result = dispatch_notifications()
+
+        self.assertEqual(result.retrying, 2)
+        self.assertEqual(
+            set(Notification.objects.values_list("status", "attempts")), {(STATUS_PENDING, 1)}
+        )
+
+    def test_overlapping_claims(self):
+        first = _notification()
+        companion = _notification(next_attempt_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(set(_claim_batch(100)), {first, companion})
+
+        # Another dispatcher, while the first is still sending, leaves its digest alone
+        later = _notification()
+        self.assertEqual(_claim_batch(100), [later])
+        self.assertEqual(_claim_batch(100), [])
+
+    def test_expired_claim_reclaimed(self):
+        first = _notification()
+        companion = _notification(next_attempt_at=timezone.now() + timedelta(minutes=1))
+        _claim_batch(100)
+
+        # The first dispatcher died, so once its claim runs out the digest is sent again
+        later = _notification()
+        with mock.patch(
+            "django.utils.timezone.now",
+            return_value=timezone.now() + DISPATCH_CLAIM_TIMEOUT + timedelta(minutes=1),
+        ):
+            self.assertEqual(set(_claim_batch(100)), {first, companion, later})
+
+    def test_sent_notifications_unclaimed(self):
+        _notification()
+
+        dispatch_notifications()
+
+        self.assertIsNone(Notification.objects.get().claimed_until)
+
+    def test_single_notification_not_a_digest(self):
+        notification = _notification()
+
+        self.assertEqual(
+            get_digest([notification]), (notification.subject, notification.message)
+        )
+
+    def test_skips_notifications_not_due(self):
+        _notification(next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual(dispatch_notifications().attempted, 0)
+
+    def test_command(self):
+        _notification()
+        out = StringIO()
+
+        call_command("dispatch_notifications", stdout=out)
+
+        self.assertIn("Sent 1, retrying 0, failed 0 in 1 messages", out.getvalue())
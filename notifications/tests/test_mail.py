@@ -0,0 +1,90 @@
+# Tests for sending emails in batches over one connection
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from notifications.mail import build_email, send_emails
+from notifications.smtp_sink import SmtpSink
+
+
+def _emails(count):
+    return [
+        build_email("Booth Reservation", "Location: Dunkin Donuts", f"tcc{number}@troop.org")
+        for number in range(count)
+    ]
+
+
+@override_settings(EMAIL_RATE_PER_SECOND=0, EMAIL_RETRY_BACKOFF=0)
+class SendEmailsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.sink = SmtpSink()
+        self.sink.start()
+        self.addCleanup(self.sink.stop)
+
+    def test_one_connection_per_batch(self):
+        errors = send_emails(_emails(5), batch_size=10, connection=self.sink.get_connection())
+
+        self.assertEqual(errors, [""] * 5)
+        self.assertEqual(len(self.sink.messages), 5)
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual(self.sink.messages[0][1], ["<tcc0@troop.org>"])
+
+    def test_batches(self):
+        send_emails(_emails(5), batch_size=2, connection=self.sink.get_connection())
+
+        self.assertEqual(len(self.sink.messages), 5)
+        self.assertEqual(self.sink.connections, 3)
+        self.assertGreater(self.sink.messages_per_second, 0)
+
+    def test_retries_on_new_connection(self):
+        self.sink.reject_next = 1
+
+        errors = send_emails(_emails(2), connection=self.sink.get_connection())
+
+        self.assertEqual(errors, ["", ""])
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertEqual(self.sink.connections, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        self.sink.reject_next = 3
+
+        errors = send_emails(_emails(2), max_attempts=3, connection=self.sink.get_connection())
+
+        self.assertIn("SMTPDataError", errors[0])
+        self.assertEqual(errors[1], "")
+        self.assertEqual(len(self.sink.messages), 1)
+
+    def test_permanent_failure_not_retried(self):
+        self.sink.reject_next = 1
+        self.sink.reject_code = 550
+
+        errors = send_emails(_emails(2), max_attempts=3, connection=self.sink.get_connection())
+
+        self.assertIn("550", errors[0])
+        self.assertEqual(errors[1], "")
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+
+        call_command("benchmark_email", "--messages", "6", "--batch-size", "3", stdout=out)
+
+        self.assertIn("One connection each: 6 emails over 6 connections", out.getvalue())
+        self.assertIn("Batches of 3: 6 emails over 2 connections", out.getvalue())
+
+
+class BuildEmailTestCase(SimpleTestCase):
+    def test_renders_text_and_html(self):
+        email = build_email("Booth Reservation", "Location: A & B\nDate: Today", "a@b.org")
+
+        self.assertEqual(email.body, "Location: A & B\nDate: Today\n")
+        html, mimetype = email.alternatives[0]
+        self.assertEqual(mimetype, "text/html")
+        self.assertIn("Location: A &amp; B<br>Date: Today", html)
+
+    def test_default_connection(self):
+        send_emails(_emails(2))
+
+        self.assertEqual(len(mail.outbox), 2)
@@ -0,0 +1,245 @@
+# Tests for writing reservation notifications to the outbox
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.timezone import make_aware
+
+from accounts.models import UserPreferences
+from cookie_booths.models import BoothBlock, BoothDay, BoothLocation
+from notifications.models import CHANNEL_EMAIL, CHANNEL_TEXT, Notification
+from notifications.outbox import (
+    BLOCK_CANCELLED,
+    BLOCK_HELD,
+    BLOCK_RESERVED,
+    BLOCKS_DISABLED,
+    BLOCKS_ENABLED,
+    BLOCKS_FREEFORALL,
+    BLOCKS_REMOVED,
+    DAISY_BLOCK_RESERVED,
+    queue_removed_block_notifications,
+)
+from troops.models import Troop
+
+TEST_DATE = datetime.date(2023, 2, 4)
+TROOP_NUMBER = 300
+DAISY_TROOP_NUMBER = 100
+
+
+class OutboxTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user_model = get_user_model()
+        cls.tcc = user_model.objects.create_user(
+            email="tcc@troop.org", password="secret", first_name="Tina"
+        )
+        cls.daisy_tcc = user_model.objects.create_user(email="daisy@troop.org", password="secret")
+        cls.cookie_captain = user_model.objects.create_user(
+            email="captain@troop.org", password="secret"
+        )
+        Troop.objects.create(troop_number=TROOP_NUMBER, troop_cookie_coordinator=cls.tcc.email)
+        Troop.objects.create(
+            troop_number=DAISY_TROOP_NUMBER,
+            troop_cookie_coordinator=cls.daisy_tcc.email,
+            troop_level=1,
+        )
+
+        location = BoothLocation.objects.create(
+            booth_location="Dunkin Donuts", booth_address="1 Main St"
+        )
+        cls.location = location
+        cls.day = day = BoothDay.objects.create(booth=location, booth_day_date=TEST_DATE)
+        day.add_or_update_hours(
+            make_aware(datetime.datetime(2023, 2, 4, 8, 0)),
+            make_aware(datetime.datetime(2023, 2, 4, 16, 0)),
+        )
+        day.enable_day()
+
+    def setUp(self):
+        self.block = BoothBlock.objects.order_by("booth_block_start_time").first()
+
+    def test_reservation_notifies_coordinator(self):
+        self.block.reserve_block(TROOP_NUMBER, 0)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.event, BLOCK_RESERVED)
+        self.assertEqual(notification.recipient, self.tcc)
+        self.assertEqual(notification.block, self.block)
+        self.assertEqual(notification.channel, CHANNEL_EMAIL)
+        self.assertEqual(notification.address, self.tcc.email)
+        self.assertEqual(notification.subject, "Booth Reservation Confirmed")
+        self.assertIn("Location: Dunkin Donuts", notification.message)
+        self.assertIn("Date: Saturday, February 04, 2023", notification.message)
+        self.assertIn("Time Block: 08:00 AM - 10:00 AM", notification.message)
+        # Held for the digest window, in case more follow
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+    def test_text_preference(self):
+        preferences = UserPreferences.objects.get(email=self.tcc)
+        preferences.phone_number = "+12025550123"
+        preferences.communication_preference = CHANNEL_TEXT
+        preferences.save()
+
+        self.block.reserve_block(TROOP_NUMBER, 0)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.channel, CHANNEL_TEXT)
+        self.assertEqual(notification.address, "+12025550123")
+
+    def test_cancellation_notifies_everyone_who_held_block(self):
+        self.block.reserve_block(0, self.cookie_captain.id)
+        self.block.reserve_daisy_block(DAISY_TROOP_NUMBER)
+        self.assertEqual(
+            self._get_recipients(DAISY_BLOCK_RESERVED), {self.daisy_tcc.id, self.cookie_captain.id}
+        )
+
+        self.block.cancel_block()
+        self.assertEqual(
+            self._get_recipients(BLOCK_CANCELLED), {self.daisy_tcc.id, self.cookie_captain.id}
+        )
+
+    def test_failed_reservation_notifies_no_one(self):
+        self.block.reserve_block(TROOP_NUMBER, 0)
+        self.assertFalse(self.block.reserve_block(TROOP_NUMBER + 1, 0))
+
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_troop_without_account(self):
+        self.block.reserve_block(TROOP_NUMBER + 1, 0)
+
+        self.assertFalse(Notification.objects.exists())
+
+    def test_notification_written_with_reservation(self):
+        # If the notification can't be written, neither is the reservation
+        with mock.patch(
+            "cookie_booths.models.queue_block_notifications", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.block.reserve_block(TROOP_NUMBER, 0)
+
+        self.block.refresh_from_db()
+        self.assertFalse(self.block.booth_block_reserved)
+
+    def test_removed_blocks_digest(self):
+        first, _, third, fourth = BoothBlock.objects.order_by("booth_block_start_time")
+        first.reserve_block(TROOP_NUMBER, 0)
+        third.reserve_block(TROOP_NUMBER, 0)
+        fourth.reserve_block(0, self.cookie_captain.id)
+        fourth.reserve_daisy_block(DAISY_TROOP_NUMBER)
+
+        # Only 10 to 12 is left
+        self.day.add_or_update_hours(
+            make_aware(datetime.datetime(2023, 2, 4, 10, 0)),
+            make_aware(datetime.datetime(2023, 2, 4, 12, 0)),
+        )
+
+        self.assertEqual(BoothBlock.objects.count(), 1)
+        self.assertEqual(
+            self._get_recipients(BLOCKS_REMOVED),
+            {self.tcc.id, self.daisy_tcc.id, self.cookie_captain.id},
+        )
+        # One message for both of the troop's blocks, earliest first
+        notification = Notification.objects.get(event=BLOCKS_REMOVED, recipient=self.tcc)
+        self.assertIsNone(notification.block)
+        self.assertEqual(notification.subject, "Your Reserved Booth Blocks Have Been Removed")
+        self.assertTrue(notification.message.startswith("Hello Tina,"))
+        self.assertLess(
+            notification.message.index("Time Block: 08:00 AM - 10:00 AM"),
+            notification.message.index("Time Block: 12:00 PM - 02:00 PM"),
+        )
+        self.assertNotIn("02:00 PM - 04:00 PM", notification.message)
+
+    def test_removed_blocks_read_at_once(self):
+        for number, block in enumerate(BoothBlock.objects.all()):
+            block.reserve_block(TROOP_NUMBER, 0 if number % 2 else self.cookie_captain.id)
+
+        # The blocks, their owners, and one insert, however many blocks there are
+        with self.assertNumQueries(3):
+            notifications = queue_removed_block_notifications(BoothBlock.objects.all())
+
+        self.assertEqual(len(notifications), 2)
+
+    def test_removed_days_notify(self):
+        self.block.reserve_block(TROOP_NUMBER, 0)
+
+        # With no dates set, every day of the booth is removed
+        self.location.update_hours()
+
+        self.assertFalse(BoothBlock.objects.exists())
+        self.assertEqual(self._get_recipients(BLOCKS_REMOVED), {self.tcc.id})
+
+    def test_removed_blocks_not_reserved(self):
+        self.location.update_hours()
+
+        self.assertFalse(Notification.objects.filter(event=BLOCKS_REMOVED).exists())
+
+    def test_disabled_days_digest(self):
+        first, second, *_ = BoothBlock.objects.order_by("booth_block_start_time")
+        first.reserve_block(TROOP_NUMBER, 0)
+        second.reserve_block(TROOP_NUMBER, 0)
+        next_day = self._add_day(TEST_DATE + datetime.timedelta(days=1))
+        BoothBlock.objects.filter(booth_day=next_day).first().reserve_block(TROOP_NUMBER, 0)
+
+        BoothDay.objects.all().set_enabled(False)
+
+        # One message for every block on every day
+        notification = Notification.objects.get(event=BLOCKS_DISABLED)
+        self.assertEqual(notification.recipient, self.tcc)
+        self.assertEqual(notification.message.count("Time Block:"), 3)
+        self.assertIn("Date: Sunday, February 05, 2023", notification.message)
+
+        BoothDay.objects.all().set_enabled(True)
+        self.assertEqual(self._get_recipients(BLOCKS_ENABLED), {self.tcc.id})
+
+    def test_disable_day_notifies(self):
+        self.block.reserve_block(0, self.cookie_captain.id)
+
+        self.day.disable_day()
+
+        self.assertEqual(self._get_recipients(BLOCKS_DISABLED), {self.cookie_captain.id})
+
+    def test_freeforall_digest(self):
+        self.block.reserve_block(TROOP_NUMBER, 0)
+        next_day = self._add_day(TEST_DATE + datetime.timedelta(days=1))
+        BoothBlock.objects.filter(booth_day=next_day).first().reserve_block(TROOP_NUMBER, 0)
+
+        BoothDay.objects.all().enable_freeforall()
+
+        notification = Notification.objects.get(event=BLOCKS_FREEFORALL)
+        self.assertEqual(notification.recipient, self.tcc)
+        self.assertEqual(notification.message.count("Time Block:"), 2)
+        self.assertFalse(BoothBlock.objects.filter(booth_block_freeforall_enabled=False).exists())
+
+        # Days already free for all aren't told about again
+        BoothDay.objects.all().enable_freeforall()
+        self.assertEqual(Notification.objects.filter(event=BLOCKS_FREEFORALL).count(), 1)
+
+    def test_hold_notifies_cookie_captains(self):
+        self.cookie_captain.user_permissions.add(
+            Permission.objects.get(codename="cookie_captain_reserve_block")
+        )
+
+        self.block.hold_for_cookie_captains()
+
+        notification = Notification.objects.get(event=BLOCK_HELD)
+        self.assertEqual(notification.recipient, self.cookie_captain)
+        self.assertEqual(notification.block, self.block)
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    def _add_day(self, date):
+        day = BoothDay.objects.create(booth=self.location, booth_day_date=date)
+        day.add_or_update_hours(
+            make_aware(datetime.datetime.combine(date, datetime.time(8, 0))),
+            make_aware(datetime.datetime.combine(date, datetime.time(16, 0))),
+        )
+        day.enable_day()
+        return day
+
+    @staticmethod
+    def _get_recipients(event):
+        return set(Notification.objects.filter(event=event).values_list("recipient", flat=True))
@@ -0,0 +1,113 @@
+# Tests for the pooled SMS service
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from twilio.base.exceptions import TwilioRestException
+
+from notifications import sms
+
+
+@override_settings(
+    SMS_BACKEND="notifications.sms.FakeBackend",
+    SMS_FAKE_LATENCY=0,
+    SMS_RATE_PER_SECOND=0,
+    SMS_RETRY_BACKOFF=0,
+)
+class SendSmsTestCase(SimpleTestCase):
+    def setUp(self):
+        sms.outbox.clear()
+
+    def test_sends_to_every_recipient_in_order(self):
+        recipients = [f"+1202555012{number}" for number in range(5)]
+
+        results = sms.send_sms("Booth Reservation Confirmed", recipients)
+
+        self.assertEqual([result.recipient for result in results], recipients)
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(
+            sorted(sms.outbox),
+            [(recipient, "Booth Reservation Confirmed") for recipient in recipients],
+        )
+        self.assertEqual(len({result.message_id for result in results}), 5)
+
+    def test_blank_number_is_not_tried(self):
+        results = sms.send_sms_messages([("", "First"), ("+12025550123", "Second")])
+
+        self.assertFalse(results[0].success)
+        self.assertEqual(results[0].attempts, 0)
+        self.assertEqual(results[0].error, "No phone number")
+        self.assertTrue(results[1].success)
+        self.assertEqual(sms.outbox, [("+12025550123", "Second")])
+
+    def test_retries_failures(self):
+        send = mock.Mock(side_effect=[ConnectionError("Timed out"), "SM1"])
+
+        with mock.patch.object(sms.FakeBackend, "send", send):
+            (result,) = sms.send_sms("Hello", ["+12025550123"], max_attempts=3)
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.message_id, "SM1")
+        self.assertEqual(result.attempts, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        send = mock.Mock(side_effect=ConnectionError("Timed out"))
+
+        with mock.patch.object(sms.FakeBackend, "send", send):
+            (result,) = sms.send_sms("Hello", ["+12025550123"], max_attempts=3)
+
+        self.assertFalse(result.success)
+        self.assertEqual(result.attempts, 3)
+        self.assertEqual(result.error, "ConnectionError: Timed out")
+        self.assertEqual(send.call_count, 3)
+
+    def test_backend_is_reused(self):
+        backend = sms.get_sms_backend()
+
+        sms.send_sms("Hello", ["+12025550123"])
+
+        self.assertIs(sms.get_sms_backend(), backend)
+        with override_settings(SMS_FAKE_LATENCY=0.01):
+            self.assertIsNot(sms.get_sms_backend(), backend)
+
+    @override_settings(SMS_FAKE_LATENCY=0.05)
+    def test_sends_in_parallel(self):
+        start = time.monotonic()
+        recipients = [f"+1202555012{number}" for number in range(8)]
+        results = sms.send_sms("Hello", recipients, max_workers=8)
+
+        self.assertTrue(all(result.success for result in results))
+        # One after another these would take 0.4 seconds
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_rate_limit(self):
+        start = time.monotonic()
+        sms.send_sms("Hello", [f"+1202555012{number}" for number in range(5)], rate=50)
+
+        # Five messages at 50 per second can't all start within 0.08 seconds
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+
+        call_command("benchmark_sms", "--messages", "8", "--latency", "0", stdout=out)
+
+        self.assertIn("Sequential: 8 messages", out.getvalue())
+        self.assertIn("Pool of", out.getvalue())
+
+
+@override_settings(TWILIO_ACCOUNT_SID="AC123", TWILIO_AUTH_TOKEN="token")
+class TwilioBackendTestCase(SimpleTestCase):
+    def test_retryable_errors(self):
+        backend = sms.TwilioBackend()
+
+        def error(status):
+            return TwilioRestException(status, "https://api.twilio.com")
+
+        self.assertTrue(backend.is_retryable(error(429)))
+        self.assertTrue(backend.is_retryable(error(503)))
+        self.assertTrue(backend.is_retryable(ConnectionError()))
+        # A bad phone number will be turned down every time
+        self.assertFalse(backend.is_retryable(error(400)))
@@ -1,6 +1,99 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .forms import TroopImportForm
+from .imports import import_troops
 from .models import Troop, TroopSize, TicketParameters
 
-admin.site.register(Troop)
+
+class TroopAdmin(admin.ModelAdmin):
+    model = Troop
+    list_display = [
+        "troop_number",
+        "troop_cookie_coordinator",
+        "troop_level",
+        "troop_size",
+        "ticket_allowance",
+        "golden_ticket_allowance",
+    ]
+    fieldsets = (
+        (
+            None,
+            {
+                "fields": (
+                    "troop_number",
+                    "troop_cookie_coordinator",
+                    "coordinator",
+                    "troop_level",
+                    "troop_size",
+                )
+            },
+        ),
+        (
+            "Ticket Overrides",
+            {"fields": ("total_booth_tickets_override", "booth_golden_tickets_override")},
+        ),
+    )
+    # The coordinator's account is linked from their email when the troop is saved
+    readonly_fields = ("coordinator",)
+    search_fields = ("troop_number", "troop_cookie_coordinator")
+    ordering = ("troop_number",)
+    change_list_template = "admin/troops/troop/change_list.html"
+
+    def get_urls(self):
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_troops_view),
+                name="troops_troop_import",
+            ),
+        ] + super().get_urls()
+
+    def import_troops_view(self, request):
+        # Upload a CSV of troops, and create them all at once
+        if not self.has_add_permission(request):
+            return redirect("admin:troops_troop_changelist")
+
+        result = None
+        if request.method == "POST":
+            form = TroopImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                result = import_troops(form.cleaned_data["csv_file"])
+                if not result.errors:
+                    self.message_user(
+                        request,
+                        f"Imported {result.created} troops "
+                        f"({result.rows_per_second:.0f} rows/sec).",
+                        messages.SUCCESS,
+                    )
+                    return redirect("admin:troops_troop_changelist")
+        else:
+            form = TroopImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Import troops",
+            "form": form,
+            "result": result,
+        }
+        return TemplateResponse(request, "admin/troops/troop/import_troops.html", context)
+
+    def get_queryset(self, request):
+        # Every troop's allowance is worked out in the list query itself
+        return super().get_queryset(request).with_ticket_allowances()
+
+    @admin.display(description="Tickets per week", ordering="ticket_allowance")
+    def ticket_allowance(self, troop):
+        return troop.ticket_allowance
+
+    @admin.display(description="Golden tickets per week", ordering="golden_ticket_allowance")
+    def golden_ticket_allowance(self, troop):
+        return troop.golden_ticket_allowance
+
+
+admin.site.register(Troop, TroopAdmin)
 admin.site.register(TroopSize)
 admin.site.register(TicketParameters)
@@ -0,0 +1,58 @@
+"""The troops the signed-in user coordinates.
+
+They are read once and kept in the user's session, so the booth pages don't look them up on every
+request. The session's copy is read again only after one of the user's own troops has changed,
+which is marked on their account (CustomUser.troops_updated_at). The account is loaded on every
+request anyway, so checking costs nothing, and a change made through any worker (such as taking a
+coordinator off a troop) takes effect on their next request.
+"""
+from .models import Troop
+
+COORDINATOR_TROOPS_SESSION_KEY = "troops:coordinator_troops"
+
+# Everything the booth pages need to reserve for a troop and work out its tickets, in the order
+# they are declared on Troop since that's the order Troop.from_db takes them in
+COORDINATOR_TROOP_FIELDS = (
+    "id",
+    "troop_number",
+    "troop_size",
+    "troop_level",
+    "total_booth_tickets_override",
+    "booth_golden_tickets_override",
+)
+
+
+def get_coordinator_troops(request):
+    """
+    Get the troops the signed-in user coordinates.
+
+    Args:
+        request (HttpRequest): The request, with a session and an authenticated user.
+
+    Returns:
+        list: The troops, lowest troop number first. Only the COORDINATOR_TROOP_FIELDS are loaded.
+    """
+    if hasattr(request, "_coordinator_troops"):
+        return request._coordinator_troops
+
+    troops_updated_at = request.user.troops_updated_at
+    version = troops_updated_at.isoformat() if troops_updated_at else None
+    stored = request.session.get(COORDINATOR_TROOPS_SESSION_KEY)
+    if stored and stored["version"] == version and stored["user_id"] == request.user.id:
+        values = stored["troops"]
+    else:
+        values = list(
+            Troop.objects.filter(coordinator_id=request.user.id)
+            .order_by("troop_number")
+            .values_list(*COORDINATOR_TROOP_FIELDS)
+        )
+        request.session[COORDINATOR_TROOPS_SESSION_KEY] = {
+            "version": version,
+            "user_id": request.user.id,
+            "troops": values,
+        }
+
+    request._coordinator_troops = [
+        Troop.from_db(Troop.objects.db, COORDINATOR_TROOP_FIELDS, row) for row in values
+    ]
+    return request._coordinator_troops
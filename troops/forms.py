@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from django.utils.translation import gettext as _
 
 from .models import Troop
@@ -43,3 +44,33 @@ class TroopForm(forms.ModelForm):
         except KeyError:
             self.troop_number = None
         super(TroopForm, self).__init__(*args, **kwargs)
+
+
+class TroopImportRowForm(forms.Form):
+    """
+    One row of a troop import CSV. Only checks the row on its own: duplicates are checked across
+    the whole file at once by troops.imports.import_troops.
+    """
+
+    troop_number = forms.IntegerField(min_value=1)
+    troop_cookie_coordinator = forms.EmailField()
+    troop_level = forms.TypedChoiceField(
+        choices=settings.GIRL_SCOUT_TROOP_LEVELS_WITH_NONE,
+        coerce=int,
+        empty_value=0,
+        required=False,
+    )
+    troop_size = forms.IntegerField(min_value=0, required=False)
+    total_booth_tickets_override = forms.IntegerField(min_value=0, required=False)
+    booth_golden_tickets_override = forms.IntegerField(min_value=0, required=False)
+
+
+class TroopImportForm(forms.Form):
+    csv_file = forms.FileField(
+        label=_("Troops CSV"),
+        help_text=_(
+            "A header row, then one troop per row: troop_number, troop_cookie_coordinator, "
+            "troop_level, troop_size, and optionally total_booth_tickets_override and "
+            "booth_golden_tickets_override."
+        ),
+    )
@@ -0,0 +1,77 @@
+"""Bulk import of troops from a CSV file.
+
+Every row is validated in memory, duplicates are checked against the database with a single
+query, and the troops are written with one bulk_create. Ticket allowances aren't stored on the
+troops (they are worked out from each troop's size when read), and the coordinators' accounts are
+looked up with one more query, so there is nothing else to write.
+"""
+from django.contrib.auth import get_user_model
+
+from cookie_website.csv_imports import CsvImportResult, read_rows
+
+from .forms import TroopImportRowForm
+from .models import Troop, invalidate_ticket_usage, touch_coordinators
+
+# How many troops are inserted per INSERT statement
+IMPORT_BATCH_SIZE = 500
+
+REQUIRED_IMPORT_COLUMNS = ["troop_number", "troop_cookie_coordinator"]
+
+
+def import_troops(csv_file, dry_run=False):
+    """
+    Create a troop for every row of a CSV file, or none at all if any row has a problem.
+
+    Args:
+        csv_file (file): The CSV, opened in text or binary mode, with a header row.
+        dry_run (bool): Only validate the file, without creating anything.
+
+    Returns:
+        CsvImportResult: What was imported, and any errors.
+    """
+    result = CsvImportResult()
+    troops = [
+        (line, _make_troop(data))
+        for line, data in read_rows(
+            csv_file,
+            TroopImportRowForm,
+            REQUIRED_IMPORT_COLUMNS,
+            result,
+            "troop_number",
+            "Troop {value} is also on line {line}.",
+        )
+    ]
+
+    if troops:
+        # One query for every troop number in the file that is already taken
+        lines = {troop.troop_number: line for line, troop in troops}
+        for troop_number in Troop.objects.filter(troop_number__in=lines).values_list(
+            "troop_number", flat=True
+        ):
+            result.errors.append((lines[troop_number], f"Troop {troop_number} already exists."))
+        result.errors.sort()
+
+    if troops and not result.errors and not dry_run:
+        # bulk_create skips Troop.save(), so the coordinators' accounts are linked here
+        users = dict(
+            get_user_model()
+            .objects.filter(email__in={troop.troop_cookie_coordinator for _, troop in troops})
+            .values_list("email", "id")
+        )
+        for _, troop in troops:
+            troop.coordinator_id = users.get(troop.troop_cookie_coordinator)
+
+        # bulk_create runs every batch in the one transaction
+        Troop.objects.bulk_create([troop for _, troop in troops], batch_size=IMPORT_BATCH_SIZE)
+        invalidate_ticket_usage()
+        touch_coordinators(users.values())
+        result.created = len(troops)
+
+    return result.finish()
+
+
+def _make_troop(data):
+    # Troops read without a size are counted as having none
+    if data["troop_size"] is None:
+        data["troop_size"] = 0
+    return Troop(**data)
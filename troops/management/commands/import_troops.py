@@ -0,0 +1,36 @@
+"""Create troops in bulk from a CSV file, e.g. at the start of a season:
+
+    python manage.py import_troops troops.csv
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from troops.imports import import_troops
+
+
+class Command(BaseCommand):
+    help = "Import troops from a CSV file. Nothing is imported if any row has an error."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", help="CSV file with a header row")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only check the file, without importing it"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["csv_path"], newline="", encoding="utf-8-sig") as csv_file:
+                result = import_troops(csv_file, dry_run=options["dry_run"])
+        except OSError as error:
+            raise CommandError(f"Could not read {options['csv_path']}: {error}")
+
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+
+        summary = result.summary
+        if result.errors:
+            raise CommandError(f"{len(result.errors)} error(s), no troops imported. {summary}")
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"No errors found. {summary}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {result.created} troops. {summary}"))
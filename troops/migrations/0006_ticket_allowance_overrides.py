@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('troops', '0005_troopsize'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='troop',
+            name='booth_golden_tickets_per_week',
+        ),
+        migrations.RemoveField(
+            model_name='troop',
+            name='total_booth_tickets_per_week',
+        ),
+        migrations.AddField(
+            model_name='troop',
+            name='booth_golden_tickets_override',
+            field=models.PositiveSmallIntegerField(blank=True, help_text="Leave blank to use the allowance for the troop's size.", null=True),
+        ),
+        migrations.AddField(
+            model_name='troop',
+            name='total_booth_tickets_override',
+            field=models.PositiveSmallIntegerField(blank=True, help_text="Leave blank to use the allowance for the troop's size.", null=True),
+        ),
+    ]
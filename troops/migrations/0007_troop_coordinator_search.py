@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('troops', '0006_ticket_allowance_overrides'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='troop',
+            index=models.Index(fields=['troop_cookie_coordinator'], name='troop_coordinator_search', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.14 on 2026-10-19 16:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def link_coordinators(apps, schema_editor):
+    # Point every troop at the account with its coordinator's email, in one UPDATE
+    Troop = apps.get_model("troops", "Troop")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Troop.objects.update(
+        coordinator=Subquery(
+            User.objects.filter(email=OuterRef("troop_cookie_coordinator")).values("id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('troops', '0007_troop_coordinator_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='troop',
+            name='coordinator',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coordinated_troops', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(link_coordinators, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,18 @@
+import time
+import uuid
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import pre_save, post_save
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, Count, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from cookie_booths.models import BoothBlock, CookieSeason
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 
@@ -60,75 +72,370 @@ class TroopSize(models.Model):
         super().save(*args, **kwargs)
 
 
+class TroopQuerySet(models.QuerySet):
+    def search(self, query):
+        """
+        Find troops by number, or by the start of their coordinator's email address. Both are
+        indexed: troop_number is unique, and troop_coordinator_search covers prefix lookups.
+
+        Args:
+            query (str): What was typed into the search box.
+
+        Returns:
+            QuerySet: The matching troops, or every troop if the query is blank.
+        """
+        query = query.strip()
+        if not query:
+            return self
+
+        matches = Q(troop_cookie_coordinator__startswith=query)
+        if query.isdigit():
+            matches |= Q(troop_number=int(query))
+        return self.filter(matches)
+
+    def with_ticket_allowances(self):
+        """
+        Annotate each troop with its weekly ticket allowances, worked out by the database from
+        the troop's size and the current ticket parameters, so a whole list of troops is resolved
+        in the one query.
+
+        Returns:
+            QuerySet: The troops, each with ticket_allowance and golden_ticket_allowance.
+        """
+        troop_size, ticket_parameters = get_ticket_config(defaults=True)
+
+        def by_size(small, medium, large):
+            return Case(
+                When(troop_size__gte=troop_size.get_large_troop_size, then=Value(large)),
+                When(troop_size__gte=troop_size.get_medium_troop_size, then=Value(medium)),
+                default=Value(small),
+            )
+
+        return self.annotate(
+            ticket_allowance=Coalesce(
+                "total_booth_tickets_override",
+                by_size(
+                    ticket_parameters.get_small_troop_total_tickets_per_week,
+                    ticket_parameters.get_medium_troop_total_tickets_per_week,
+                    ticket_parameters.get_large_troop_total_tickets_per_week,
+                ),
+            ),
+            golden_ticket_allowance=Coalesce(
+                "booth_golden_tickets_override",
+                by_size(
+                    ticket_parameters.get_small_troop_golden_tickets_per_week,
+                    ticket_parameters.get_medium_troop_golden_tickets_per_week,
+                    ticket_parameters.get_large_troop_golden_tickets_per_week,
+                ),
+            ),
+        )
+
+    def with_week_ticket_usage(self, date=None):
+        """
+        Annotate each troop with how many blocks it has reserved in a week, and how many of those
+        are on golden days, counted by subqueries in the same query as the troops. Daisy troops
+        are counted by the blocks they share, everyone else by the blocks they own.
+
+        Args:
+            date (date): Any day in the week. Defaults to today, where the booths are.
+
+        Returns:
+            QuerySet: The troops, each with tickets_used and golden_tickets_used.
+        """
+        if date is None:
+            date = timezone.localdate(timezone=ZoneInfo(settings.BOOTH_TIME_ZONE))
+        week_start = date - timedelta(days=date.weekday())
+
+        week_blocks = BoothBlock.objects.filter(
+            booth_block_reserved=True,
+            booth_day__booth_day_date__gte=week_start,
+            booth_day__booth_day_date__lte=week_start + timedelta(days=6),
+        )
+
+        def count_blocks(owner_field, **filters):
+            blocks = (
+                week_blocks.filter(**{owner_field: OuterRef("troop_number")}, **filters)
+                .order_by()
+                .values(owner_field)
+                .annotate(count=Count("id"))
+                .values("count")
+            )
+            return Coalesce(Subquery(blocks, output_field=IntegerField()), Value(0))
+
+        def count_by_level(**filters):
+            return Case(
+                When(
+                    troop_level=1,
+                    then=count_blocks(
+                        "booth_block_daisy_troop_owner", booth_block_daisy_reserved=True, **filters
+                    ),
+                ),
+                default=count_blocks("booth_block_current_troop_owner", **filters),
+            )
+
+        return self.annotate(
+            tickets_used=count_by_level(),
+            golden_tickets_used=count_by_level(booth_day__booth_day_is_golden=True),
+        )
+
+
 class Troop(models.Model):
     troop_number = models.IntegerField(unique=True)
     troop_cookie_coordinator = models.EmailField(null=True)
+    # The account with the coordinator's email, linked whenever either one is saved
+    coordinator = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="coordinated_troops",
+    )
 
     troop_size = models.SmallIntegerField(default=0)
     troop_level = models.SmallIntegerField(
         choices=settings.GIRL_SCOUT_TROOP_LEVELS_WITH_NONE, default=0
     )
 
-    total_booth_tickets_per_week = models.PositiveSmallIntegerField(default=0)
-    booth_golden_tickets_per_week = models.PositiveSmallIntegerField(default=0)
+    # Allowances are worked out from the troop's size, unless an admin has pinned them here
+    total_booth_tickets_override = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Leave blank to use the allowance for the troop's size.",
+    )
+    booth_golden_tickets_override = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Leave blank to use the allowance for the troop's size.",
+    )
+
+    objects = TroopQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "troops"
         verbose_name = "troop"
+        indexes = [
+            # Prefix searches on the coordinator's email from the troop list. The operator class
+            # lets PostgreSQL use the index for LIKE 'prefix%'; other databases ignore it.
+            models.Index(
+                fields=["troop_cookie_coordinator"],
+                name="troop_coordinator_search",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
 
     def __str__(self):
         return "Troop " + str(self.troop_number)
 
+    def save(self, *args, **kwargs):
+        previous_coordinator_id = self.coordinator_id
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "troop_cookie_coordinator" in update_fields:
+            self.coordinator_id = (
+                get_user_model()
+                .objects.filter(email=self.troop_cookie_coordinator)
+                .values_list("id", flat=True)
+                .first()
+            )
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "coordinator"}
+        super().save(*args, **kwargs)
+        touch_coordinators([previous_coordinator_id, self.coordinator_id])
+
+    @property
+    def total_booth_tickets_per_week(self):
+        return self.get_ticket_allowances()[0]
+
+    @property
+    def booth_golden_tickets_per_week(self):
+        return self.get_ticket_allowances()[1]
+
+    def get_ticket_allowances(self):
+        """
+        Work out the troop's weekly ticket allowances from its size and the current ticket
+        parameters, or the admin's overrides if they are set.
+
+        Returns:
+            tuple: (total tickets, golden tickets) per week.
+        """
+        total_tickets = self.total_booth_tickets_override
+        golden_tickets = self.booth_golden_tickets_override
+        if total_tickets is None or golden_tickets is None:
+            size_total, size_golden = get_size_ticket_allowances(self.troop_size)
+            total_tickets = size_total if total_tickets is None else total_tickets
+            golden_tickets = size_golden if golden_tickets is None else golden_tickets
+
+        return total_tickets, golden_tickets
+
+
+# TroopSize and TicketParameters are read once per process and kept until either is saved. Saving
+# one replaces the version held in the cache, which tells every other worker to reload them. That
+# takes a cache shared by every worker (see CACHES), so copies are also reloaded after
+# TICKET_CONFIG_MAX_AGE seconds, in case it isn't.
+TICKET_CONFIG_VERSION_KEY = "troops:ticket_config_version"
+TICKET_CONFIG_MAX_AGE = 60
+_ticket_config = {
+    "version": None,
+    "loaded_at": None,
+    "troop_size": None,
+    "ticket_parameters": None,
+}
+
 
-@receiver(pre_save, sender=Troop)
-def update_troop(sender, instance, **kwargs):
-    # This really should only care about setting/updating these after creation, but there is always the chance
-    # A troop could be updated after the fact. In that case, if they've booked more blocks than they should've,
-    # oh well.
-    if not TroopSize.objects.first():
-        TroopSize.objects.create()
-    if not TicketParameters.objects.first():    
-        TicketParameters.objects.create()
-    update_tickets(instance)
+def get_ticket_config(defaults=False):
+    """
+    Get the TroopSize and TicketParameters singletons, reading them from the database only when
+    this process hasn't yet, or another process has changed them since.
+
+    Args:
+        defaults (bool): Stand in an unsaved instance, with the default values, for either one
+            that hasn't been created yet.
+
+    Returns:
+        tuple: (TroopSize, TicketParameters). Without defaults, either is None if it hasn't been
+            created yet.
+    """
+    version = cache.get(TICKET_CONFIG_VERSION_KEY)
+    if version is None:
+        # First use, or the key was evicted: start a new version so every worker reloads
+        cache.add(TICKET_CONFIG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(TICKET_CONFIG_VERSION_KEY)
+
+    if (
+        _ticket_config["version"] == version
+        and time.monotonic() - _ticket_config["loaded_at"] < TICKET_CONFIG_MAX_AGE
+    ):
+        troop_size = _ticket_config["troop_size"]
+        ticket_parameters = _ticket_config["ticket_parameters"]
+    else:
+        troop_size = TroopSize.objects.first()
+        ticket_parameters = TicketParameters.objects.first()
+
+        # A change this transaction hasn't committed yet could still be rolled back
+        if not _is_ticket_config_change_pending():
+            _ticket_config["troop_size"] = troop_size
+            _ticket_config["ticket_parameters"] = ticket_parameters
+            _ticket_config["version"] = version
+            _ticket_config["loaded_at"] = time.monotonic()
+
+    if defaults:
+        troop_size = troop_size or TroopSize()
+        ticket_parameters = ticket_parameters or TicketParameters()
+
+    return troop_size, ticket_parameters
+
+
+def get_size_ticket_allowances(troop_size_):
+    """
+    Work out the weekly ticket allowances for a troop of the given size.
+
+    Args:
+        troop_size_ (int): How many girls are in the troop.
+
+    Returns:
+        tuple: (total tickets, golden tickets) per week.
+    """
+    troop_size, ticket_parameters = get_ticket_config(defaults=True)
+
+    if troop_size_ >= troop_size.get_large_troop_size:
+        return (
+            ticket_parameters.get_large_troop_total_tickets_per_week,
+            ticket_parameters.get_large_troop_golden_tickets_per_week,
+        )
+
+    if troop_size_ >= troop_size.get_medium_troop_size:
+        return (
+            ticket_parameters.get_medium_troop_total_tickets_per_week,
+            ticket_parameters.get_medium_troop_golden_tickets_per_week,
+        )
+
+    return (
+        ticket_parameters.get_small_troop_total_tickets_per_week,
+        ticket_parameters.get_small_troop_golden_tickets_per_week,
+    )
 
 
 @receiver(post_save, sender=TroopSize)
 @receiver(post_save, sender=TicketParameters)
-def update_all_troops(sender, instance, **kwargs):
-    troops = Troop.objects.all()
-    for troop in troops:
-        update_tickets(troop=troop)
-        troop.save()
-
-def update_tickets(troop):
-    # This really should only care about setting/updating these after creation, but there is always the chance
-    # A troop could be updated after the fact. In that case, if they've booked more blocks than they should've,
-    # oh well.
-    try:
-        if troop.troop_size >= TroopSize.objects.first().get_large_troop_size:
-            troop.total_booth_tickets_per_week = (
-                TicketParameters.objects.first().get_large_troop_total_tickets_per_week
-            )
-            troop.booth_golden_tickets_per_week = (
-                TicketParameters.objects.first().get_large_troop_golden_tickets_per_week
-            )
-            return
+@receiver(post_delete, sender=TroopSize)
+@receiver(post_delete, sender=TicketParameters)
+def invalidate_ticket_config(sender, **kwargs):
+    # Forget this process's copy straight away, and tell the other workers once the change is
+    # committed, so that none of them reloads the old values under the new version
+    _ticket_config["version"] = None
+    transaction.on_commit(_publish_ticket_config_version)
 
-        if troop.troop_size >= TroopSize.objects.first().get_medium_troop_size:
-            troop.total_booth_tickets_per_week = (
-                TicketParameters.objects.first().get_medium_troop_total_tickets_per_week
-            )
-            troop.booth_golden_tickets_per_week = (
-                TicketParameters.objects.first().get_medium_troop_golden_tickets_per_week
-            )
-            return
 
-        troop.total_booth_tickets_per_week = (
-            TicketParameters.objects.first().get_small_troop_total_tickets_per_week
-        )
-        troop.booth_golden_tickets_per_week = (
-            TicketParameters.objects.first().get_small_troop_golden_tickets_per_week
+def _publish_ticket_config_version():
+    cache.set(TICKET_CONFIG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def _is_ticket_config_change_pending():
+    # Whether this connection has saved the config in a transaction that is still open. Rolling
+    # the change back also drops its on_commit callback.
+    return any(
+        callback is _publish_ticket_config_version
+        for _, callback, _ in transaction.get_connection().run_on_commit
+    )
+
+
+def touch_coordinators(user_ids):
+    """
+    Mark the troops of the given coordinators as changed, so the copies kept in their sessions are
+    read again on their next request. Troop.save() and delete() do this themselves; anything
+    changing troops in bulk needs to call it.
+
+    Args:
+        user_ids (iterable): The coordinators' user ids. None is skipped.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        get_user_model().objects.filter(id__in=user_ids).update(troops_updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Troop)
+def touch_deleted_troop_coordinator(sender, instance, **kwargs):
+    touch_coordinators([instance.coordinator_id])
+
+
+# The ticket usage (see troops.usage) is cached until a reservation changes, which the booths' change
+# stamp shows, or until a troop, the ticket settings or the season change, which replaces this
+TICKET_USAGE_VERSION_KEY = "troops:ticket_usage_version"
+
+
+@receiver(post_save, sender=Troop)
+@receiver(post_save, sender=TroopSize)
+@receiver(post_save, sender=TicketParameters)
+@receiver(post_save, sender=CookieSeason)
+@receiver(post_delete, sender=Troop)
+@receiver(post_delete, sender=TroopSize)
+@receiver(post_delete, sender=TicketParameters)
+def invalidate_ticket_usage(sender=None, **kwargs):
+    # Anything changing troops without saving them, such as bulk_create, calls this itself
+    transaction.on_commit(
+        lambda: cache.set(TICKET_USAGE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def link_coordinated_troops(sender, instance, created, update_fields=None, **kwargs):
+    # Link a new account, or one whose email changed, to the troops it coordinates. Logging in
+    # only saves last_login, so that doesn't get here.
+    if update_fields is not None and "email" not in update_fields:
+        return
+
+    unlinked = (
+        Troop.objects.filter(coordinator=instance)
+        .exclude(troop_cookie_coordinator=instance.email)
+        .update(coordinator=None)
+    )
+    linked = (
+        Troop.objects.filter(troop_cookie_coordinator=instance.email)
+        .exclude(coordinator=instance)
+        .update(coordinator=instance)
+    )
+    if unlinked or linked:
+        # Set on the instance too, so saving it again doesn't put the old time back
+        instance.troops_updated_at = timezone.now()
+        type(instance).objects.filter(id=instance.id).update(
+            troops_updated_at=instance.troops_updated_at
         )
-    except AttributeError:
-        # Do not try to update if we cannot find the Parameters yet. 
-        pass
@@ -0,0 +1,116 @@
+# Coordinator Troop Tests
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, TestCase
+
+from troops.coordinators import get_coordinator_troops
+from troops.models import Troop
+
+PASSWORD = "secret"
+
+
+class CoordinatorTroopsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email="tcc@troop.org", password=PASSWORD)
+        cls.troop = Troop.objects.create(
+            troop_number=300, troop_cookie_coordinator="tcc@troop.org", troop_size=10
+        )
+
+    def setUp(self):
+        self.session = SessionStore()
+
+    def test_troop_linked_to_existing_user(self):
+        self.assertEqual(self.troop.coordinator, self.user)
+
+    def test_new_user_linked_to_troop(self):
+        troop = Troop.objects.create(troop_number=301, troop_cookie_coordinator="new@troop.org")
+        self.assertIsNone(troop.coordinator)
+
+        user = get_user_model().objects.create_user(email="new@troop.org", password=PASSWORD)
+        troop.refresh_from_db()
+        self.assertEqual(troop.coordinator, user)
+
+    def test_email_changes_relink(self):
+        self.user.email = "moved@troop.org"
+        self.user.save()
+        self.troop.refresh_from_db()
+        self.assertIsNone(self.troop.coordinator)
+
+        self.troop.troop_cookie_coordinator = "moved@troop.org"
+        self.troop.save(update_fields=["troop_cookie_coordinator"])
+        self.troop.refresh_from_db()
+        self.assertEqual(self.troop.coordinator, self.user)
+
+    def test_login_does_not_relink(self):
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=["last_login"])
+
+    def test_troops_read_once_per_session(self):
+        request = self._request()
+        with self.assertNumQueries(1):
+            troops = get_coordinator_troops(request)
+        self.assertEqual([troop.troop_number for troop in troops], [300])
+        self.assertEqual(troops[0].total_booth_tickets_per_week, 15)
+
+        # Each request after the first reads them from the session
+        request = self._request()
+        with self.assertNumQueries(0):
+            troops = get_coordinator_troops(request)
+        self.assertEqual(troops[0].pk, self.troop.pk)
+        self.assertEqual(troops[0].troop_size, 10)
+
+    def test_troops_read_again_after_change(self):
+        get_coordinator_troops(self._request())
+        Troop.objects.create(troop_number=200, troop_cookie_coordinator="tcc@troop.org")
+
+        request = self._request()
+        with self.assertNumQueries(1):
+            troops = get_coordinator_troops(request)
+        self.assertEqual([troop.troop_number for troop in troops], [200, 300])
+
+    def test_troops_read_again_after_removal(self):
+        get_coordinator_troops(self._request())
+        self.troop.troop_cookie_coordinator = "other@troop.org"
+        self.troop.save()
+
+        self.assertEqual(get_coordinator_troops(self._request()), [])
+
+    def test_troops_read_again_after_delete(self):
+        get_coordinator_troops(self._request())
+        self.troop.delete()
+
+        self.assertEqual(get_coordinator_troops(self._request()), [])
+
+    def test_other_coordinators_troops_do_not_invalidate(self):
+        get_coordinator_troops(self._request())
+        Troop.objects.create(troop_number=301, troop_cookie_coordinator="cc@troop.org")
+
+        request = self._request()
+        with self.assertNumQueries(0):
+            get_coordinator_troops(request)
+
+    def test_email_change_reads_troops_again(self):
+        get_coordinator_troops(self._request())
+        self.user.email = "moved@troop.org"
+        self.user.save()
+
+        self.assertEqual(get_coordinator_troops(self._request()), [])
+
+    def test_session_of_another_user(self):
+        get_coordinator_troops(self._request())
+        other_user = get_user_model().objects.create_user(email="cc@troop.org", password=PASSWORD)
+
+        request = self._request(other_user)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_coordinator_troops(request), [])
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    def _request(self, user=None):
+        # Each request loads the user afresh, as the authentication middleware does
+        request = RequestFactory().get("/")
+        request.user = get_user_model().objects.get(pk=(user or self.user).pk)
+        request.session = self.session
+        return request
@@ -0,0 +1,110 @@
+# Ticket Config Cache Tests
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from troops.models import (
+    TICKET_CONFIG_MAX_AGE,
+    TICKET_CONFIG_VERSION_KEY,
+    TicketParameters,
+    Troop,
+    TroopSize,
+    get_ticket_config,
+)
+
+
+class TicketConfigTestCase(TransactionTestCase):
+    # The config is only cached once committed, so these tests run outside of a transaction
+
+    def setUp(self):
+        cache.delete(TICKET_CONFIG_VERSION_KEY)
+        self.troop_size = TroopSize.objects.create()
+        self.ticket_parameters = TicketParameters.objects.create()
+
+    def tearDown(self):
+        # The rows are flushed after each test, so don't let the next one see them
+        cache.delete(TICKET_CONFIG_VERSION_KEY)
+
+    def test_config_read_once(self):
+        get_ticket_config()
+
+        with self.assertNumQueries(0):
+            troop_size, ticket_parameters = get_ticket_config()
+        self.assertEqual(troop_size, self.troop_size)
+        self.assertEqual(ticket_parameters, self.ticket_parameters)
+
+    def test_allowances_use_cached_config(self):
+        troop = Troop.objects.create(troop_number=300, troop_size=10)
+        get_ticket_config()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                troop.get_ticket_allowances(),
+                (
+                    self.ticket_parameters.get_large_troop_total_tickets_per_week,
+                    self.ticket_parameters.get_large_troop_golden_tickets_per_week,
+                ),
+            )
+
+    def test_save_invalidates_config(self):
+        get_ticket_config()
+        version = cache.get(TICKET_CONFIG_VERSION_KEY)
+
+        self.ticket_parameters.small_troop_total_tickets_per_week = 7
+        self.ticket_parameters.save()
+
+        self.assertNotEqual(cache.get(TICKET_CONFIG_VERSION_KEY), version)
+        self.assertEqual(get_ticket_config()[1].small_troop_total_tickets_per_week, 7)
+
+    def test_other_worker_change_reloads_config(self):
+        get_ticket_config()
+
+        # Another worker saving the parameters only changes the database and the version
+        TicketParameters.objects.filter(id=1).update(small_troop_total_tickets_per_week=9)
+        self.assertEqual(get_ticket_config()[1].small_troop_total_tickets_per_week, 5)
+
+        cache.set(TICKET_CONFIG_VERSION_KEY, "another worker")
+        with self.assertNumQueries(2):
+            self.assertEqual(get_ticket_config()[1].small_troop_total_tickets_per_week, 9)
+
+    def test_config_reloaded_when_old(self):
+        get_ticket_config()
+        TicketParameters.objects.filter(id=1).update(small_troop_total_tickets_per_week=9)
+
+        # Without a shared cache, another worker's change is only seen once the copy is old
+        later = time.monotonic() + TICKET_CONFIG_MAX_AGE
+        with mock.patch("time.monotonic", return_value=later):
+            self.assertEqual(get_ticket_config()[1].small_troop_total_tickets_per_week, 9)
+
+    def test_rolled_back_change_not_kept(self):
+        get_ticket_config()
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                self.ticket_parameters.small_troop_total_tickets_per_week = 7
+                self.ticket_parameters.save()
+                self.assertEqual(get_ticket_config()[1].small_troop_total_tickets_per_week, 7)
+                raise ValueError
+
+        self.assertEqual(get_ticket_config()[1].small_troop_total_tickets_per_week, 5)
+        with self.assertNumQueries(0):
+            get_ticket_config()
+
+
+class TicketConfigTransactionTestCase(TestCase):
+    def test_config_kept_inside_transaction(self):
+        get_ticket_config()
+
+        # Nothing has changed in this transaction, so the copy is still good
+        with self.assertNumQueries(0):
+            get_ticket_config()
+
+    def test_config_not_kept_while_change_uncommitted(self):
+        TicketParameters.objects.create(small_troop_total_tickets_per_week=7)
+
+        get_ticket_config()
+        with self.assertNumQueries(2):
+            self.assertEqual(get_ticket_config()[1].small_troop_total_tickets_per_week, 7)
@@ -0,0 +1,142 @@
+# Ticket Usage Tests
+import datetime
+import json
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothBlock, BoothDay, BoothLocation, CookieSeason
+from troops.tests.troop_class_reference import TroopTestCase
+from troops.usage import get_ticket_usage
+
+SEASON_START = datetime.date(2023, 2, 4)
+SEASON_END = datetime.date(2023, 2, 19)
+WEEKS = [datetime.date(2023, 1, 30), datetime.date(2023, 2, 6), datetime.date(2023, 2, 13)]
+
+
+class TicketUsageTestCase(TroopTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        CookieSeason.objects.create(
+            id=1, season_start_date=SEASON_START, season_end_date=SEASON_END
+        )
+
+        location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        cls.normal_blocks = cls._create_blocks(location, WEEKS[1])
+        golden_date = WEEKS[1] + datetime.timedelta(days=2)
+        cls.golden_blocks = cls._create_blocks(location, golden_date, is_golden=True)
+        cls.next_week_blocks = cls._create_blocks(location, WEEKS[2])
+        after_season_blocks = cls._create_blocks(location, SEASON_END + datetime.timedelta(days=7))
+
+        # The small troop has three blocks, one of them golden, in the second week, one in the
+        # third and one after the season. The medium troop is a daisy troop, and shares a cookie
+        # captain's golden block.
+        for block in (
+            cls.normal_blocks[0],
+            cls.normal_blocks[1],
+            cls.golden_blocks[0],
+            cls.next_week_blocks[0],
+            after_season_blocks[0],
+        ):
+            block.reserve_block(cls.SMALL_TROOP["number"], 0)
+        cls.golden_blocks[1].reserve_block(0, cls.normal_user.id)
+        cls.golden_blocks[1].reserve_daisy_block(cls.MEDIUM_TROOP["number"])
+
+    def tearDown(self):
+        # The cached usage would outlive the rollback of anything a test changed
+        cache.clear()
+
+    def test_usage(self):
+        ticket_usage = get_ticket_usage()
+        troops = {troop["troop_number"]: troop for troop in ticket_usage["troops"]}
+
+        self.assertEqual(ticket_usage["weeks"], WEEKS)
+        small_troop = troops[self.SMALL_TROOP["number"]]
+        self.assertEqual(small_troop["ticket_allowance"], 5)
+        self.assertEqual([week["tickets_used"] for week in small_troop["weeks"]], [0, 3, 1])
+        self.assertEqual(
+            small_troop["weeks"][1],
+            {
+                "week": WEEKS[1],
+                "tickets_used": 3,
+                "tickets_remaining": 2,
+                "golden_tickets_used": 1,
+                "golden_tickets_remaining": 0,
+            },
+        )
+
+        medium_troop = troops[self.MEDIUM_TROOP["number"]]
+        self.assertEqual([week["tickets_used"] for week in medium_troop["weeks"]], [0, 1, 0])
+        self.assertEqual(medium_troop["weeks"][1]["golden_tickets_used"], 1)
+
+    def test_usage_cached_until_reservation(self):
+        get_ticket_usage()
+
+        # Only the booths' change stamp, one aggregate per model
+        with self.assertNumQueries(3):
+            get_ticket_usage()
+
+        self.next_week_blocks[1].reserve_block(self.SMALL_TROOP["number"], 0)
+        troops = {troop["troop_number"]: troop for troop in get_ticket_usage()["troops"]}
+        self.assertEqual(troops[self.SMALL_TROOP["number"]]["weeks"][2]["tickets_used"], 2)
+
+    def test_usage_cached_until_troop_changes(self):
+        get_ticket_usage()
+
+        self.small_troop.total_booth_tickets_override = 8
+        with self.captureOnCommitCallbacks(execute=True):
+            self.small_troop.save()
+        troops = {troop["troop_number"]: troop for troop in get_ticket_usage()["troops"]}
+        self.assertEqual(troops[self.SMALL_TROOP["number"]]["weeks"][1]["tickets_remaining"], 5)
+
+    def test_usage_cached_until_season_changes(self):
+        get_ticket_usage()
+
+        season = CookieSeason.objects.get(id=1)
+        season.season_end_date = WEEKS[2] - datetime.timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            season.save()
+        self.assertEqual(get_ticket_usage()["weeks"], WEEKS[:2])
+
+    def test_view_requires_admin(self):
+        self.client.login(email=self.NORMAL_USER["email"], password=self.NORMAL_USER["password"])
+        response = self.client.get(reverse("troops:ticket_usage"))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_view(self):
+        self.normal_user.user_permissions.add(
+            Permission.objects.get(codename="block_reservation_admin")
+        )
+        self.client.login(email=self.NORMAL_USER["email"], password=self.NORMAL_USER["password"])
+
+        response = self.client.get(reverse("troops:ticket_usage"))
+        self.assertTemplateUsed(response, "ticket_usage.html")
+        self.assertContains(response, "Week of 02/06")
+        self.assertContains(response, "3 / 5")
+
+        response = self.client.get(reverse("troops:ticket_usage"), {"format": "json"})
+        message_response = json.loads(response.content)
+        self.assertEqual(message_response["weeks"][1], "2023-02-06")
+        troop = message_response["troops"][0]
+        self.assertEqual(troop["troop_number"], self.SMALL_TROOP["number"])
+        self.assertEqual(troop["weeks"][1]["week"], "2023-02-06")
+        self.assertEqual(troop["weeks"][1]["tickets_used"], 3)
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    @staticmethod
+    def _create_blocks(location, date, is_golden=False):
+        day = BoothDay.objects.create(
+            booth=location, booth_day_date=date, booth_day_is_golden=is_golden
+        )
+        day.add_or_update_hours(
+            make_aware(datetime.datetime.combine(date, datetime.time(8, 0))),
+            make_aware(datetime.datetime.combine(date, datetime.time(16, 0))),
+        )
+        day.enable_day()
+        return list(BoothBlock.objects.filter(booth_day=day).order_by("booth_block_start_time"))
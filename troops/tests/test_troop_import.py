@@ -0,0 +1,135 @@
+# Troop Import Tests
+import io
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from troops.imports import import_troops
+from troops.models import Troop
+
+HEADER = "troop_number,troop_cookie_coordinator,troop_level,troop_size\n"
+
+
+def _csv(*rows, header=HEADER):
+    return header + "".join(f"{row}\n" for row in rows)
+
+
+class TroopImportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Troop.objects.create(troop_number=100, troop_cookie_coordinator="existing@troop.org")
+        cls.coordinator = get_user_model().objects.create_user(
+            email="tcc12@troop.org", password="secret"
+        )
+
+    def test_import(self):
+        rows = [f"{1000 + number},tcc{number}@troop.org,2,{number}" for number in range(50)]
+
+        # Duplicates are checked in one query, the coordinators' accounts are looked up in another,
+        # then the troops are written in one insert and those accounts marked in one update
+        with self.assertNumQueries(4):
+            result = import_troops(io.StringIO(_csv(*rows)))
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.rows, 50)
+        self.assertEqual(result.created, 50)
+        self.assertGreater(result.rows_per_second, 0)
+        troop = Troop.objects.get(troop_number=1012)
+        self.assertEqual(troop.troop_cookie_coordinator, "tcc12@troop.org")
+        self.assertEqual(troop.coordinator, self.coordinator)
+        self.assertIsNone(Troop.objects.get(troop_number=1013).coordinator)
+        self.assertEqual(troop.troop_level, 2)
+        self.assertEqual(troop.troop_size, 12)
+        self.assertEqual(troop.total_booth_tickets_per_week, 15)
+
+    def test_optional_columns(self):
+        result = import_troops(
+            io.StringIO(
+                _csv(
+                    "300,tcc@troop.org,,,4",
+                    header="troop_number,troop_cookie_coordinator,troop_level,troop_size,"
+                    "total_booth_tickets_override\n",
+                )
+            )
+        )
+
+        self.assertEqual(result.errors, [])
+        troop = Troop.objects.get(troop_number=300)
+        self.assertEqual(troop.troop_level, 0)
+        self.assertEqual(troop.troop_size, 0)
+        self.assertEqual(troop.total_booth_tickets_per_week, 4)
+
+    def test_errors_import_nothing(self):
+        result = import_troops(
+            io.StringIO(
+                _csv(
+                    "300,tcc@troop.org,2,7",
+                    "301,not an email,2,7",
+                    "300,other@troop.org,9,7",
+                    "100,new@troop.org,2,7",
+                )
+            )
+        )
+
+        self.assertEqual(result.created, 0)
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+        self.assertFalse(Troop.objects.filter(troop_number=300).exists())
+
+    def test_existing_troops(self):
+        result = import_troops(io.StringIO(_csv("300,tcc@troop.org,2,7", "100,new@troop.org,2,7")))
+
+        self.assertEqual(result.errors, [(3, "Troop 100 already exists.")])
+        self.assertEqual(Troop.objects.count(), 1)
+
+    def test_missing_columns(self):
+        result = import_troops(io.StringIO("troop_number,troop_size\n300,7\n"))
+
+        self.assertEqual(result.errors, [(1, "Missing column(s): troop_cookie_coordinator.")])
+
+    def test_dry_run(self):
+        result = import_troops(io.StringIO(_csv("300,tcc@troop.org,2,7")), dry_run=True)
+
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.created, 0)
+        self.assertFalse(Troop.objects.filter(troop_number=300).exists())
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as csv_file:
+            csv_file.write(_csv("300,tcc@troop.org,2,7", "301,tcc2@troop.org,1,12"))
+        self.addCleanup(os.remove, csv_file.name)
+
+        out = io.StringIO()
+        call_command("import_troops", csv_file.name, stdout=out)
+
+        self.assertIn("Imported 2 troops", out.getvalue())
+        self.assertIn("rows/sec", out.getvalue())
+        self.assertEqual(Troop.objects.count(), 3)
+
+        err = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("import_troops", csv_file.name, stdout=io.StringIO(), stderr=err)
+        self.assertIn("Line 2: Troop 300 already exists.", err.getvalue())
+
+    def test_admin_upload(self):
+        admin_user = get_user_model().objects.create_superuser(
+            email="admin@troop.org", password="secret"
+        )
+        self.client.force_login(admin_user)
+
+        response = self.client.post(
+            reverse("admin:troops_troop_import"),
+            {"csv_file": SimpleUploadedFile("troops.csv", _csv("300,tcc@troop.org,2,7").encode())},
+        )
+        self.assertRedirects(response, reverse("admin:troops_troop_changelist"))
+        self.assertTrue(Troop.objects.filter(troop_number=300).exists())
+
+        response = self.client.post(
+            reverse("admin:troops_troop_import"),
+            {"csv_file": SimpleUploadedFile("troops.csv", _csv("300,tcc@troop.org,2,7").encode())},
+        )
+        self.assertContains(response, "Line 2: Troop 300 already exists.")
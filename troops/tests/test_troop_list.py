@@ -0,0 +1,122 @@
+# Troop List Tests
+import datetime
+import json
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.timezone import make_aware
+
+from cookie_booths.models import BoothBlock, BoothDay, BoothLocation
+from troops.models import Troop
+from troops.tests.troop_class_reference import TroopTestCase
+
+# The week the usage is counted for, a Monday, and a day the week after
+WEEK_START = datetime.date(2023, 2, 6)
+NEXT_WEEK = datetime.date(2023, 2, 13)
+
+
+class TroopListTestCase(TroopTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+
+        cls.daisy_troop = Troop.objects.create(
+            troop_number=100, troop_cookie_coordinator="daisy@troop.org", troop_level=1
+        )
+        for number in range(60):
+            Troop.objects.create(
+                troop_number=2000 + number, troop_cookie_coordinator=f"leader{number}@council.org"
+            )
+
+        # Four blocks a day. The small troop reserves two on a normal day, one on a golden day and
+        # one the following week, and the daisy troop shares a cookie captain's golden block
+        location = BoothLocation.objects.create(booth_location="Dunkin Donuts")
+        normal_blocks = cls._create_blocks(location, WEEK_START)
+        golden_blocks = cls._create_blocks(location, WEEK_START + datetime.timedelta(days=2), True)
+        next_week_blocks = cls._create_blocks(location, NEXT_WEEK)
+
+        for block in (normal_blocks[0], normal_blocks[1], golden_blocks[0], next_week_blocks[0]):
+            block.reserve_block(cls.SMALL_TROOP["number"], 0)
+        golden_blocks[1].reserve_block(0, cls.normal_user.id)
+        golden_blocks[1].reserve_daisy_block(cls.daisy_troop.troop_number)
+
+    def setUp(self):
+        self.client.login(email=self.NORMAL_USER["email"], password=self.NORMAL_USER["password"])
+
+    def test_pagination(self):
+        response = self.client.get(reverse("troops:troops"))
+
+        self.assertTrue(response.context["is_paginated"])
+        troops = list(response.context["troop_list"])
+        self.assertEqual(len(troops), 50)
+        self.assertEqual(troops[0].troop_number, 100)
+        self.assertContains(response, "Page 1 of 2")
+
+        response = self.client.get(reverse("troops:troops"), {"page": 2})
+        self.assertEqual(len(response.context["troop_list"]), 13)
+
+    def test_search(self):
+        response = self.client.get(reverse("troops:troops"), {"q": "leader1"})
+        self.assertEqual(
+            [troop.troop_number for troop in response.context["troop_list"]],
+            [2001] + list(range(2010, 2020)),
+        )
+
+        response = self.client.get(
+            reverse("troops:troops"), {"q": str(self.MEDIUM_TROOP["number"])}
+        )
+        self.assertEqual(
+            [troop.troop_number for troop in response.context["troop_list"]],
+            [self.MEDIUM_TROOP["number"]],
+        )
+
+    @override_settings(BOOTH_TIME_ZONE="UTC")
+    def test_week_ticket_usage(self):
+        date = WEEK_START + datetime.timedelta(days=4)
+        troops = {troop.troop_number: troop for troop in Troop.objects.with_week_ticket_usage(date)}
+
+        small_troop = troops[self.SMALL_TROOP["number"]]
+        self.assertEqual(small_troop.tickets_used, 3)
+        self.assertEqual(small_troop.golden_tickets_used, 1)
+        self.assertEqual(troops[self.daisy_troop.troop_number].tickets_used, 1)
+        self.assertEqual(troops[self.daisy_troop.troop_number].golden_tickets_used, 1)
+        self.assertEqual(troops[self.MEDIUM_TROOP["number"]].tickets_used, 0)
+
+    def test_one_troop_query(self):
+        # Session, user, the ticket settings (which setUpTestData changed and hasn't committed, so
+        # they aren't kept), the count for the paginator and permissions, then one query for the
+        # page of troops with their usage, however many troops are on it
+        with self.assertNumQueries(8):
+            self.client.get(reverse("troops:troops"))
+
+    def test_json(self):
+        response = self.client.get(
+            reverse("troops:troops"), {"q": str(self.SMALL_TROOP["number"]), "format": "json"}
+        )
+        message_response = json.loads(response.content)
+
+        self.assertEqual(message_response["count"], 1)
+        self.assertEqual(message_response["num_pages"], 1)
+        troop = message_response["troops"][0]
+        self.assertEqual(troop["troop_number"], self.SMALL_TROOP["number"])
+        self.assertEqual(troop["troop_cookie_coordinator"], self.SMALL_TROOP["tcc"])
+        self.assertEqual(
+            troop["ticket_allowance"],
+            self.ticket_parameters.get_small_troop_total_tickets_per_week,
+        )
+        self.assertIn("tickets_used", troop)
+
+    # -----------------------------------------------------------------------
+    # Internal
+    # -----------------------------------------------------------------------
+    @staticmethod
+    def _create_blocks(location, date, is_golden=False):
+        day = BoothDay.objects.create(
+            booth=location, booth_day_date=date, booth_day_is_golden=is_golden
+        )
+        day.add_or_update_hours(
+            make_aware(datetime.datetime.combine(date, datetime.time(8, 0))),
+            make_aware(datetime.datetime.combine(date, datetime.time(16, 0))),
+        )
+        day.enable_day()
+        return list(BoothBlock.objects.filter(booth_day=day).order_by("booth_block_start_time"))
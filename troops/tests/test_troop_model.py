@@ -1,4 +1,10 @@
 # Troop Model Tests
+import datetime
+from unittest import mock
+
+from cookie_booths.views import get_num_tickets_remaining
+from troops import models
+from troops.models import Troop
 from troops.tests.troop_class_reference import TroopTestCase
 
 
@@ -38,3 +44,86 @@ class TroopModelTestCase(TroopTestCase):
             self.medium_troop.booth_golden_tickets_per_week,
             self.ticket_parameters.get_medium_troop_golden_tickets_per_week,
         )
+
+    def test_ticket_parameters_update_all_troops(self):
+        self.ticket_parameters.small_troop_total_tickets_per_week = 6
+        self.ticket_parameters.large_troop_additional_golden_tickets = 4
+        self.ticket_parameters.save()
+
+        self.small_troop.refresh_from_db()
+        self.medium_troop.refresh_from_db()
+        self.assertEqual(self.small_troop.total_booth_tickets_per_week, 6)
+        self.assertEqual(self.small_troop.booth_golden_tickets_per_week, 1)
+        self.assertEqual(self.medium_troop.total_booth_tickets_per_week, 12)
+        self.assertEqual(self.medium_troop.booth_golden_tickets_per_week, 2)
+
+    def test_troop_size_update_all_troops(self):
+        self.troop_size.medium_troop_size = 5
+        self.troop_size.large_troop_size = 7
+        self.troop_size.save()
+
+        self.small_troop.refresh_from_db()
+        self.medium_troop.refresh_from_db()
+        self.assertEqual(
+            self.small_troop.total_booth_tickets_per_week,
+            self.ticket_parameters.get_large_troop_total_tickets_per_week,
+        )
+        self.assertEqual(
+            self.medium_troop.booth_golden_tickets_per_week,
+            self.ticket_parameters.get_large_troop_golden_tickets_per_week,
+        )
+
+    def test_config_change_writes_no_troops(self):
+        for number in range(20):
+            Troop.objects.create(troop_number=1000 + number, troop_size=number)
+
+        # Only the parameters themselves are saved, however many troops there are
+        self.ticket_parameters.small_troop_total_tickets_per_week = 6
+        with self.assertNumQueries(1):
+            self.ticket_parameters.save()
+
+        self.assertEqual(
+            {troop.total_booth_tickets_per_week for troop in Troop.objects.all()}, {6, 12, 18}
+        )
+
+    def test_ticket_overrides(self):
+        self.small_troop.total_booth_tickets_override = 20
+        self.small_troop.save()
+        self.small_troop.refresh_from_db()
+
+        self.assertEqual(self.small_troop.total_booth_tickets_per_week, 20)
+        self.assertEqual(
+            self.small_troop.booth_golden_tickets_per_week,
+            self.ticket_parameters.get_small_troop_golden_tickets_per_week,
+        )
+
+    def test_remaining_tickets_read_config_once(self):
+        with mock.patch.object(
+            models, "get_ticket_config", wraps=models.get_ticket_config
+        ) as get_ticket_config:
+            remaining = get_num_tickets_remaining(self.small_troop, datetime.date.today())
+
+        self.assertEqual(
+            remaining,
+            (
+                self.ticket_parameters.get_small_troop_total_tickets_per_week,
+                self.ticket_parameters.get_small_troop_golden_tickets_per_week,
+            ),
+        )
+        self.assertEqual(get_ticket_config.call_count, 1)
+
+    def test_with_ticket_allowances(self):
+        Troop.objects.create(troop_number=500, troop_size=12, booth_golden_tickets_override=0)
+        for number in range(10):
+            Troop.objects.create(troop_number=1000 + number, troop_size=number + 3)
+
+        troops = list(Troop.objects.with_ticket_allowances())
+        self.assertEqual(len(troops), 13)
+        for troop in troops:
+            self.assertEqual(
+                (troop.ticket_allowance, troop.golden_ticket_allowance),
+                troop.get_ticket_allowances(),
+            )
+        self.assertEqual(
+            Troop.objects.with_ticket_allowances().get(troop_number=500).golden_ticket_allowance, 0
+        )
@@ -9,6 +9,8 @@ app_name = "troops"
 urlpatterns = [
     # Troops Home
     path("", views.TroopListView.as_view(), name="troops"),
+    # Ticket Usage Dashboard
+    path("usage/", views.ticket_usage, name="ticket_usage"),
     # Create New Troop
     path("new/", views.TroopCreateView.as_view(), name="create_troop"),
     # Edit Troop Page
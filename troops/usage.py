@@ -0,0 +1,135 @@
+"""How many tickets every troop has used, and has left, in each week of the cookie season.
+
+The reservations are counted with one grouped aggregate over the reserved blocks, and the result is
+cached until a reservation, a troop, the ticket parameters or the season next change. Telling
+whether it still holds only takes the booths' change stamp and one cache read.
+"""
+import hashlib
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncWeek
+
+from cookie_booths.models import BoothBlock, CookieSeason, get_booth_change_stamp
+
+from .models import TICKET_USAGE_VERSION_KEY, Troop
+
+TICKET_USAGE_CACHE_PREFIX = "troops:ticket_usage:"
+TICKET_USAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_ticket_usage():
+    """
+    Get every troop's ticket usage for each week of the season.
+
+    Returns:
+        dict: "weeks", the Monday of each week in the season, and "troops", one entry per troop
+            with its allowances and, for each of those weeks, its used and remaining tickets.
+    """
+    version = cache.get(TICKET_USAGE_VERSION_KEY)
+    if version is None:
+        # First use, or the key was evicted: start a new version, so nothing cached under an
+        # earlier one can be mistaken for current
+        cache.add(TICKET_USAGE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(TICKET_USAGE_VERSION_KEY)
+    key = _get_cache_key(get_booth_change_stamp()[1], version)
+
+    ticket_usage = cache.get(key)
+    if ticket_usage is None:
+        ticket_usage = _build_ticket_usage(CookieSeason.objects.filter(id=1).first())
+        cache.set(key, ticket_usage, TICKET_USAGE_CACHE_TIMEOUT)
+    return ticket_usage
+
+
+def _get_cache_key(*parts):
+    return TICKET_USAGE_CACHE_PREFIX + hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _build_ticket_usage(season):
+    blocks = BoothBlock.objects.filter(booth_block_reserved=True)
+    if season and season.season_start_date:
+        blocks = blocks.filter(booth_day__booth_day_date__gte=season.season_start_date)
+    if season and season.season_end_date:
+        blocks = blocks.filter(booth_day__booth_day_date__lte=season.season_end_date)
+
+    # One row per week and owner, the same way get_num_tickets_remaining counts a single troop:
+    # a block counts for the troop that owns it, and for the daisy troop sharing it
+    rows = (
+        blocks.annotate(week=TruncWeek("booth_day__booth_day_date"))
+        .values(
+            "week",
+            "booth_block_current_troop_owner",
+            "booth_block_daisy_reserved",
+            "booth_block_daisy_troop_owner",
+        )
+        .annotate(
+            total=Count("id"),
+            golden=Count("id", filter=Q(booth_day__booth_day_is_golden=True)),
+        )
+        .order_by()
+    )
+
+    used = {}
+    daisy_used = {}
+    for row in rows:
+        _add_usage(used, row["booth_block_current_troop_owner"], row)
+        if row["booth_block_daisy_reserved"]:
+            _add_usage(daisy_used, row["booth_block_daisy_troop_owner"], row)
+
+    weeks = _get_weeks(season, [week for _, week in [*used, *daisy_used]])
+    troops = []
+    for troop in Troop.objects.with_ticket_allowances().order_by("troop_number"):
+        troop_used = daisy_used if troop.troop_level == 1 else used
+        troop_weeks = []
+        for week in weeks:
+            total, golden = troop_used.get((troop.troop_number, week), (0, 0))
+            troop_weeks.append(
+                {
+                    "week": week,
+                    "tickets_used": total,
+                    "tickets_remaining": max(troop.ticket_allowance - total, 0),
+                    "golden_tickets_used": golden,
+                    "golden_tickets_remaining": max(troop.golden_ticket_allowance - golden, 0),
+                }
+            )
+        troops.append(
+            {
+                "troop_number": troop.troop_number,
+                "troop_level": troop.troop_level,
+                "ticket_allowance": troop.ticket_allowance,
+                "golden_ticket_allowance": troop.golden_ticket_allowance,
+                "weeks": troop_weeks,
+            }
+        )
+
+    return {"weeks": weeks, "troops": troops}
+
+
+def _add_usage(used, troop_number, row):
+    week = _as_date(row["week"])
+    total, golden = used.get((troop_number, week), (0, 0))
+    used[troop_number, week] = (total + row["total"], golden + row["golden"])
+
+
+def _as_date(week):
+    # TruncWeek hands back a date for date fields, but some backends give a datetime
+    return week.date() if hasattr(week, "date") else week
+
+
+def _get_weeks(season, used_weeks):
+    # Every Monday from the start of the season to its end, or across the reservations when the
+    # season's dates aren't set
+    start = season and season.season_start_date
+    end = season and season.season_end_date
+    start = start - timedelta(days=start.weekday()) if start else min(used_weeks, default=None)
+    end = end or max(used_weeks, default=None)
+    if start is None or end is None:
+        return []
+
+    weeks = []
+    while start <= end:
+        weeks.append(start)
+        start += timedelta(days=7)
+    return weeks
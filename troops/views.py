@@ -1,18 +1,97 @@
+import json
+
+from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import PermissionRequiredMixin, LoginRequiredMixin
+from django.http import HttpResponse
+from django.shortcuts import render
 from django.urls import reverse_lazy
 from django.views.generic import ListView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 
 from .forms import TroopForm
 from .models import Troop
+from .usage import get_ticket_usage
 
 
 # -----------------------------------------------------------------------
 # Troop General User Functions
 # -----------------------------------------------------------------------
 class TroopListView(LoginRequiredMixin, ListView):
+    """
+    A page of troops, optionally searched by troop number or coordinator email, with each troop's
+    ticket allowance and how much of it has been used this week. Add ?format=json to get the same
+    page as JSON.
+    """
+
     model = Troop
     template_name = "troops.html"
+    paginate_by = 50
+
+    def get_queryset(self):
+        return (
+            Troop.objects.search(self.request.GET.get("q", ""))
+            .with_ticket_allowances()
+            .with_week_ticket_usage()
+            .order_by("troop_number")
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["query"] = self.request.GET.get("q", "")
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get("format") != "json":
+            return super().render_to_response(context, **response_kwargs)
+
+        page = context["page_obj"]
+        message_response = {
+            "troops": [
+                {
+                    "troop_number": troop.troop_number,
+                    "troop_cookie_coordinator": troop.troop_cookie_coordinator,
+                    "troop_level": troop.troop_level,
+                    "troop_size": troop.troop_size,
+                    "ticket_allowance": troop.ticket_allowance,
+                    "golden_ticket_allowance": troop.golden_ticket_allowance,
+                    "tickets_used": troop.tickets_used,
+                    "golden_tickets_used": troop.golden_tickets_used,
+                }
+                for troop in context["troop_list"]
+            ],
+            "page": page.number,
+            "num_pages": page.paginator.num_pages,
+            "count": page.paginator.count,
+        }
+        return HttpResponse(json.dumps(message_response), content_type="application/json")
+
+
+@login_required
+@permission_required("cookie_booths.block_reservation_admin", raise_exception=True)
+def ticket_usage(request):
+    """Every troop's used and remaining tickets for each week of the season, or ?format=json"""
+    ticket_usage_ = get_ticket_usage()
+
+    if request.GET.get("format") == "json":
+        message_response = {
+            "weeks": [week.isoformat() for week in ticket_usage_["weeks"]],
+            "troops": [
+                {
+                    **troop,
+                    "weeks": [
+                        {**week, "week": week["week"].isoformat()} for week in troop["weeks"]
+                    ],
+                }
+                for troop in ticket_usage_["troops"]
+            ],
+        }
+        return HttpResponse(json.dumps(message_response), content_type="application/json")
+
+    context = {
+        "weeks": ticket_usage_["weeks"],
+        "troops": ticket_usage_["troops"],
+    }
+    return render(request, "ticket_usage.html", context)
 
 
 # -----------------------------------------------------------------------